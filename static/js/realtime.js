@@ -0,0 +1,113 @@
+// One multiplexed WebSocket per page for all realtime updates.
+//
+//   realtime.subscribe({ workspaces: [1], tasks: [42] });
+//   realtime.on((data) => { ... });  // data.subscription is e.g. "workspace:1"
+//
+// The socket is the htmx ws extension's (ws-connect on <body>, see base.html),
+// which also handles reconnects. JSON frames are handed to the handlers here;
+// HTML frames (task rows rendered by the server) are left to htmx, which
+// swaps them in out-of-band.
+//
+// Subscriptions are remembered and sent again after every reconnect, with
+// the last sequence number seen on each ("since"), so the server replays
+// whatever was missed. When it can't, a {type: "resync"} frame tells the
+// page to reload that view.
+// A "revoked" frame (access lost) removes them for good; the server closes
+// the socket once nothing is left to receive, and it stays closed.
+
+// Keeps this page listed in "presence_changed" frames; well under the
+// server's PRESENCE_TTL_SECONDS. Hidden tabs stop sending and drop out.
+const HEARTBEAT_MS = 15000;
+
+class RealtimeClient {
+    constructor() {
+        this.socket = null;
+        this.handlers = [];
+        this.subscriptions = { workspaces: new Set(), tasks: new Set() };
+        this.seqs = {};  // subscription -> last seq seen
+
+        document.addEventListener('htmx:wsOpen', (event) => this.opened(event.detail.socketWrapper));
+        document.addEventListener('htmx:wsClose', () => this.closed());
+        document.addEventListener('htmx:wsBeforeMessage', (event) => {
+            const message = event.detail.message;
+            if (typeof message === 'string' && message.startsWith('{')) {
+                event.preventDefault();
+                this.received(JSON.parse(message));
+            }
+        });
+    }
+
+    on(handler) {
+        this.handlers.push(handler);
+    }
+
+    subscribe({ workspaces = [], tasks = [] } = {}) {
+        workspaces.forEach((id) => this.subscriptions.workspaces.add(Number(id)));
+        tasks.forEach((id) => this.subscriptions.tasks.add(Number(id)));
+        this.send({ action: 'subscribe', workspaces, tasks });
+    }
+
+    unsubscribe({ workspaces = [], tasks = [] } = {}) {
+        workspaces.forEach((id) => this.subscriptions.workspaces.delete(Number(id)));
+        tasks.forEach((id) => this.subscriptions.tasks.delete(Number(id)));
+        workspaces.forEach((id) => delete this.seqs[`workspace:${id}`]);
+        tasks.forEach((id) => delete this.seqs[`task:${id}`]);
+        this.send({ action: 'unsubscribe', workspaces, tasks });
+    }
+
+    send(message) {
+        // Until the socket opens, subscriptions are only remembered.
+        if (this.socket) {
+            this.socket.send(JSON.stringify(message), document.body);
+        }
+    }
+
+    opened(socket) {
+        this.socket = socket;
+        this.send({
+            action: 'subscribe',
+            workspaces: [...this.subscriptions.workspaces],
+            tasks: [...this.subscriptions.tasks],
+            since: this.seqs,
+        });
+        clearInterval(this.heartbeat);
+        this.heartbeat = setInterval(() => {
+            if (!document.hidden) {
+                this.send({ action: 'heartbeat' });
+            }
+        }, HEARTBEAT_MS);
+    }
+
+    closed() {
+        this.socket = null;
+        clearInterval(this.heartbeat);
+    }
+
+    received(data) {
+        if (data.type === 'subscriptions' && data.seqs) {
+            // Where nothing was seen yet, start counting from now.
+            Object.entries(data.seqs).forEach(([subscription, seq]) => {
+                if (!(subscription in this.seqs)) {
+                    this.seqs[subscription] = seq;
+                }
+            });
+        } else if (data.type === 'resync') {
+            if (data.seq === null) {
+                delete this.seqs[data.subscription];
+            } else {
+                this.seqs[data.subscription] = data.seq;
+            }
+        } else if (data.seq !== undefined) {
+            this.seqs[data.subscription] = Math.max(data.seq, this.seqs[data.subscription] || 0);
+        }
+        if (data.type === 'revoked') {
+            data.workspaces.forEach((id) => this.subscriptions.workspaces.delete(id));
+            data.tasks.forEach((id) => this.subscriptions.tasks.delete(id));
+            data.workspaces.forEach((id) => delete this.seqs[`workspace:${id}`]);
+            data.tasks.forEach((id) => delete this.seqs[`task:${id}`]);
+        }
+        this.handlers.forEach((handler) => handler(data));
+    }
+}
+
+window.realtime = new RealtimeClient();
@@ -2,7 +2,6 @@
 class TaskDetailManager {
     constructor(taskData) {
         this.taskData = taskData;
-        this.ws = null;
         this.isEditing = {
             title: false,
             description: false,
@@ -15,50 +14,21 @@ class TaskDetailManager {
     }
 
     setupWebSocket() {
-        const protocol = window.location.protocol === 'https:' ? 'wss:' : 'ws:';
-        const wsUrl = `${protocol}//${location.host}/ws/task/${this.taskData.id}/`;
-
-        let attempts = 0;
-        const backoff = () => {
-            const base = Math.min(1000 * Math.pow(1.6, attempts), 8000);
-            const jitter = Math.random() * 300;
-            return base + jitter;
-        };
-
-        const connect = () => {
-            ('Connecting to real-time updates...', 'bg-melon/20 text-melon');
-            console.log('Attempting WebSocket connection to:', wsUrl);
-            this.ws = new WebSocket(wsUrl);
-
-            this.ws.onopen = () => {
-                attempts = 0;
-                console.log('WebSocket connected successfully');
-            };
-
-            this.ws.onmessage = (event) => {
-                console.log('WebSocket message received:', event.data);
-                const data = JSON.parse(event.data);
-                if (data.type === 'task_updated' && data.task) {
-                    this.updateTaskDisplay(data.task);
-                }
-            };
-
-            this.ws.onclose = (event) => {
-                console.log('WebSocket closed:', event.code, event.reason);
-                // Only auto-reconnect if it wasn't a normal close (1000)
-                if (event.code !== 1000) {
-                    attempts++;
-                    setTimeout(connect, backoff());
-                }
-            };
-
-            this.ws.onerror = (error) => {
-                console.error('WebSocket error:', error);
-                try { this.ws.close(); } catch {}
-            };
-        };
-
-        connect();
+        // Shares the page's multiplexed socket (static/js/realtime.js).
+        const subscription = `task:${this.taskData.id}`;
+        realtime.on((data) => {
+            if (data.subscription !== subscription) {
+                return;
+            }
+            if (data.type === 'task_updated' && data.task) {
+                this.updateTaskDisplay(data.task);
+            } else if (data.type === 'resync') {
+                location.reload(); // Missed updates the server can no longer replay
+            } else if (data.type === 'presence_changed') {
+                showPresence(document.getElementById('task-presence'), data.users);
+            }
+        });
+        realtime.subscribe({ tasks: [this.taskData.id] });
     }
 
     setupEventListeners() {
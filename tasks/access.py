@@ -0,0 +1,36 @@
+"""
+Task -> workspace lookups for realtime authorization.
+
+Subscribing to a task is allowed when its workspace is accessible
+(workspaces.access). The workspace of each task is kept in the shared cache,
+so a reconnecting client re-subscribes without touching the database.
+The entry is dropped when a task moves to another workspace.
+"""
+from django.conf import settings
+from django.core.cache import cache
+
+from workspaces.cache import delete_keys
+
+TASK_WORKSPACE_KEY = 'task_workspace:{task_id}'
+
+
+def get_task_workspace_ids(task_ids):
+    """{task_id: workspace_id} for the given ids that exist, with one query for cache misses."""
+    from .models import Task
+    keys = {TASK_WORKSPACE_KEY.format(task_id=task_id): task_id for task_id in set(task_ids)}
+    if not keys:
+        return {}
+    workspace_ids = {keys[key]: workspace_id for key, workspace_id in cache.get_many(keys).items()}
+    missing = [task_id for task_id in keys.values() if task_id not in workspace_ids]
+    if missing:
+        loaded = dict(Task.objects.filter(id__in=missing).values_list('id', 'workspace_id'))
+        cache.set_many(
+            {TASK_WORKSPACE_KEY.format(task_id=task_id): workspace_id for task_id, workspace_id in loaded.items()},
+            settings.WORKSPACE_ACCESS_CACHE_TIMEOUT,
+        )
+        workspace_ids.update(loaded)
+    return workspace_ids
+
+
+def invalidate_task_workspace(*task_ids):
+    delete_keys(TASK_WORKSPACE_KEY.format(task_id=task_id) for task_id in task_ids)
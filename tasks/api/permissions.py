@@ -14,12 +14,7 @@ class CanAccessWorkspace(permissions.BasePermission):
         if not workspace_id:
             return True
         
-        from workspaces.models import Workspace
-        try:
-            workspace = Workspace.objects.get(id=workspace_id)
-            return TaskService.user_can_access_workspace(request.user, workspace)
-        except Workspace.DoesNotExist:
-            return False
+        return TaskService.user_can_access_workspace(request.user, workspace_id)
 
 
 class CanEditTask(permissions.BasePermission):
@@ -1,6 +1,8 @@
 from rest_framework import serializers
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from ..models import Task
+from ..bulk import OPERATIONS
+from ..models import ArchivedTask, Task
 from workspaces.models import Workspace
 
 User = get_user_model()
@@ -17,10 +19,11 @@ class WorkspaceSerializer(serializers.ModelSerializer):
     owner = UserSerializer(read_only=True)
     member_count = serializers.IntegerField(read_only=True)
     task_count = serializers.IntegerField(read_only=True)
+    completed_task_count = serializers.IntegerField(read_only=True)
     
     class Meta:
         model = Workspace
-        fields = ['id', 'name', 'owner', 'member_count', 'task_count', 'created_at']
+        fields = ['id', 'name', 'owner', 'member_count', 'task_count', 'completed_task_count', 'created_at']
 
 
 class TaskListSerializer(serializers.ModelSerializer):
@@ -44,6 +47,29 @@ class TaskListSerializer(serializers.ModelSerializer):
         return obj.due_date < timezone.now().date()
 
 
+class ArchivedTaskSerializer(serializers.ModelSerializer):
+    assigned_user = UserSerializer(read_only=True)
+    created_by = UserSerializer(read_only=True)
+    
+    class Meta:
+        model = ArchivedTask
+        fields = [
+            'id', 'title', 'description', 'completed', 'due_date', 'estimated_time',
+            'assigned_user', 'created_by', 'created_at', 'updated_at', 'archived_at'
+        ]
+
+
+class TaskRestoreSerializer(serializers.Serializer):
+    ids = serializers.ListField(child=serializers.IntegerField(), allow_empty=False)
+    
+    def validate_ids(self, value):
+        if len(value) > settings.TASKS_BULK_MAX_OPERATIONS:
+            raise serializers.ValidationError(
+                f"At most {settings.TASKS_BULK_MAX_OPERATIONS} tasks per request"
+            )
+        return value
+
+
 class TaskDetailSerializer(serializers.ModelSerializer):
     assigned_user = UserSerializer(read_only=True)
     created_by = UserSerializer(read_only=True)
@@ -120,4 +146,50 @@ class TaskUpdateSerializer(serializers.ModelSerializer):
             from ..services import TaskService
             if not TaskService.user_can_access_workspace(value, self.instance.workspace):
                 raise serializers.ValidationError("Assigned user must be a workspace member")
-        return value
\ No newline at end of file
+        return value
+
+class TaskBulkOperationSerializer(serializers.Serializer):
+    """
+    One entry of a bulk request. `create` needs `workspace_id` and `title`;
+    every other op needs the task `id`, and `reassign` needs `assigned_user_id`.
+    """
+    op = serializers.ChoiceField(choices=OPERATIONS)
+    id = serializers.IntegerField(required=False)
+    workspace_id = serializers.IntegerField(required=False)
+    title = serializers.CharField(max_length=200, required=False)
+    description = serializers.CharField(required=False, allow_blank=True, allow_null=True)
+    completed = serializers.BooleanField(required=False)
+    due_date = serializers.DateField(required=False, allow_null=True)
+    estimated_time = serializers.CharField(max_length=200, required=False, allow_blank=True, allow_null=True)
+    assigned_user_id = serializers.IntegerField(required=False, allow_null=True)
+    
+    def validate(self, attrs):
+        required = {
+            'create': ('workspace_id', 'title'),
+            'reassign': ('id', 'assigned_user_id'),
+        }.get(attrs['op'], ('id',))
+        missing = {field: 'This field is required.' for field in required if field not in attrs}
+        if missing:
+            raise serializers.ValidationError(missing)
+        return attrs
+
+
+class TaskBulkSerializer(serializers.Serializer):
+    operations = TaskBulkOperationSerializer(many=True, allow_empty=False)
+    
+    def validate_operations(self, value):
+        if len(value) > settings.TASKS_BULK_MAX_OPERATIONS:
+            raise serializers.ValidationError(
+                f"At most {settings.TASKS_BULK_MAX_OPERATIONS} operations per request"
+            )
+        return value
+
+
+class TaskImportRowSerializer(serializers.Serializer):
+    """One imported row; the columns match the export format, extra columns are ignored."""
+    title = serializers.CharField(max_length=200)
+    description = serializers.CharField(required=False, allow_blank=True, allow_null=True)
+    completed = serializers.BooleanField(required=False, default=False)
+    due_date = serializers.DateField(required=False, allow_null=True)
+    estimated_time = serializers.CharField(max_length=200, required=False, allow_blank=True, allow_null=True)
+    assigned_user_email = serializers.EmailField(required=False, allow_blank=True, allow_null=True)
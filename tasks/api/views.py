@@ -1,20 +1,35 @@
-from django.shortcuts import get_object_or_404
-from django.core.exceptions import PermissionDenied
+import csv
+
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse
+from django.core.exceptions import PermissionDenied, ValidationError
 
 from rest_framework import status, serializers
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 
-from workspaces.models import WorkspaceMember
+from workspaces.models import Workspace
 from tasks.models import Task
-from .serializers import TaskUpdateSerializer, TaskDetailSerializer, TaskCreateSerializer
+from .serializers import (
+    TaskUpdateSerializer, TaskDetailSerializer, TaskCreateSerializer, TaskListSerializer, TaskBulkSerializer,
+    ArchivedTaskSerializer, TaskRestoreSerializer,
+)
+from tasks.conditional import conditional_api
+from tasks.pagination import InvalidCursor
 from tasks.services import TaskService
+from tasks.sorting import SORT_OPTIONS, DEFAULT_SORT
+from tasks.sync import CursorExpired
+from tasks.transfer import CONTENT_TYPES, aiter_chunks
 from tasks.celery_tasks import update_task_estimated_time
 
-@api_view(['PATCH', 'DELETE'])
+@api_view(['GET', 'PATCH', 'DELETE'])
 @permission_classes([IsAuthenticated])
 def update_task(request, task_id):
+    if request.method == 'GET':
+        return get_task(request, task_id)
+
     try:
         task = TaskService.get_task_with_permissions(task_id, request.user)
     except (Task.DoesNotExist, PermissionDenied):
@@ -36,15 +51,24 @@ def update_task(request, task_id):
     return Response(TaskDetailSerializer(task, context={'request': request}).data, status=status.HTTP_200_OK)
 
 
+@conditional_api
+def get_task(request, task_id):
+    try:
+        task = TaskService.get_task_with_permissions(task_id, request.user)
+    except (Task.DoesNotExist, PermissionDenied):
+        return Response({'error': 'Task not found'}, status=status.HTTP_404_NOT_FOUND)
+    return Response(TaskDetailSerializer(task, context={'request': request}).data, status=status.HTTP_200_OK)
+
+
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def create_task(request, workspace_id):
     from workspaces.services import WorkspaceService
     
     try:
-        user_workspaces = WorkspaceService.get_user_workspaces(request.user)
-        workspace = get_object_or_404(user_workspaces, id=workspace_id)
-    except:
+        user_workspaces = WorkspaceService.get_user_workspace_nav(request.user)
+        workspace = user_workspaces.get(id=workspace_id)
+    except (Workspace.DoesNotExist, ValidationError):
         return Response({'error': 'Workspace not found'}, status=status.HTTP_404_NOT_FOUND)
     
     serializer = TaskCreateSerializer(data=request.data, context={'request': request})
@@ -54,6 +78,235 @@ def create_task(request, workspace_id):
     return Response(TaskDetailSerializer(task, context={'request': request}).data, status=status.HTTP_201_CREATED)
 
 
+def _get_page_size(request):
+    """`page_size` query param clamped to TASKS_MAX_PAGE_SIZE; raises ValueError if not an integer."""
+    page_size = int(request.query_params.get('page_size', settings.TASKS_PAGE_SIZE))
+    return max(1, min(page_size, settings.TASKS_MAX_PAGE_SIZE))
+
+
+def _page_response(request, page):
+    return Response({
+        'results': TaskListSerializer(page.items, many=True, context={'request': request}).data,
+        'next_cursor': page.next_cursor,
+        'has_next': page.has_next,
+    }, status=status.HTTP_200_OK)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@conditional_api
+def list_tasks(request, workspace_id):
+    if not TaskService.user_can_access_workspace(request.user, workspace_id):
+        return Response({'error': 'Workspace not found'}, status=status.HTTP_404_NOT_FOUND)
+
+    try:
+        page_size = _get_page_size(request)
+    except ValueError:
+        return Response({'error': 'page_size must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+    include_completed = request.query_params.get('completed', 'true').lower() != 'false'
+    sort = request.query_params.get('sort', DEFAULT_SORT)
+    if sort not in SORT_OPTIONS:
+        return Response(
+            {'error': f"sort must be one of: {', '.join(SORT_OPTIONS)}"}, status=status.HTTP_400_BAD_REQUEST
+        )
+
+    try:
+        page = TaskService.get_workspace_tasks_page(
+            workspace_id,
+            request.user,
+            cursor=request.query_params.get('cursor'),
+            page_size=page_size,
+            include_completed=include_completed,
+            sort=sort,
+        )
+    except InvalidCursor as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    return _page_response(request, page)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def task_changes(request, workspace_id):
+    """
+    Tasks created or updated and ids of tasks deleted since `cursor`. Omit
+    `cursor` for a full first sync; keep calling with the returned cursor
+    while `has_more` is true.
+    """
+    try:
+        limit = int(request.query_params.get('limit', settings.TASKS_SYNC_MAX_LIMIT))
+    except ValueError:
+        return Response({'error': 'limit must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+    limit = max(1, min(limit, settings.TASKS_SYNC_MAX_LIMIT))
+
+    try:
+        page = TaskService.get_task_changes(
+            workspace_id,
+            request.user,
+            cursor=request.query_params.get('cursor'),
+            limit=limit,
+        )
+    except PermissionDenied:
+        return Response({'error': 'Workspace not found'}, status=status.HTTP_404_NOT_FOUND)
+    except CursorExpired as e:
+        return Response({'error': str(e)}, status=status.HTTP_410_GONE)
+    except InvalidCursor as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    return Response({
+        'changes': TaskListSerializer(page.changed, many=True, context={'request': request}).data,
+        'deleted': page.deleted_ids,
+        'cursor': page.cursor,
+        'has_more': page.has_more,
+    }, status=status.HTTP_200_OK)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def list_archived_tasks(request, workspace_id):
+    try:
+        page_size = _get_page_size(request)
+    except ValueError:
+        return Response({'error': 'page_size must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        page = TaskService.get_archived_tasks_page(
+            workspace_id,
+            request.user,
+            cursor=request.query_params.get('cursor'),
+            page_size=page_size,
+        )
+    except PermissionDenied:
+        return Response({'error': 'Workspace not found'}, status=status.HTTP_404_NOT_FOUND)
+    except InvalidCursor as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    return Response({
+        'results': ArchivedTaskSerializer(page.items, many=True).data,
+        'next_cursor': page.next_cursor,
+        'has_next': page.has_next,
+    }, status=status.HTTP_200_OK)
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def restore_archived_tasks(request, workspace_id):
+    serializer = TaskRestoreSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+
+    try:
+        tasks = TaskService.restore_archived_tasks(workspace_id, request.user, serializer.validated_data['ids'])
+    except PermissionDenied:
+        return Response({'error': 'Workspace not found'}, status=status.HTTP_404_NOT_FOUND)
+    except ValidationError as e:
+        return Response({'error': e.message}, status=status.HTTP_400_BAD_REQUEST)
+
+    return Response({'restored': [task.id for task in tasks]}, status=status.HTTP_200_OK)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def search_tasks(request):
+    query = request.query_params.get('q', '').strip()
+    if not query:
+        return Response({'error': 'q is required'}, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        page_size = _get_page_size(request)
+    except ValueError:
+        return Response({'error': 'page_size must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+
+    workspace_id = request.query_params.get('workspace')
+    if workspace_id is not None:
+        try:
+            workspace_id = int(workspace_id)
+        except ValueError:
+            return Response({'error': 'workspace must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        page = TaskService.search_tasks_page(
+            request.user,
+            query,
+            workspace=workspace_id,
+            cursor=request.query_params.get('cursor'),
+            page_size=page_size,
+        )
+    except PermissionDenied:
+        return Response({'error': 'Workspace not found'}, status=status.HTTP_404_NOT_FOUND)
+    except InvalidCursor as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    return _page_response(request, page)
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def bulk_tasks(request):
+    serializer = TaskBulkSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+
+    try:
+        result = TaskService.bulk_apply(request.user, serializer.validated_data['operations'])
+    except ValidationError as e:
+        return Response({'operations': e.message_dict}, status=status.HTTP_400_BAD_REQUEST)
+
+    return Response({
+        'created': [task.id for task in result.created],
+        'updated': [task.id for task in result.updated],
+        'deleted': [task.id for task in result.deleted],
+    }, status=status.HTTP_200_OK)
+
+
+def _get_file_format(request):
+    # Not `format`: DRF reserves that query parameter for renderer selection.
+    file_format = request.query_params.get('file_format', 'ndjson').lower()
+    return file_format if file_format in CONTENT_TYPES else None
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def export_tasks(request, workspace_id):
+    if not TaskService.user_can_access_workspace(request.user, workspace_id):
+        return Response({'error': 'Workspace not found'}, status=status.HTTP_404_NOT_FOUND)
+    file_format = _get_file_format(request)
+    if file_format is None:
+        return Response({'error': 'file_format must be ndjson or csv'}, status=status.HTTP_400_BAD_REQUEST)
+
+    chunks = TaskService.export_tasks(workspace_id, request.user, file_format)
+    if isinstance(request._request, ASGIRequest):
+        # A sync iterator would be read into memory whole before sending.
+        chunks = aiter_chunks(chunks)
+    response = StreamingHttpResponse(chunks, content_type=CONTENT_TYPES[file_format])
+    response['Content-Disposition'] = f'attachment; filename="workspace-{workspace_id}-tasks.{file_format}"'
+    return response
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def import_tasks(request, workspace_id):
+    if not TaskService.user_can_access_workspace(request.user, workspace_id):
+        return Response({'error': 'Workspace not found'}, status=status.HTTP_404_NOT_FOUND)
+    file_format = _get_file_format(request)
+    if file_format is None:
+        return Response({'error': 'file_format must be ndjson or csv'}, status=status.HTTP_400_BAD_REQUEST)
+
+    # Read the raw body line by line instead of request.data, so large
+    # files are never held in memory.
+    try:
+        result = TaskService.import_tasks(workspace_id, request.user, request.stream or [], file_format)
+    except UnicodeDecodeError:
+        return Response({'error': 'File must be UTF-8 encoded'}, status=status.HTTP_400_BAD_REQUEST)
+    except csv.Error as e:
+        return Response({'error': f'Invalid CSV: {e}'}, status=status.HTTP_400_BAD_REQUEST)
+
+    return Response({
+        'created': result.created,
+        'unassigned': result.unassigned,
+        'error_count': result.error_count,
+        'errors': result.errors,
+    }, status=status.HTTP_200_OK)
+
+
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def estimate_task(request, task_id):
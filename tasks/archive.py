@@ -0,0 +1,147 @@
+"""
+Archival of long-completed tasks into tasks_archivedtask.
+
+The live table only keeps what lists, counters and searches need. Tasks that
+have been completed and untouched for TASKS_ARCHIVE_AFTER_DAYS are moved by
+the `archive_completed_tasks` beat job. Each batch runs in its own short
+transaction: one INSERT ... SELECT copies the rows, and one DELETE removes
+them from tasks_task. Locks are held per batch, never for the whole run.
+
+Like tasks.bulk, this bypasses the per-task signals. Counters, tombstones,
+the search index and realtime events are handled here per batch.
+"""
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from workspaces.models import Workspace
+from . import search
+from .models import ArchivedTask, Task, TaskTombstone
+from .pagination import KeysetPaginator
+from .signals import broadcast_bulk_change, task_event_data
+
+# Columns the two tables share.
+COPIED_FIELDS = (
+    'id', 'title', 'description', 'workspace', 'assigned_user', 'created_by',
+    'due_date', 'estimated_time', 'completed', 'created_at', 'updated_at', 'sort_key',
+)
+ORDERING = ('-archived_at', '-id')
+
+
+def _columns(model, fields):
+    return ', '.join(connection.ops.quote_name(model._meta.get_field(name).column) for name in fields)
+
+
+def _move_rows(source, target, ids, **values):
+    """
+    INSERT INTO target (...) SELECT ... FROM source WHERE id IN ids, then
+    DELETE the rows from source. `values` override copied columns or fill
+    target-only ones.
+    """
+    qn = connection.ops.quote_name
+    copied = [name for name in COPIED_FIELDS if name not in values]
+    placeholders = ', '.join(['%s'] * len(ids))
+    select = ', '.join([_columns(source, copied)] + ['%s'] * len(values))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {qn(target._meta.db_table)} ({_columns(target, copied + list(values))}) "
+            f"SELECT {select} FROM {qn(source._meta.db_table)} WHERE {qn('id')} IN ({placeholders})",
+            [*values.values(), *ids],
+        )
+    moved = source.objects.filter(id__in=ids)
+    if source is Task:
+        # The callers do the per-task delete work per batch; see TaskQuerySet.delete_rows().
+        moved.delete_rows()
+    else:
+        # Nothing depends on archived rows and no signals listen: Django issues one DELETE.
+        moved.delete()
+
+
+def archive_completed_tasks(older_than_days=None, batch_size=None):
+    """Archive tasks completed and unchanged for `older_than_days`. Returns how many were moved."""
+    older_than_days = older_than_days or settings.TASKS_ARCHIVE_AFTER_DAYS
+    batch_size = batch_size or settings.TASKS_ARCHIVE_BATCH_SIZE
+    cutoff = timezone.now() - timedelta(days=older_than_days)
+    archived = 0
+    while True:
+        with transaction.atomic():
+            queryset = Task.objects.filter(completed=True, updated_at__lt=cutoff).order_by('updated_at')
+            if connection.features.has_select_for_update_skip_locked:
+                # Rows someone is editing right now are left for the next run.
+                queryset = queryset.select_for_update(skip_locked=True)
+            rows = list(queryset.values_list('id', 'workspace_id')[:batch_size])
+            if not rows:
+                break
+            _archive_batch(rows)
+        archived += len(rows)
+        if len(rows) < batch_size:
+            break
+    return archived
+
+
+def _archive_batch(rows):
+    ids = [task_id for task_id, _ in rows]
+    # The move keeps updated_at (the completion time, give or take later edits).
+    _move_rows(Task, ArchivedTask, ids, archived_at=timezone.now())
+    ids_by_workspace = defaultdict(list)
+    for task_id, workspace_id in rows:
+        ids_by_workspace[workspace_id].append(task_id)
+
+    TaskTombstone.objects.bulk_create(
+        [TaskTombstone(task_id=task_id, workspace_id=workspace_id) for task_id, workspace_id in rows]
+    )
+    for workspace_id, task_ids in ids_by_workspace.items():
+        Workspace.objects.filter(pk=workspace_id).adjust_counters(
+            task_count=-len(task_ids), completed_task_count=-len(task_ids)
+        )
+    search.unindex_tasks(ids)
+
+    def after_commit():
+        for workspace_id, task_ids in ids_by_workspace.items():
+            broadcast_bulk_change(workspace_id, deleted_ids=task_ids)
+    transaction.on_commit(after_commit)
+
+
+def archived_tasks_page(workspace_id, cursor=None, page_size=50):
+    queryset = ArchivedTask.objects.filter(workspace_id=workspace_id).select_related('assigned_user', 'created_by')
+    return KeysetPaginator(ordering=ORDERING, page_size=page_size).paginate(queryset, cursor)
+
+
+def restore_tasks(workspace_id, task_ids):
+    """
+    Move archived tasks of `workspace_id` back to the live table under their
+    original ids. Ids that are not archived in that workspace are ignored.
+    Returns the restored Task instances.
+
+    Raises ValidationError, restoring nothing, if a live task already has one
+    of the ids.
+    """
+    with transaction.atomic():
+        ids = list(
+            ArchivedTask.objects.select_for_update()
+            .filter(workspace_id=workspace_id, id__in=task_ids)
+            .values_list('id', flat=True)
+        )
+        if not ids:
+            return []
+        taken = sorted(Task.objects.filter(id__in=ids).values_list('id', flat=True))
+        if taken:
+            raise ValidationError(f"Tasks with ids {', '.join(map(str, taken))} already exist")
+        # A fresh updated_at puts the restored tasks in front of delta-sync cursors again,
+        # and removing their tombstones keeps clients from dropping them afterwards.
+        _move_rows(ArchivedTask, Task, ids, updated_at=timezone.now())
+        TaskTombstone.objects.filter(workspace_id=workspace_id, task_id__in=ids).delete()
+
+        tasks = list(Task.objects.filter(id__in=ids).select_related('assigned_user'))
+        Workspace.objects.filter(pk=workspace_id).adjust_counters(
+            task_count=len(tasks), completed_task_count=sum(1 for task in tasks if task.completed)
+        )
+        search.index_tasks(tasks)
+
+        created = [task_event_data(task) for task in tasks]
+        transaction.on_commit(lambda: broadcast_bulk_change(workspace_id, created=created))
+    return tasks
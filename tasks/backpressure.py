@@ -0,0 +1,106 @@
+"""
+Bounded outbound queues for realtime connections.
+
+RealtimeConsumer handlers never wait on the client. They put each event's
+frames on the connection's OutboundQueue, and a writer task sends them in
+order. The consumer keeps draining its channel-layer inbox however slowly
+its client reads, so one slow client cannot fill its inbox up to the
+layer's capacity or hold up sends to the rest of the group.
+
+Frames back up while a client is slow (the server's send() waits for the
+socket) or while the process is busy:
+
+- A task update or presence frame replaces a queued one for the same task
+  or group. Only the latest state is kept, and this counts as "coalesced".
+- When REALTIME_SEND_QUEUE_SIZE frames are queued, an incoming frame's
+  group loses everything it has queued, and the frame is discarded too.
+  These count as "dropped". The group gets one `resync` frame in their
+  place, which tells the client to reload that view (see tasks.replay).
+  Frames for the group are discarded until that resync frame is sent.
+
+STATS counts both, per process. Resyncs are also logged.
+"""
+import asyncio
+import itertools
+import json
+import logging
+from collections import Counter, OrderedDict
+
+from .outbox import subscription_name
+
+logger = logging.getLogger(__name__)
+
+STATS = Counter()
+
+
+def coalesce_key(group, message):
+    """Frames with the same key carry the same state; only the newest is worth sending."""
+    if message.get('type') == 'task_updated':
+        return (group, 'task', message['task']['id'])
+    if message.get('type') == 'presence_changed':
+        return (group, 'presence')
+    return None
+
+
+class OutboundQueue:
+    """
+    Frames waiting to be sent on one connection, oldest first. Each entry
+    holds one event's frames as send() keyword arguments.
+    """
+
+    def __init__(self, maxsize=100):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()  # key -> (group, frames); frames None for a resync
+        self._resyncs = {}  # group -> seq for its queued resync frame
+        self._keys = itertools.count()
+        self._ready = asyncio.Event()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def put(self, group, frames, key=None, seq=None):
+        if group in self._resyncs:
+            # The client reloads this view anyway.
+            if seq is not None:
+                self._resyncs[group] = max(seq, self._resyncs[group] or 0)
+            STATS['dropped'] += 1
+            return
+        if key is not None and key in self._entries:
+            del self._entries[key]
+            STATS['coalesced'] += 1
+        elif len(self._entries) >= self.maxsize:
+            self._resync(group, seq)
+            return
+        self._entries[key if key is not None else next(self._keys)] = (group, frames)
+        self._ready.set()
+
+    def _resync(self, group, seq):
+        dropped = [key for key, (entry_group, _) in self._entries.items() if entry_group == group]
+        for key in dropped:
+            del self._entries[key]
+        STATS['dropped'] += len(dropped) + 1
+        STATS['resyncs'] += 1
+        logger.warning("Realtime client too slow: dropped %d frames for %s, sending resync", len(dropped) + 1, group)
+        self._resyncs[group] = seq
+        self._entries[('resync', group)] = (group, None)
+        self._ready.set()
+
+    def discard(self, groups):
+        """Forget everything queued for `groups` (e.g. after unsubscribing)."""
+        for key in [key for key, (group, _) in self._entries.items() if group in groups]:
+            del self._entries[key]
+        for group in groups:
+            self._resyncs.pop(group, None)
+
+    async def get(self):
+        """The next event's frames, waiting until there is one."""
+        while not self._entries:
+            self._ready.clear()
+            await self._ready.wait()
+        _, (group, frames) = self._entries.popitem(last=False)
+        if frames is None:
+            seq = self._resyncs.pop(group)
+            frames = [{'text_data': json.dumps({
+                'type': 'resync', 'subscription': subscription_name(group), 'seq': seq,
+            })}]
+        return frames
@@ -0,0 +1,162 @@
+"""
+Helpers shared by the benchmark management commands.
+
+Seeding uses bulk_create so no post_save receivers run (no broadcasts, no
+estimation jobs). Callers are expected to run inside a transaction they roll
+back, so benchmarks never leave data behind.
+"""
+import random
+import statistics
+import time
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.utils import timezone
+
+from workspaces.models import Workspace, WorkspaceMember, Invite
+from . import search
+from .models import Task
+
+User = get_user_model()
+
+BATCH_SIZE = 2000
+
+
+class Dataset:
+    def __init__(self, users, workspaces):
+        self.users = users
+        self.workspaces = workspaces
+
+    def busiest_user(self):
+        """The user with the most memberships, i.e. the worst case for access filters."""
+        counts = {}
+        for user_id in WorkspaceMember.objects.filter(
+            workspace__in=self.workspaces
+        ).values_list('user_id', flat=True):
+            counts[user_id] = counts.get(user_id, 0) + 1
+        user_id = max(counts, key=counts.get)
+        return User.objects.get(id=user_id)
+
+
+def seed_dataset(
+    users=200,
+    workspaces=100,
+    members_per_workspace=10,
+    tasks_per_workspace=200,
+    invites_per_workspace=5,
+    prefix='bench',
+    seed=42,
+    stdout=None,
+):
+    rng = random.Random(seed)
+    started = time.perf_counter()
+
+    User.objects.bulk_create(
+        [
+            User(username=f'{prefix}-{i}@example.com', email=f'{prefix}-{i}@example.com', password='!')
+            for i in range(users)
+        ],
+        batch_size=BATCH_SIZE,
+    )
+    created_users = list(User.objects.filter(email__startswith=f'{prefix}-').order_by('id'))
+
+    Workspace.objects.bulk_create(
+        [
+            Workspace(name=f'{prefix} workspace {i}', owner=rng.choice(created_users))
+            for i in range(workspaces)
+        ],
+        batch_size=BATCH_SIZE,
+    )
+    created_workspaces = list(
+        Workspace.objects.filter(name__startswith=f'{prefix} workspace ').order_by('id')
+    )
+
+    memberships = []
+    members_by_workspace = {}
+    for workspace in created_workspaces:
+        members = {workspace.owner_id}
+        members.update(
+            user.id for user in rng.sample(created_users, min(members_per_workspace, len(created_users)))
+        )
+        members_by_workspace[workspace.id] = list(members)
+        memberships.extend(WorkspaceMember(workspace=workspace, user_id=user_id) for user_id in members)
+    WorkspaceMember.objects.bulk_create(memberships, batch_size=BATCH_SIZE)
+
+    today = timezone.now().date()
+    tasks = []
+    for workspace in created_workspaces:
+        members = members_by_workspace[workspace.id]
+        for i in range(tasks_per_workspace):
+            task = Task(
+                workspace=workspace,
+                title=f'{prefix} task {i}',
+                description='Seeded for benchmarking',
+                created_by_id=rng.choice(members),
+                assigned_user_id=rng.choice(members) if rng.random() < 0.7 else None,
+                due_date=today + timedelta(days=rng.randint(-30, 60)) if rng.random() < 0.6 else None,
+                completed=rng.random() < 0.5,
+            )
+            task.refresh_sort_key()
+            tasks.append(task)
+            if len(tasks) >= BATCH_SIZE:
+                Task.objects.bulk_create(tasks)
+                tasks = []
+    Task.objects.bulk_create(tasks)
+
+    invites = []
+    statuses = ['pending', 'accepted', 'rejected']
+    for workspace in created_workspaces:
+        for i in range(invites_per_workspace):
+            invites.append(Invite(
+                workspace=workspace,
+                email=f'{prefix}-invitee-{rng.randint(0, users * 2)}@example.com',
+                invited_by_id=workspace.owner_id,
+                status=rng.choice(statuses),
+            ))
+    Invite.objects.bulk_create(invites, batch_size=BATCH_SIZE)
+    # bulk_create skips the signals that maintain the stored counters.
+    Workspace.objects.filter(id__in=[w.id for w in created_workspaces]).recount_counters()
+    search.rebuild_index()
+
+    analyze()
+    if stdout:
+        stdout.write(
+            f'Seeded {users} users, {workspaces} workspaces, {len(memberships)} memberships, '
+            f'{workspaces * tasks_per_workspace} tasks and {len(invites)} invites '
+            f'in {time.perf_counter() - started:.1f}s'
+        )
+    return Dataset(created_users, created_workspaces)
+
+
+def analyze():
+    """Refresh planner statistics so EXPLAIN reflects the seeded data."""
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE')
+
+
+def explain(queryset):
+    return queryset.explain()
+
+
+def time_queryset(queryset, repeat=10):
+    """Median wall time in milliseconds to fully evaluate `queryset`."""
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        list(queryset.all())
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+
+def percentiles(samples, points=(50, 90, 99)):
+    """{'p50': ..., 'p90': ..., 'p99': ..., 'max': ...} of `samples` (nearest rank), or {} if empty."""
+    if not samples:
+        return {}
+    ordered = sorted(samples)
+    result = {
+        f'p{point}': ordered[min(len(ordered) - 1, max(0, -(-point * len(ordered) // 100) - 1))]
+        for point in points
+    }
+    result['max'] = ordered[-1]
+    return result
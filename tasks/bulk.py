@@ -0,0 +1,198 @@
+"""
+Bulk task operations: creates, edits, completions, reassignments and deletes
+applied in one transaction with a handful of queries.
+
+Rows are written with bulk_create, bulk_update and a single DELETE, so the
+per-task receivers in tasks.signals never run. Their work (workspace counters,
+tombstones, the search index, estimation jobs, realtime events) is done here
+once per batch, and each affected workspace gets one `tasks_bulk_changed` event.
+"""
+from collections import defaultdict
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.utils import timezone
+
+from workspaces import access
+from workspaces.models import Workspace
+from . import search
+from .celery_tasks import update_task_estimated_time
+from .models import Task, TaskTombstone
+from .signals import broadcast_bulk_change, task_event_data
+
+OPERATIONS = ('create', 'update', 'complete', 'reopen', 'reassign', 'delete')
+EDITABLE_FIELDS = ('title', 'description', 'completed', 'due_date', 'estimated_time', 'assigned_user_id')
+BATCH_SIZE = 500
+ESTIMATION_CHUNK_SIZE = 20
+
+
+class BulkResult:
+    def __init__(self, created, updated, deleted):
+        self.created = created
+        self.updated = updated
+        self.deleted = deleted
+
+
+def apply_operations(user, operations):
+    """
+    Apply validated operation dicts (see TaskBulkOperationSerializer) in order.
+
+    Nothing is written unless every operation is valid; otherwise a
+    ValidationError keyed by operation index is raised.
+    """
+    accessible_ids = access.get_accessible_workspace_ids(user)
+    with transaction.atomic():
+        # Locked until commit, so the counter deltas are taken from current values.
+        tasks = _load_tasks(operations, accessible_ids)
+        _validate(operations, tasks, accessible_ids)
+
+        created, changed, deleted, changed_fields = _apply_in_memory(user, operations, tasks)
+
+        if created:
+            for task in created:
+                task.refresh_sort_key()
+            Task.objects.bulk_create(created, batch_size=BATCH_SIZE)
+        if changed:
+            # bulk_update() does not touch auto_now fields, nor call save() for sort_key.
+            now = timezone.now()
+            update_fields = changed_fields | {'updated_at'}
+            if 'due_date' in changed_fields:
+                update_fields.add('sort_key')
+            for task in changed.values():
+                task.updated_at = now
+                task.refresh_sort_key()
+            Task.objects.bulk_update(changed.values(), update_fields, batch_size=BATCH_SIZE)
+        if deleted:
+            Task.objects.filter(id__in=deleted).delete_rows()
+            TaskTombstone.objects.bulk_create(
+                [TaskTombstone(task_id=task.id, workspace_id=task.workspace_id) for task in deleted.values()],
+                batch_size=BATCH_SIZE,
+            )
+
+        _update_counters(created, changed.values(), deleted.values())
+        reindex = list(created)
+        if changed_fields & {'title', 'description'}:
+            reindex.extend(changed.values())
+        search.index_tasks(reindex)
+        search.unindex_tasks(deleted)
+
+        result = BulkResult(created, list(changed.values()), list(deleted.values()))
+        transaction.on_commit(lambda: _after_commit(result))
+
+    return result
+
+
+def _load_tasks(operations, accessible_ids):
+    task_ids = {op['id'] for op in operations if op['op'] != 'create'}
+    if not task_ids:
+        return {}
+    # Locked in id order, so concurrent bulk requests cannot deadlock.
+    queryset = Task.objects.filter(id__in=task_ids, workspace_id__in=accessible_ids).order_by('id')
+    return {task.id: task for task in queryset.select_for_update()}
+
+
+def _validate(operations, tasks, accessible_ids):
+    errors = {}
+    assignments = []
+    for index, op in enumerate(operations):
+        if op['op'] == 'create':
+            workspace_id = op['workspace_id']
+            if workspace_id not in accessible_ids:
+                errors[str(index)] = ['Workspace not found']
+                continue
+        else:
+            task = tasks.get(op['id'])
+            if task is None:
+                errors[str(index)] = ['Task not found']
+                continue
+            workspace_id = task.workspace_id
+        if op['op'] in ('create', 'update', 'reassign') and op.get('assigned_user_id'):
+            assignments.append((index, workspace_id, op['assigned_user_id']))
+
+    # Every assignee in the batch is checked against its workspace in one query.
+    allowed = access.get_access_pairs(
+        {workspace_id for _, workspace_id, _ in assignments},
+        {user_id for _, _, user_id in assignments},
+    )
+    for index, workspace_id, user_id in assignments:
+        if (workspace_id, user_id) not in allowed:
+            errors[str(index)] = ['Assigned user must be a workspace member']
+
+    if errors:
+        raise ValidationError(errors)
+
+
+def _clean_values(op):
+    values = {field: op[field] for field in EDITABLE_FIELDS if field in op}
+    if op['op'] == 'complete':
+        values['completed'] = True
+    elif op['op'] == 'reopen':
+        values['completed'] = False
+    if 'description' in values and values['description'] is None:
+        values['description'] = ''
+    if values.get('estimated_time') == '':
+        values['estimated_time'] = None
+    return values
+
+
+def _apply_in_memory(user, operations, tasks):
+    created = []
+    changed = {}
+    deleted = {}
+    changed_fields = set()
+    for index, op in enumerate(operations):
+        if op['op'] == 'create':
+            created.append(Task(workspace_id=op['workspace_id'], created_by=user, **_clean_values(op)))
+            continue
+
+        task = tasks[op['id']]
+        if task.id in deleted:
+            raise ValidationError({str(index): ['Task was deleted earlier in this request']})
+        if op['op'] == 'delete':
+            changed.pop(task.id, None)
+            deleted[task.id] = task
+            continue
+
+        for field, value in _clean_values(op).items():
+            if getattr(task, field) != value:
+                setattr(task, field, value)
+                changed_fields.add(field)
+                changed[task.id] = task
+    return created, changed, deleted, changed_fields
+
+
+def _update_counters(created, changed, deleted):
+    deltas = defaultdict(lambda: defaultdict(int))
+    for task in created:
+        deltas[task.workspace_id]['task_count'] += 1
+        deltas[task.workspace_id]['completed_task_count'] += int(task.completed)
+    for task in changed:
+        if task.completed != task._counted_completed:
+            deltas[task.workspace_id]['completed_task_count'] += 1 if task.completed else -1
+    for task in deleted:
+        deltas[task.workspace_id]['task_count'] -= 1
+        deltas[task.workspace_id]['completed_task_count'] -= int(task._counted_completed)
+
+    for workspace_id, delta in deltas.items():
+        # Edits that cancel out leave the workspace row alone; updated_at covers them.
+        if any(delta.values()):
+            Workspace.objects.filter(pk=workspace_id).adjust_counters(**delta)
+    for task in list(created) + list(changed):
+        task.remember_counted_state()
+
+
+def _after_commit(result):
+    events = defaultdict(lambda: {'created': [], 'updated': [], 'deleted_ids': []})
+    for key, tasks in (('created', result.created), ('updated', result.updated)):
+        for task in tasks:
+            # Assignee names are looked up by the outbox dispatcher, off the request thread.
+            events[task.workspace_id][key].append(task_event_data(task))
+    for task in result.deleted:
+        events[task.workspace_id]['deleted_ids'].append(task.id)
+    for workspace_id, event in events.items():
+        broadcast_bulk_change(workspace_id, **event)
+
+    if result.created:
+        update_task_estimated_time.chunks(
+            [(task.id,) for task in result.created], ESTIMATION_CHUNK_SIZE
+        ).apply_async()
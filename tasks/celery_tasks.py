@@ -1,5 +1,9 @@
+from datetime import timedelta
+
 from django.conf import settings
-from tasks.models import Task
+from django.utils import timezone
+from tasks import estimates
+from tasks.models import Task, TaskTombstone
 from celery import shared_task
 from openai import OpenAI
 from logging import getLogger
@@ -16,25 +20,75 @@ Do not leave justifications in tha last line, the following is WRONG:
 Be witty or fun.
 """
 
+MODEL = "gpt-4o-mini"
+
 logger = getLogger()
 
 @shared_task
 def update_task_estimated_time(task_id):
     """
     Update the estimated time for a Task, based on Title and Description.
+    Tasks with the same text share one estimate (see tasks.estimates).
     """
     task = Task.objects.get(id=task_id)
+    key = estimates.cache_key(MODEL, SYSTEM_PROMPT, task.title, task.description)
+    estimated_time = estimates.get_estimate(key)
+    if estimated_time is None:
+        estimated_time = request_estimate(task)
+        estimates.set_estimate(key, estimated_time)
+    else:
+        logger.info("Cached estimate for task %s", task_id)
+    task.estimated_time = estimated_time
+    logger.info(estimated_time)
+    # Saved like any edit, so viewers get the estimate as a task_updated event.
+    task.save(update_fields=['estimated_time'])
+
+
+def request_estimate(task):
     client = OpenAI(api_key=settings.OPENAI_API_KEY)
     content = f"Title: {task.title}\nDescription: {task.description}"
     response = client.chat.completions.create(
-        model="gpt-4o-mini",
+        model=MODEL,
         messages=[
             {"role": "system", "content": SYSTEM_PROMPT},
             {"role": "user", "content": content}
         ]
     )
     logger.info(response)
-    estimated_time = response.choices[0].message.content.split('\n')[-1]
-    task.estimated_time = estimated_time
-    logger.info(estimated_time)
-    task.save()
\ No newline at end of file
+    return response.choices[0].message.content.split('\n')[-1]
+
+
+@shared_task
+def prune_task_tombstones(batch_size=5000):
+    """
+    Delete tombstones older than TASKS_TOMBSTONE_RETENTION_DAYS, a batch at a time.
+    Sync cursors older than that are rejected, so nothing reads them anymore.
+    """
+    cutoff = timezone.now() - timedelta(days=settings.TASKS_TOMBSTONE_RETENTION_DAYS)
+    pruned = 0
+    while True:
+        ids = list(
+            TaskTombstone.objects.filter(deleted_at__lt=cutoff)
+            .order_by('deleted_at')
+            .values_list('id', flat=True)[:batch_size]
+        )
+        if not ids:
+            break
+        # Nothing depends on tombstones and no signals listen, so this is one DELETE.
+        pruned += TaskTombstone.objects.filter(id__in=ids).delete()[0]
+        if len(ids) < batch_size:
+            break
+    logger.info("Pruned %d task tombstones", pruned)
+    return pruned
+
+
+@shared_task
+def archive_completed_tasks():
+    """
+    Move tasks completed more than TASKS_ARCHIVE_AFTER_DAYS ago to the archive table.
+    """
+    from tasks import archive
+
+    archived = archive.archive_completed_tasks()
+    logger.info("Archived %d completed tasks", archived)
+    return archived
@@ -0,0 +1,119 @@
+"""
+Validators for conditional GETs on the task pages and JSON endpoints.
+
+A response is identified by who is asking plus the workspace's state:
+`Workspace.version`, which task counter and membership changes, imports
+and renames bump, and the latest `updated_at` among its tasks, which every
+other task edit moves. Edits that leave the counters alone then never
+write the workspace row. Both come from one query (a primary-key lookup
+plus a probe of the task_ws_updated_idx index). A matching If-None-Match
+returns 304 before the main queryset runs or the template renders.
+
+Responses also depend on the date (is_overdue, the overdue sort, "3 days
+ago"), so it is part of every ETag. There is no Last-Modified: a timestamp
+cannot express the date dependency, and at one-second resolution it would
+hide a second change within the same second.
+"""
+import hashlib
+from functools import wraps
+
+from django.contrib import messages
+from django.db.models import OuterRef, Subquery
+from django.utils import timezone
+from django.utils.cache import patch_cache_control
+from django.utils.decorators import method_decorator
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition
+
+from workspaces import access
+from workspaces.models import Workspace
+from workspaces.services import WorkspaceService, InviteService
+from .models import Task
+
+MEMO_ATTR = '_task_conditional_state'
+
+
+def _latest_task_change(workspace):
+    return Subquery(Task.objects.filter(workspace=workspace).order_by('-updated_at').values('updated_at')[:1])
+
+
+def _workspace_state(request, workspace_id=None, task_id=None):
+    """(workspace_id, version, latest task change) the request is about, or None if not accessible."""
+    memo = getattr(request, MEMO_ATTR, None)
+    if memo is None:
+        memo = {}
+        setattr(request, MEMO_ATTR, memo)
+    key = (workspace_id, task_id)
+    if key in memo:
+        return memo[key]
+
+    state = None
+    if request.user.is_authenticated:
+        if task_id is not None:
+            state = Task.objects.filter(id=task_id).values_list(
+                'workspace_id', 'workspace__version', _latest_task_change(OuterRef('workspace_id'))
+            ).first()
+        elif workspace_id is not None:
+            state = Workspace.objects.filter(id=workspace_id).values_list(
+                'id', 'version', _latest_task_change(OuterRef('pk'))
+            ).first()
+        if state is not None and not access.user_can_access_workspace(request.user, state[0]):
+            state = None
+    memo[key] = state
+    return state
+
+
+def _etag(*parts):
+    return hashlib.md5(repr(parts).encode()).hexdigest()
+
+
+def page_etag(request, workspace_id=None, task_id=None):
+    # Pending flash messages are rendered once, so that response must not be skipped.
+    if len(messages.get_messages(request)):
+        return None
+    state = _workspace_state(request, workspace_id, task_id)
+    if state is None:
+        return None
+    user = request.user
+    return _etag(
+        *state,
+        timezone.localdate(),
+        user.pk,
+        request.get_full_path(),
+        request.headers.get('HX-Request'),
+        # A new CSRF secret (e.g. after logging in again) makes cached forms stale.
+        request.META.get('CSRF_COOKIE'),
+        WorkspaceService.get_cached_workspace_nav(user),
+        [invite.pk for invite in InviteService.get_cached_pending_invites_for_user(user)],
+    )
+
+
+def api_etag(request, workspace_id=None, task_id=None):
+    state = _workspace_state(request, workspace_id, task_id)
+    if state is None:
+        return None
+    return _etag(*state, timezone.localdate(), request.user.pk, request.get_full_path())
+
+
+def conditional_page(view_class):
+    """Class decorator adding ETag handling to a task page view."""
+    decorators = [
+        cache_control(private=True, no_cache=True),
+        condition(etag_func=page_etag),
+    ]
+    return method_decorator(decorators, name='dispatch')(view_class)
+
+
+def conditional_api(view_func):
+    """
+    ETag handling for a JSON function view. Apply it below @api_view;
+    cache_control() itself rejects DRF's Request.
+    """
+    conditional_view = condition(etag_func=api_etag)(view_func)
+
+    @wraps(view_func)
+    def inner(request, *args, **kwargs):
+        response = conditional_view(request, *args, **kwargs)
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+    return inner
@@ -1,120 +1,260 @@
+import asyncio
 import json
+from urllib.parse import parse_qs
 from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.db import database_sync_to_async
+from django.conf import settings
 from django.contrib.auth.models import AnonymousUser
-from django.apps import apps
+from workspaces.access import forget_memo, get_accessible_workspace_ids
+from . import outbox, presence, replay
+from .backpressure import OutboundQueue, coalesce_key
+from .access import get_task_workspace_ids
 
 
-class TaskConsumer(AsyncWebsocketConsumer):
+class RealtimeConsumer(AsyncWebsocketConsumer):
+    """
+    One socket per client, multiplexing workspace and task updates.
+
+    The client sends {"action": "subscribe" | "unsubscribe", "workspaces": [ids],
+    "tasks": [ids]}. Access to a whole subscribe message is checked at once,
+    and group membership is changed only for what was added or removed.
+    Every event frame carries "subscription" ("workspace:<id>" / "task:<id>").
+
+    Event frames arrive pre-encoded by tasks.outbox and are forwarded as is.
+    Clients that offer the "msgpack" subprotocol get them as binary msgpack
+    frames; control frames (subscriptions, revoked, errors) are always JSON text.
+
+    Access is checked against the cached membership map, never re-polled.
+    Each socket also joins its user's control group (`user_<id>`): when the
+    user loses a workspace (workspaces.access.revoke_access) or a subscribed
+    task moves elsewhere, the affected subscriptions are dropped at once and
+    the client gets a "revoked" frame. A socket left with no subscriptions
+    is closed with REVOKED_CLOSE_CODE.
+
+    Connections opened with ?html=1 (pages using the htmx ws extension) also
+    get the rendered task rows of workspace events as a separate text frame
+    after the event frame (see tasks.fragments).
+
+    Event frames carry their group's sequence number ("seq", see
+    tasks.replay). A reconnecting client adds "since": {"workspace:<id>":
+    last seq, ...} to its subscribe message. The consumer then replays the
+    missed events from the log, or sends {"type": "resync", "subscription":
+    ...} when the log no longer covers the gap. The "subscriptions" reply
+    has the current "seqs" of the subscribed groups.
+
+    Event frames go out through a bounded per-connection queue
+    (tasks.backpressure). A slow client gets coalesced updates, or a
+    "resync" frame once too much has backed up, instead of stalling the
+    consumer's inbox.
+
+    Subscribing also marks the user present in those groups (tasks.presence);
+    clients keep that alive with {"action": "heartbeat"} and receive
+    "presence_changed" frames.
+    """
+    KINDS = {'workspaces': 'workspace', 'tasks': 'task'}
+    REVOKED_CLOSE_CODE = 4403
+
     async def connect(self):
-        self.task_id = self.scope['url_route']['kwargs']['task_id']
-        self.room_group_name = f'task_{self.task_id}'
-        
-        print(f"TaskConsumer connect: task_id={self.task_id}, user={self.scope['user']}")
-        
         if self.scope["user"] == AnonymousUser():
-            print("TaskConsumer: Anonymous user, closing connection")
             await self.close()
             return
-            
-        has_access = await self.check_task_access()
-        if not has_access:
-            print(f"TaskConsumer: User {self.scope['user']} has no access to task {self.task_id}")
-            await self.close()
+        self.groups_joined = set()
+        # Highest seq replayed per group; live copies of those are skipped.
+        self.replayed = {}
+        # Workspace of every subscribed task, for revocations.
+        self.task_workspaces = {}
+        self.control_group = f'user_{self.scope["user"].pk}'
+        await self.channel_layer.group_add(self.control_group, self.channel_name)
+        self.binary = outbox.msgpack is not None and 'msgpack' in self.scope.get('subprotocols', ())
+        self.html = parse_qs(self.scope.get('query_string', b'').decode()).get('html') == ['1']
+        await self.accept(subprotocol='msgpack' if self.binary else None)
+        self.outbound = OutboundQueue(settings.REALTIME_SEND_QUEUE_SIZE)
+        self.writer = asyncio.ensure_future(self.write())
+
+    async def disconnect(self, close_code):
+        if hasattr(self, 'writer'):
+            self.writer.cancel()
+        if hasattr(self, 'control_group'):
+            await self.channel_layer.group_discard(self.control_group, self.channel_name)
+        if getattr(self, 'groups_joined', None):
+            await self.leave(set(self.groups_joined))
+
+    async def receive(self, text_data=None, bytes_data=None):
+        try:
+            message = json.loads(text_data or '')
+            action = message['action']
+            requested = {kind: {int(pk) for pk in message.get(kind) or []} for kind in self.KINDS}
+            since = {str(key): int(seq) for key, seq in (message.get('since') or {}).items()}
+        except (ValueError, TypeError, KeyError, AttributeError):
+            await self.send_error('Invalid message')
+            return
+        if sum(len(ids) for ids in requested.values()) > settings.REALTIME_MAX_SUBSCRIPTIONS:
+            await self.send_error(f'At most {settings.REALTIME_MAX_SUBSCRIPTIONS} subscriptions per connection')
             return
 
-        await self.channel_layer.group_add(
-            self.room_group_name,
-            self.channel_name
-        )
-        print(f"TaskConsumer: User {self.scope['user']} connected to task {self.task_id}")
-        await self.accept()
+        if action == 'heartbeat':
+            presence.get_tracker().touch(self.groups_joined, self.scope["user"].pk, self.channel_name)
+        elif action == 'unsubscribe':
+            await self.leave({f'{self.KINDS[kind]}_{pk}' for kind, ids in requested.items() for pk in ids})
+            await self.send_subscriptions()
+        elif action == 'subscribe':
+            await self.subscribe(requested, since)
+        else:
+            await self.send_error(f'Unknown action: {action}')
 
-    async def disconnect(self, close_code):
-        await self.channel_layer.group_discard(
-            self.room_group_name,
-            self.channel_name
-        )
+    async def subscribe(self, requested, since=None):
+        allowed = await self.check_access(requested['workspaces'], requested['tasks'])
+        denied = {
+            kind: sorted(set(requested[kind]) - set(allowed[kind])) for kind in self.KINDS
+        }
+        new_groups = {
+            f'{self.KINDS[kind]}_{pk}' for kind, ids in allowed.items() for pk in ids
+        } - self.groups_joined
+        room = settings.REALTIME_MAX_SUBSCRIPTIONS - len(self.groups_joined)
+        if len(new_groups) > room:
+            await self.send_error(f'At most {settings.REALTIME_MAX_SUBSCRIPTIONS} subscriptions per connection')
+            return
+        for group in new_groups:
+            await self.channel_layer.group_add(group, self.channel_name)
+        self.groups_joined |= new_groups
+        self.task_workspaces.update(allowed['tasks'])
+        presence.get_tracker().join(new_groups, self.scope["user"].pk, self.channel_name)
 
-    async def task_updated(self, event):
-        await self.send(text_data=json.dumps({
-            'type': 'task_updated',
-            'task': event.get('task'),
-        }))
-        
-    async def task_created(self, event):
-        await self.send(text_data=json.dumps({
-            'type': 'task_created',
-            'task': event.get('task'),
-        }))
+        # Joined before reading the log, so nothing falls between the two.
+        groups = [f'{self.KINDS[kind]}_{pk}' for kind, ids in allowed.items() for pk in ids]
+        backlog = await self.read_replay_log({
+            group: (since or {}).get(outbox.subscription_name(group)) for group in groups
+        })
+        await self.send_subscriptions(denied=denied, seqs={
+            outbox.subscription_name(group): current for group, (current, _) in backlog.items()
+        })
+        for group, (current, entries) in backlog.items():
+            if entries is None:
+                await self.send(text_data=json.dumps({
+                    'type': 'resync', 'subscription': outbox.subscription_name(group), 'seq': current,
+                }))
+                continue
+            for seq, message in entries:
+                await self.forward(outbox.encode_frames(group, {**message, 'seq': seq}))
+            if entries:
+                self.replayed[group] = entries[-1][0]
 
     @database_sync_to_async
-    def check_task_access(self):
-        Task = apps.get_model('tasks', 'Task')
-        WorkspaceMember = apps.get_model('workspaces', 'WorkspaceMember')
-        try:
-            task = Task.objects.select_related('workspace').get(id=self.task_id)
-            user = self.scope["user"]
-            # Check if user is owner or member of the workspace
-            return (task.workspace.owner == user or 
-                    WorkspaceMember.objects.filter(workspace=task.workspace, user=user).exists())
-        except Task.DoesNotExist:
-            return False
+    def read_replay_log(self, last_seqs):
+        """{group: (current seq, entries after the given last seq or None)} for {group: last seq}."""
+        log = replay.get_replay_log()
+        return {group: log.since(group, last_seq) for group, last_seq in last_seqs.items()}
 
+    async def leave(self, groups):
+        groups = groups & self.groups_joined
+        for group in groups:
+            await self.channel_layer.group_discard(group, self.channel_name)
+        self.groups_joined -= groups
+        for group in groups:
+            self.replayed.pop(group, None)
+        self.outbound.discard(groups)
+        presence.get_tracker().leave(groups, self.scope["user"].pk, self.channel_name)
+        for group in groups:
+            if group.startswith('task_'):
+                self.task_workspaces.pop(int(group.split('_', 1)[1]), None)
 
-class WorkspaceConsumer(AsyncWebsocketConsumer):
-    async def connect(self):
-        self.workspace_id = self.scope['url_route']['kwargs']['workspace_id']
-        self.room_group_name = f'workspace_{self.workspace_id}'
-        
-        if self.scope["user"] == AnonymousUser():
-            await self.close()
+    async def revoke(self, workspaces=(), tasks=()):
+        """Drop subscriptions the user may no longer see and tell the client."""
+        groups = {f'workspace_{pk}' for pk in workspaces} | {f'task_{pk}' for pk in tasks}
+        groups &= self.groups_joined
+        if not groups:
             return
-            
-        has_access = await self.check_workspace_access()
-        if not has_access:
-            await self.close()
+        await self.leave(groups)
+        await self.send(text_data=json.dumps({
+            'type': 'revoked',
+            'workspaces': sorted(workspaces),
+            'tasks': sorted(tasks),
+        }))
+        if not self.groups_joined:
+            await self.close(code=self.REVOKED_CLOSE_CODE)
+
+    async def access_revoked(self, event):
+        workspace_id = event['workspace_id']
+        # Still accessible another way (e.g. removed as member of a workspace they own).
+        if workspace_id in await self.accessible_workspace_ids():
             return
+        tasks = [task_id for task_id, pk in self.task_workspaces.items() if pk == workspace_id]
+        await self.revoke(workspaces=[workspace_id], tasks=tasks)
 
-        await self.channel_layer.group_add(
-            self.room_group_name,
-            self.channel_name
-        )
-        await self.accept()
+    async def task_moved(self, event):
+        task_id, workspace_id = event['task_id'], event['workspace_id']
+        if task_id not in self.task_workspaces:
+            return
+        if workspace_id in await self.accessible_workspace_ids():
+            self.task_workspaces[task_id] = workspace_id
+        else:
+            await self.revoke(tasks=[task_id])
 
-    async def disconnect(self, close_code):
-        await self.channel_layer.group_discard(
-            self.room_group_name,
-            self.channel_name
-        )
+    async def send_subscriptions(self, denied=None, seqs=None):
+        frame = {'type': 'subscriptions'}
+        for kind, prefix in self.KINDS.items():
+            frame[kind] = sorted(
+                int(group.split('_', 1)[1]) for group in self.groups_joined if group.startswith(f'{prefix}_')
+            )
+        if denied is not None:
+            frame['denied'] = denied
+        if seqs is not None:
+            frame['seqs'] = seqs
+        await self.send(text_data=json.dumps(frame))
 
-    async def task_created(self, event):
-        await self.send(text_data=json.dumps({
-            'type': 'task_created',
-            'task': event.get('task'),
-        }))
+    async def send_error(self, error):
+        await self.send(text_data=json.dumps({'type': 'error', 'error': error}))
 
-    async def task_updated(self, event):
-        await self.send(text_data=json.dumps({
-            'type': 'task_updated',
-            'task': event.get('task'),
-        }))
+    async def forward(self, event):
+        group, seq = event.get('group', ''), event.get('seq')
+        if seq is not None and seq <= self.replayed.get(group, 0):
+            return
+        if self.binary and 'frame_msgpack' in event:
+            frames = [{'bytes_data': event['frame_msgpack']}]
+        elif 'frame' in event:
+            frames = [{'text_data': event['frame']}]
+        else:
+            # Sent without the outbox; encode it here.
+            message = {key: value for key, value in event.items() if key != 'group'}
+            frames = [{'text_data': json.dumps(outbox.client_frame(group, message))}]
+        if self.html and 'html' in event:
+            frames.append({'text_data': event['html']})
+        self.outbound.put(group, frames, key=coalesce_key(group, event), seq=seq)
 
-    async def task_deleted(self, event):
-        await self.send(text_data=json.dumps({
-            'type': 'task_deleted',
-            'task_id': event['task_id'],
-        }))
+    async def write(self):
+        """Send queued event frames to the client, in order, for as long as the socket is open."""
+        while True:
+            for frame in await self.outbound.get():
+                await self.send(**frame)
+
+    task_created = forward
+    task_updated = forward
+    task_deleted = forward
+    tasks_bulk_changed = forward
+    tasks_imported = forward
+    presence_changed = forward
 
     @database_sync_to_async
-    def check_workspace_access(self):
-        Workspace = apps.get_model('workspaces', 'Workspace')
-        WorkspaceMember = apps.get_model('workspaces', 'WorkspaceMember')
-        try:
-            workspace = Workspace.objects.get(id=self.workspace_id)
-            user = self.scope["user"]
-            # Check if user is owner or member of the workspace
-            return (workspace.owner == user or 
-                    WorkspaceMember.objects.filter(workspace=workspace, user=user).exists())
-        except Workspace.DoesNotExist:
-            return False
\ No newline at end of file
+    def accessible_workspace_ids(self):
+        user = self.scope["user"]
+        # The connection outlives any request, so never trust an earlier memo.
+        forget_memo(user)
+        return get_accessible_workspace_ids(user)
+
+    @database_sync_to_async
+    def check_access(self, workspace_ids, task_ids):
+        """
+        {'workspaces': allowed ids, 'tasks': {allowed id: workspace id}}, served
+        from the cache; only cache misses reach the database.
+        """
+        user = self.scope["user"]
+        forget_memo(user)
+        accessible = get_accessible_workspace_ids(user)
+        return {
+            'workspaces': {pk for pk in workspace_ids if pk in accessible},
+            'tasks': {
+                task_id: workspace_id
+                for task_id, workspace_id in get_task_workspace_ids(task_ids).items()
+                if workspace_id in accessible
+            },
+        }
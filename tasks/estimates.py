@@ -0,0 +1,92 @@
+"""
+Cache for AI time estimates.
+
+Estimates depend only on the prompt, so identical tasks (recurring "Weekly
+sync" tasks, duplicates, imports) share one. The key is a hash of the model,
+the system prompt and the title and description after normalization
+(whitespace collapsed, case folded). Changing the model or the prompt
+starts a new cache.
+
+Each worker process keeps the ESTIMATE_CACHE_SIZE most recently used
+estimates in memory. Behind it sits the shared cache (Redis), so one
+worker's answer serves the others. Entries expire from both after
+ESTIMATE_CACHE_TTL_SECONDS.
+"""
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+
+ESTIMATE_KEY = 'estimate:{digest}'
+
+
+def normalize(text):
+    return ' '.join((text or '').split()).casefold()
+
+
+def cache_key(model, system_prompt, title, description):
+    digest = hashlib.sha256(json.dumps(
+        [model, system_prompt, normalize(title), normalize(description)]
+    ).encode()).hexdigest()
+    return ESTIMATE_KEY.format(digest=digest)
+
+
+class LRUCache:
+    """A small in-process cache: least recently used entries go first, and every entry expires."""
+
+    def __init__(self, maxsize=1024, ttl=24 * 60 * 60):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (expires, value)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+
+_local = None
+_local_lock = threading.Lock()
+
+
+def _get_local():
+    global _local
+    if _local is None:
+        with _local_lock:
+            if _local is None:
+                _local = LRUCache(settings.ESTIMATE_CACHE_SIZE, settings.ESTIMATE_CACHE_TTL_SECONDS)
+    return _local
+
+
+def get_estimate(key):
+    """The cached estimate for `key`, or None."""
+    local = _get_local()
+    estimate = local.get(key)
+    if estimate is None:
+        estimate = cache.get(key)
+        if estimate is not None:
+            local.set(key, estimate)
+    return estimate
+
+
+def set_estimate(key, estimate):
+    _get_local().set(key, estimate)
+    cache.set(key, estimate, settings.ESTIMATE_CACHE_TTL_SECONDS)
@@ -0,0 +1,63 @@
+"""
+Task list rows rendered for realtime pushes.
+
+Workspace events carry their rows as one htmx out-of-band fragment, rendered
+once per event by tasks.outbox.encode_frames. Pages that connect with
+?html=1 get it as an extra text frame, and the htmx ws extension swaps it
+into #task-list. Viewers patch their list in place instead of reloading it.
+
+New rows only go into a list marked data-live-inserts (the first page of
+the newest-first sort); other pages and sorts only see updates and removals.
+"""
+from django.template.loader import render_to_string
+from django.utils.dateparse import parse_date, parse_datetime
+
+from todos_project.context_processors import UserColors
+
+ROW_TEMPLATE = 'tasks/task_row.html'
+INSERT_TARGET = '#task-list[data-live-inserts]'
+EMPTY_STATE_ID = 'task-list-empty'
+
+
+def row_data(task):
+    """An event payload task (tasks.signals.task_event_data) in the shape task_row.html reads."""
+    return {
+        **task,
+        'created_at': parse_datetime(task['created_at']) if task.get('created_at') else None,
+        'due_date': parse_date(task['due_date']) if task.get('due_date') else None,
+        'assigned_user': {
+            'id': task['assigned_user_id'], 'username': task['assigned_user_name'],
+        } if task.get('assigned_user_id') else None,
+    }
+
+
+def render_row(task, oob=None):
+    return render_to_string(ROW_TEMPLATE, {'task': row_data(task), 'oob': oob, 'user_colors': UserColors()})
+
+
+def _delete(element_id):
+    return f'<div id="{element_id}" hx-swap-oob="delete"></div>'
+
+
+def workspace_fragment(message):
+    """htmx OOB markup for a workspace event, or None for events without row changes."""
+    type_ = message.get('type')
+    if type_ == 'task_created':
+        created, updated, deleted_ids = [message['task']], [], []
+    elif type_ == 'task_updated':
+        created, updated, deleted_ids = [], [message['task']], []
+    elif type_ == 'task_deleted':
+        created, updated, deleted_ids = [], [], [message['task_id']]
+    elif type_ == 'tasks_bulk_changed':
+        created, updated, deleted_ids = message['created'], message['updated'], message['deleted_ids']
+    else:
+        return None
+
+    parts = [render_row(task, oob='true') for task in updated]
+    parts += [_delete(f'task-{task_id}') for task_id in deleted_ids]
+    if created:
+        # Newest first, like the list itself.
+        rows = ''.join(render_row(task) for task in reversed(created))
+        parts.append(f'<div hx-swap-oob="afterbegin:{INSERT_TARGET}">{rows}</div>')
+        parts.append(_delete(EMPTY_STATE_ID))
+    return ''.join(parts) or None
@@ -0,0 +1,68 @@
+from django.core.management.base import BaseCommand
+from django.db import connection, models, transaction
+
+from workspaces.models import Workspace
+from tasks.benchmarking import explain, seed_dataset, time_queryset
+from tasks.models import Task
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare the JOIN + DISTINCT and EXISTS forms of Workspace.objects.for_user() and '
+        'Task.objects.for_user_access() on a seeded dataset. Runs in a rolled-back transaction.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=2000)
+        parser.add_argument('--workspaces', type=int, default=3000)
+        parser.add_argument('--members', type=int, default=20, help='Members per workspace')
+        parser.add_argument('--tasks', type=int, default=10, help='Tasks per workspace')
+        parser.add_argument('--repeat', type=int, default=20, help='Timing samples per query')
+        parser.add_argument('--verbose-plans', action='store_true', help='Print full EXPLAIN output')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            dataset = seed_dataset(
+                users=options['users'],
+                workspaces=options['workspaces'],
+                members_per_workspace=options['members'],
+                tasks_per_workspace=options['tasks'],
+                invites_per_workspace=0,
+                stdout=self.stdout,
+            )
+            user = dataset.busiest_user()
+            comparisons = [
+                ('Workspace.for_user', self.join_workspaces(user), Workspace.objects.for_user(user)),
+                ('Task.for_user_access', self.join_tasks(user), Task.objects.for_user_access(user)),
+            ]
+
+            self.stdout.write(f'Database: {connection.vendor}, user {user.email}')
+            self.stdout.write(f'{"query":<22} {"rows":>6} {"join ms":>10} {"exists ms":>10} {"speedup":>8}')
+            for label, join_qs, exists_qs in comparisons:
+                join_ids = set(join_qs.values_list('id', flat=True))
+                exists_ids = set(exists_qs.values_list('id', flat=True))
+                if join_ids != exists_ids:
+                    self.stderr.write(self.style.ERROR(f'{label}: result sets differ'))
+                join_ms = time_queryset(join_qs, repeat=options['repeat'])
+                exists_ms = time_queryset(exists_qs, repeat=options['repeat'])
+                speedup = join_ms / exists_ms if exists_ms else float('inf')
+                self.stdout.write(
+                    f'{label:<22} {len(exists_ids):>6} {join_ms:>10.2f} {exists_ms:>10.2f} {speedup:>7.1f}x'
+                )
+                if options['verbose_plans']:
+                    self.stdout.write(f'  join:   {explain(join_qs)}')
+                    self.stdout.write(f'  exists: {explain(exists_qs)}')
+
+            transaction.set_rollback(True)
+
+    def join_workspaces(self, user):
+        """The previous for_user() implementation."""
+        return Workspace.objects.filter(
+            models.Q(owner=user) | models.Q(members__user=user)
+        ).distinct()
+
+    def join_tasks(self, user):
+        """The previous for_user_access() implementation."""
+        return Task.objects.filter(
+            models.Q(workspace__owner=user) | models.Q(workspace__members__user=user)
+        ).distinct()
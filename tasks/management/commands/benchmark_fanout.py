@@ -0,0 +1,92 @@
+import asyncio
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from tasks import outbox
+from tasks.backpressure import OutboundQueue
+from tasks.consumers import RealtimeConsumer
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure the CPU cost of fanning one task event out to many realtime consumers: '
+        'encoding the frame in every consumer versus forwarding the frame the outbox '
+        'encoded once. No channel layer or sockets are involved.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--consumers', type=int, default=2000, help='Connected sockets per event')
+        parser.add_argument('--events', type=int, default=50)
+        parser.add_argument('--description-length', type=int, default=500)
+
+    def handle(self, *args, **options):
+        message = self.make_message(options['description_length'])
+        group = 'workspace_1'
+        modes = [
+            ('encode per consumer', False, False),
+            ('pre-encoded json', True, False),
+        ]
+        if outbox.msgpack is not None:
+            modes.append(('pre-encoded msgpack', True, True))
+
+        self.stdout.write(f'{options["consumers"]} consumers, {options["events"]} events')
+        self.stdout.write(f'{"mode":<22} {"ms/event":>10} {"us/delivery":>12} {"bytes":>8}')
+        for label, pre_encoded, binary in modes:
+            consumers = [self.make_consumer(binary) for _ in range(options['consumers'])]
+            cpu, sent = asyncio.run(self.fan_out(consumers, group, message, options['events'], pre_encoded))
+            per_event = cpu / options['events']
+            self.stdout.write(
+                f'{label:<22} {per_event * 1000:>10.2f} {per_event / options["consumers"] * 1e6:>12.2f} {sent:>8}'
+            )
+
+    async def fan_out(self, consumers, group, message, events, pre_encoded):
+        writers = [asyncio.ensure_future(consumer.write()) for consumer in consumers]
+        start = time.process_time()
+        for _ in range(events):
+            if pre_encoded:
+                event = outbox.encode_frames(group, message)
+            else:
+                event = {**message, 'group': group}
+            for consumer in consumers:
+                await consumer.forward(event)
+            # Let the writers send it before the next event coalesces with it.
+            while any(consumer.outbound for consumer in consumers):
+                await asyncio.sleep(0)
+        elapsed = time.process_time() - start
+        for writer in writers:
+            writer.cancel()
+        await asyncio.gather(*writers, return_exceptions=True)
+        return elapsed, consumers[0].last_size
+
+    def make_consumer(self, binary):
+        consumer = RealtimeConsumer()
+        consumer.binary = binary
+        consumer.html = False
+        consumer.replayed = {}
+        consumer.outbound = OutboundQueue(settings.REALTIME_SEND_QUEUE_SIZE)
+        consumer.last_size = 0
+
+        async def send(text_data=None, bytes_data=None, close=False):
+            consumer.last_size = len(bytes_data if bytes_data is not None else text_data.encode())
+        consumer.send = send
+        return consumer
+
+    def make_message(self, description_length):
+        return {
+            'type': 'task_updated',
+            'task': {
+                'id': 12345,
+                'title': 'Benchmark task with a realistic title',
+                'description': 'x' * description_length,
+                'completed': False,
+                'workspace_id': 1,
+                'assigned_user_id': 7,
+                'assigned_user_name': 'someone@example.com',
+                'due_date': timezone.now().date().isoformat(),
+                'estimated_time': 'Several hours',
+                'updated_at': timezone.now().isoformat(),
+            },
+        }
@@ -0,0 +1,116 @@
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from workspaces.models import Invite, WorkspaceMember
+from tasks.benchmarking import analyze, explain, seed_dataset, time_queryset
+from tasks.models import Task
+
+
+class Command(BaseCommand):
+    help = (
+        'Seed a throwaway dataset and print EXPLAIN plans and timings for the hot '
+        'Task, WorkspaceMember and Invite queries with and without their composite indexes. '
+        'Everything runs in a transaction that is rolled back.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=500)
+        parser.add_argument('--workspaces', type=int, default=200)
+        parser.add_argument('--members', type=int, default=10, help='Members per workspace')
+        parser.add_argument('--tasks', type=int, default=250, help='Tasks per workspace')
+        parser.add_argument('--invites', type=int, default=20, help='Invites per workspace')
+        parser.add_argument('--repeat', type=int, default=20, help='Timing samples per query')
+        parser.add_argument('--verbose-plans', action='store_true', help='Print full EXPLAIN output')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            dataset = seed_dataset(
+                users=options['users'],
+                workspaces=options['workspaces'],
+                members_per_workspace=options['members'],
+                tasks_per_workspace=options['tasks'],
+                invites_per_workspace=options['invites'],
+                stdout=self.stdout,
+            )
+            queries = self.get_queries(dataset)
+            indexes = self.get_indexes()
+
+            self.set_indexes(indexes, enabled=False)
+            before = self.run_queries(queries, options)
+            self.set_indexes(indexes, enabled=True)
+            after = self.run_queries(queries, options)
+
+            self.report(queries, before, after, options)
+            transaction.set_rollback(True)
+
+    def get_indexes(self):
+        return [
+            (model, index)
+            for model in (Task, WorkspaceMember, Invite)
+            for index in model._meta.indexes
+        ]
+
+    def get_queries(self, dataset):
+        workspace = dataset.workspaces[len(dataset.workspaces) // 2]
+        user = dataset.busiest_user()
+        invite = Invite.objects.pending().filter(workspace__in=dataset.workspaces).first()
+        invite_email = invite.email if invite else ''
+        return [
+            ('task list page', 'task_ws_created_idx',
+             Task.objects.in_workspace(workspace).order_by('-created_at', '-id')[:50]),
+            ('pending in workspace', 'task_ws_pending_created_idx',
+             Task.objects.in_workspace(workspace).pending().order_by('-created_at', '-id')[:50]),
+            ('priority order page', 'task_ws_priority_idx',
+             Task.objects.in_workspace(workspace).ordered_by_priority()[:50]),
+            ('due soon in workspace', 'task_ws_pending_due_idx',
+             Task.objects.in_workspace(workspace).due_soon().order_by('due_date')),
+            ('overdue in workspace', 'task_ws_pending_due_idx',
+             Task.objects.in_workspace(workspace).overdue().order_by('due_date')),
+            ('assigned pending by due', 'task_assignee_pending_due_idx',
+             Task.objects.assigned_to(user).pending().order_by('due_date')),
+            ('assigned overdue', 'task_assignee_pending_due_idx',
+             Task.objects.assigned_to(user).overdue().order_by('due_date')),
+            ('user memberships', 'member_user_ws_idx',
+             WorkspaceMember.objects.for_user(user).values_list('workspace_id', flat=True)),
+            ('pending invites for email', 'invite_pending_email_idx',
+             Invite.objects.for_email(invite_email).pending()),
+            ('duplicate invite check', 'invite_pending_ws_email_idx',
+             Invite.objects.for_workspace(workspace).for_email(invite_email).pending()),
+        ]
+
+    def set_indexes(self, indexes, enabled):
+        editor = connection.schema_editor()
+        for model, index in indexes:
+            if enabled:
+                editor.execute(index.create_sql(model, editor))
+            else:
+                editor.execute(index.remove_sql(model, editor))
+        analyze()
+
+    def run_queries(self, queries, options):
+        results = {}
+        for label, index_name, queryset in queries:
+            plan = explain(queryset)
+            results[label] = {
+                'plan': plan,
+                'uses_index': index_name in plan,
+                'ms': time_queryset(queryset, repeat=options['repeat']),
+            }
+        return results
+
+    def report(self, queries, before, after, options):
+        self.stdout.write('')
+        self.stdout.write(f'Database: {connection.vendor}')
+        self.stdout.write(
+            f'{"query":<28} {"index":<28} {"before ms":>10} {"after ms":>10} {"speedup":>8}  used'
+        )
+        for label, index_name, _ in queries:
+            b, a = before[label], after[label]
+            speedup = b['ms'] / a['ms'] if a['ms'] else float('inf')
+            used = self.style.SUCCESS('yes') if a['uses_index'] else self.style.WARNING('no')
+            self.stdout.write(
+                f'{label:<28} {index_name:<28} {b["ms"]:>10.2f} {a["ms"]:>10.2f} {speedup:>7.1f}x  {used}'
+            )
+            if options['verbose_plans']:
+                self.stdout.write(f'  before: {b["plan"]}')
+                self.stdout.write(f'  after:  {a["plan"]}')
@@ -0,0 +1,298 @@
+import asyncio
+import json
+import os
+import resource
+import time
+import uuid
+from importlib import import_module
+from unittest import mock
+
+from channels.db import database_sync_to_async
+from channels.testing import WebsocketCommunicator
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY, get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+
+from workspaces.models import Workspace
+from tasks.backpressure import STATS
+from tasks.benchmarking import percentiles
+from tasks.models import Task
+
+TITLE_PREFIX = 'loadtest '
+
+
+class Command(BaseCommand):
+    help = (
+        'Connect N simulated WebSocket clients to the ASGI application (todos_project.asgi), '
+        'subscribe them to workspaces, drive bursts of task creates/updates and report the '
+        'connect rate, fan-out latency percentiles (save() to frame received), memory per '
+        'connection and CPU per event. The clients run in this process, so memory and CPU '
+        'include their side too. Creates a throwaway user and workspaces and deletes them afterwards; '
+        'no estimation jobs are queued for the created tasks.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clients', type=int, default=1000)
+        parser.add_argument('--workspaces', type=int, default=1, help='Clients are spread evenly over these')
+        parser.add_argument('--events', type=int, default=100)
+        parser.add_argument('--burst', type=int, default=10, help='Events written back to back before waiting')
+        parser.add_argument('--mode', choices=('create', 'update', 'mixed'), default='mixed')
+        parser.add_argument(
+            '--layer', choices=('memory', 'settings'), default='memory',
+            help='memory: InMemoryChannelLayer with synchronous dispatch; '
+                 'settings: the configured layer (e.g. Redis) and the background dispatcher',
+        )
+        parser.add_argument('--connect-concurrency', type=int, default=200)
+        parser.add_argument('--timeout', type=float, default=10, help='Seconds to wait for a burst to arrive')
+        parser.add_argument('--json', action='store_true', help='Print the results as JSON only')
+
+    def handle(self, *args, **options):
+        if options['clients'] < 1 or options['workspaces'] < 1 or options['events'] < 1:
+            raise CommandError('--clients, --workspaces and --events must be positive')
+        from todos_project.asgi import application
+
+        overrides = {}
+        if options['layer'] == 'memory':
+            overrides = {
+                'CHANNEL_LAYERS': {'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}},
+                # The in-memory layer only works on this event loop: no background threads sending to it.
+                'REALTIME_DISPATCH_IN_BACKGROUND': False,
+                'PRESENCE_REDIS_URL': '',
+                'REALTIME_REPLAY_REDIS_URL': '',
+                'PRESENCE_FLUSH_INTERVAL_SECONDS': 24 * 60 * 60,
+            }
+        user, workspaces, session_keys = self.setup(options)
+        try:
+            # Every created task would otherwise queue a (paid) estimation job.
+            with override_settings(**overrides), mock.patch('tasks.signals.update_task_estimated_time'):
+                results = asyncio.run(self.run(application, user, workspaces, session_keys, options))
+        finally:
+            self.cleanup(user, session_keys)
+
+        results['config'] = {
+            key: options[key] for key in ('clients', 'workspaces', 'events', 'burst', 'mode', 'layer')
+        }
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+        else:
+            self.report(results)
+
+    def setup(self, options):
+        tag = uuid.uuid4().hex[:8]
+        user = get_user_model().objects.create(email=f'loadtest-{tag}@example.com')
+        workspaces = [
+            Workspace.objects.create(name=f'Load test {tag} #{index}', owner=user)
+            for index in range(options['workspaces'])
+        ]
+        # One session per client, like separate browsers.
+        engine = import_module(settings.SESSION_ENGINE)
+        session_keys = []
+        for _ in range(options['clients']):
+            session = engine.SessionStore()
+            session[SESSION_KEY] = str(user.pk)
+            session[BACKEND_SESSION_KEY] = settings.AUTHENTICATION_BACKENDS[0]
+            session[HASH_SESSION_KEY] = user.get_session_auth_hash()
+            session.create()
+            session_keys.append(session.session_key)
+        return user, workspaces, session_keys
+
+    def cleanup(self, user, session_keys):
+        engine = import_module(settings.SESSION_ENGINE)
+        for key in session_keys:
+            engine.SessionStore(session_key=key).delete()
+        Workspace.objects.filter(owner=user).delete()
+        user.delete()
+
+    async def run(self, application, user, workspaces, session_keys, options):
+        clients = [Client(application, key, workspaces[index % len(workspaces)].pk)
+                   for index, key in enumerate(session_keys)]
+
+        rss_before = rss_bytes()
+        started = time.perf_counter()
+        for start in range(0, len(clients), options['connect_concurrency']):
+            await asyncio.gather(*(client.connect() for client in clients[start:start + options['connect_concurrency']]))
+        connect_seconds = time.perf_counter() - started
+        rss_after = rss_bytes()
+        connected = [client for client in clients if client.connected]
+
+        readers = [asyncio.ensure_future(client.read()) for client in connected]
+        sent_at = {}
+        expected = {}
+        targets = await database_sync_to_async(self.create_targets)(user, workspaces, options['burst'])
+        subscribers = {}
+        for client in connected:
+            subscribers[client.workspace_id] = subscribers.get(client.workspace_id, 0) + 1
+
+        stats_before = dict(STATS)
+        cpu_started = time.process_time()
+        wall_started = time.perf_counter()
+        timed_out = 0
+        for start in range(0, options['events'], options['burst']):
+            seqs = range(start, min(start + options['burst'], options['events']))
+            await database_sync_to_async(self.write_burst)(seqs, user, workspaces, targets, sent_at, expected, options['mode'])
+            deadline = time.perf_counter() + options['timeout']
+            while not all(client.caught_up(seqs, expected) for client in connected):
+                if time.perf_counter() > deadline:
+                    timed_out += 1
+                    break
+                await asyncio.sleep(0.005)
+        cpu_seconds = time.process_time() - cpu_started
+        wall_seconds = time.perf_counter() - wall_started
+        backpressure = {key: STATS[key] - stats_before.get(key, 0) for key in ('coalesced', 'dropped', 'resyncs')}
+
+        for reader in readers:
+            reader.cancel()
+        await asyncio.gather(*readers, return_exceptions=True)
+        for start in range(0, len(connected), options['connect_concurrency']):
+            await asyncio.gather(*(client.disconnect() for client in connected[start:start + options['connect_concurrency']]))
+
+        latencies = [
+            (received - sent_at[seq]) * 1000
+            for client in connected for seq, received in client.received.items()
+        ]
+        wanted = sum(subscribers.get(expected[seq], 0) for seq in sent_at)
+        return {
+            'connect': {
+                'clients': len(clients),
+                'connected': len(connected),
+                'seconds': round(connect_seconds, 3),
+                'per_second': round(len(connected) / connect_seconds, 1) if connect_seconds else None,
+                'ms': rounded(percentiles([client.connect_ms for client in connected])),
+            },
+            'memory': {
+                'rss_delta_bytes': rss_after - rss_before,
+                'bytes_per_connection': (rss_after - rss_before) // len(connected) if connected else None,
+            },
+            'fanout': {
+                'events': len(sent_at),
+                'deliveries': len(latencies),
+                'missing': wanted - len(latencies),
+                'timed_out_bursts': timed_out,
+                'latency_ms': rounded(percentiles(latencies)),
+                'deliveries_per_second': round(len(latencies) / wall_seconds, 1) if wall_seconds else None,
+                'backpressure': backpressure,
+            },
+            'cpu': {
+                'seconds': round(cpu_seconds, 3),
+                'ms_per_event': round(cpu_seconds * 1000 / len(sent_at), 3),
+                'us_per_delivery': round(cpu_seconds * 1e6 / len(latencies), 2) if latencies else None,
+            },
+        }
+
+    def create_targets(self, user, workspaces, burst):
+        """
+        Tasks for update events, `burst` per workspace: updates within a burst
+        hit different tasks, so coalescing cannot merge them away.
+        """
+        return {
+            workspace.pk: [
+                Task.objects.create(workspace=workspace, created_by=user, title=f'{TITLE_PREFIX}target')
+                for _ in range(burst)
+            ]
+            for workspace in workspaces
+        }
+
+    def write_burst(self, seqs, user, workspaces, targets, sent_at, expected, mode):
+        for seq in seqs:
+            workspace = workspaces[seq % len(workspaces)]
+            title = f'{TITLE_PREFIX}{seq}'
+            expected[seq] = workspace.pk
+            sent_at[seq] = time.perf_counter()
+            if mode == 'create' or (mode == 'mixed' and seq % 2 == 0):
+                Task.objects.create(workspace=workspace, created_by=user, title=title)
+            else:
+                task = targets[workspace.pk][seq // len(workspaces) % len(targets[workspace.pk])]
+                task.title = title
+                task.save(update_fields=['title'])
+
+    def report(self, results):
+        connect, memory, fanout, cpu = results['connect'], results['memory'], results['fanout'], results['cpu']
+        config = results['config']
+        self.stdout.write(
+            f'{config["clients"]} clients over {config["workspaces"]} workspace(s), '
+            f'{config["events"]} {config["mode"]} events in bursts of {config["burst"]}, {config["layer"]} layer'
+        )
+        self.stdout.write(
+            f'connect:  {connect["connected"]}/{connect["clients"]} in {connect["seconds"]}s '
+            f'({connect["per_second"]}/s), ms {format_percentiles(connect["ms"])}'
+        )
+        self.stdout.write(
+            f'memory:   {memory["rss_delta_bytes"] / 1024 / 1024:.1f} MiB RSS, '
+            f'{(memory["bytes_per_connection"] or 0) / 1024:.1f} KiB per connection'
+        )
+        missing = fanout['missing']
+        line = (
+            f'fan-out:  {fanout["deliveries"]} deliveries ({fanout["deliveries_per_second"]}/s), '
+            f'latency ms {format_percentiles(fanout["latency_ms"])}'
+        )
+        self.stdout.write(line)
+        if any(fanout['backpressure'].values()):
+            self.stdout.write('          slow clients: {coalesced} frames coalesced, {dropped} dropped, '
+                              '{resyncs} resyncs'.format(**fanout['backpressure']))
+        if missing or fanout['timed_out_bursts']:
+            self.stdout.write(self.style.WARNING(
+                f'          {missing} deliveries missing, {fanout["timed_out_bursts"]} burst(s) timed out'
+            ))
+        self.stdout.write(f'cpu:      {cpu["ms_per_event"]} ms per event, {cpu["us_per_delivery"]} us per delivery')
+
+
+class Client:
+    """One simulated browser tab: a WebSocket subscribed to one workspace."""
+
+    def __init__(self, application, session_key, workspace_id):
+        cookie = f'{settings.SESSION_COOKIE_NAME}={session_key}'.encode()
+        self.communicator = WebsocketCommunicator(application, '/ws/realtime/', headers=[(b'cookie', cookie)])
+        self.workspace_id = workspace_id
+        self.connected = False
+        self.connect_ms = None
+        self.received = {}
+
+    async def connect(self):
+        started = time.perf_counter()
+        self.connected, _ = await self.communicator.connect(timeout=30)
+        if not self.connected:
+            return
+        await self.communicator.send_json_to({'action': 'subscribe', 'workspaces': [self.workspace_id]})
+        await self.communicator.receive_json_from(timeout=30)
+        self.connect_ms = (time.perf_counter() - started) * 1000
+
+    async def disconnect(self):
+        await self.communicator.disconnect()
+
+    async def read(self):
+        while True:
+            frame = json.loads(await self.communicator.receive_from(timeout=24 * 60 * 60))
+            now = time.perf_counter()
+            for task in event_tasks(frame):
+                title = task.get('title') or ''
+                if title.startswith(TITLE_PREFIX) and title[len(TITLE_PREFIX):].isdigit():
+                    self.received.setdefault(int(title[len(TITLE_PREFIX):]), now)
+
+    def caught_up(self, seqs, expected):
+        return all(seq in self.received for seq in seqs if expected[seq] == self.workspace_id)
+
+
+def event_tasks(frame):
+    if frame.get('type') in ('task_created', 'task_updated'):
+        return [frame['task']]
+    if frame.get('type') == 'tasks_bulk_changed':
+        return frame['created'] + frame['updated']
+    return []
+
+
+def rss_bytes():
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except OSError:
+        # Peak RSS (kilobytes on Linux), the best portable approximation.
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def rounded(values):
+    return {key: round(value, 2) for key, value in values.items()}
+
+
+def format_percentiles(values):
+    return ' '.join(f'{key} {value}' for key, value in values.items()) or 'n/a'
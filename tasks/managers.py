@@ -34,16 +34,23 @@ class TaskQuerySet(models.QuerySet):
         return self.select_related('workspace__owner').prefetch_related('workspace__members')
     
     def for_user_access(self, user):
+        from workspaces.models import WorkspaceMember
         return self.filter(
-            models.Q(workspace__owner=user) | 
-            models.Q(workspace__members__user=user)
-        ).distinct()
+            models.Q(workspace__owner=user) |
+            models.Exists(WorkspaceMember.objects.filter(workspace=models.OuterRef('workspace'), user=user))
+        )
+    
+    def delete_rows(self):
+        """
+        Delete the rows with one DELETE, without the collector or the per-task
+        delete signals, for callers that do that work per batch (tasks.bulk,
+        tasks.archive). Only sound while no foreign key points at Task, as
+        nothing would be cascaded or set null; that is checked here.
+        """
+        if self.model._meta.related_objects:
+            raise TypeError(f"Rows of {self.model.__name__} are referenced by other tables; use delete()")
+        return self._raw_delete(self.db)
     
     def ordered_by_priority(self):
-        return self.order_by(
-            models.Case(
-                models.When(due_date__isnull=False, then=models.F('due_date')),
-                default=models.F('created_at')
-            ),
-            '-created_at'
-        )
\ No newline at end of file
+        # Pending first, then by due date (creation time when there is none); see Task.sort_key.
+        return self.order_by('completed', 'sort_key', 'id')
\ No newline at end of file
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.7 on 2026-10-18 10:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0004_remove_task_ai_estimated_time'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['workspace', '-created_at', '-id'], name='task_ws_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(condition=models.Q(('completed', False)), fields=['workspace', '-created_at', '-id'], name='task_ws_pending_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(condition=models.Q(('completed', False)), fields=['workspace', 'due_date'], name='task_ws_pending_due_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(condition=models.Q(('completed', False)), fields=['assigned_user', 'due_date'], name='task_assignee_pending_due_idx'),
+        ),
+    ]
@@ -0,0 +1,48 @@
+from django.db import migrations
+
+# Kept in step with tasks.search. The column and virtual table are not
+# declared on the Task model, so they are created per backend here.
+
+POSTGRESQL_FORWARD = [
+    """
+    ALTER TABLE tasks_task ADD COLUMN search_vector tsvector GENERATED ALWAYS AS (
+        setweight(to_tsvector('english', coalesce(title, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(description, '')), 'B')
+    ) STORED
+    """,
+    'CREATE INDEX task_search_vector_idx ON tasks_task USING GIN (search_vector)',
+]
+POSTGRESQL_BACKWARD = [
+    'DROP INDEX IF EXISTS task_search_vector_idx',
+    'ALTER TABLE tasks_task DROP COLUMN IF EXISTS search_vector',
+]
+
+SQLITE_FORWARD = [
+    "CREATE VIRTUAL TABLE tasks_task_fts USING fts5(title, description, tokenize='porter unicode61')",
+    "INSERT INTO tasks_task_fts(rowid, title, description) "
+    "SELECT id, title, COALESCE(description, '') FROM tasks_task",
+]
+SQLITE_BACKWARD = [
+    'DROP TABLE IF EXISTS tasks_task_fts',
+]
+
+
+def run_for_vendor(statements):
+    def run(apps, schema_editor):
+        for statement in statements.get(schema_editor.connection.vendor, []):
+            schema_editor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0005_add_hot_query_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            run_for_vendor({'postgresql': POSTGRESQL_FORWARD, 'sqlite': SQLITE_FORWARD}),
+            run_for_vendor({'postgresql': POSTGRESQL_BACKWARD, 'sqlite': SQLITE_BACKWARD}),
+        ),
+    ]
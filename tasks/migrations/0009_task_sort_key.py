@@ -0,0 +1,58 @@
+# Generated by Django 4.2.7 on 2026-10-18 11:02
+
+from datetime import datetime, time
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def backfill_sort_keys(apps, schema_editor):
+    # Same rule as tasks.models.priority_sort_key, one UPDATE per distinct due date.
+    for model_name in ('Task', 'ArchivedTask'):
+        model = apps.get_model('tasks', model_name)
+        model.objects.filter(due_date__isnull=True).update(sort_key=models.F('created_at'))
+        due_dates = model.objects.filter(due_date__isnull=False).order_by().values_list('due_date', flat=True).distinct()
+        for due_date in list(due_dates):
+            model.objects.filter(due_date=due_date).update(
+                sort_key=timezone.make_aware(datetime.combine(due_date, time.min))
+            )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0008_task_archive'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='task',
+            name='created_at',
+            field=models.DateTimeField(default=timezone.now, editable=False),
+        ),
+        migrations.AddField(
+            model_name='task',
+            name='sort_key',
+            field=models.DateTimeField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='archivedtask',
+            name='sort_key',
+            field=models.DateTimeField(null=True),
+        ),
+        migrations.RunPython(backfill_sort_keys, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='task',
+            name='sort_key',
+            field=models.DateTimeField(editable=False),
+        ),
+        migrations.AlterField(
+            model_name='archivedtask',
+            name='sort_key',
+            field=models.DateTimeField(),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['workspace', 'completed', 'sort_key', 'id'], name='task_ws_priority_idx'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-18 11:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0009_task_sort_key'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['workspace', 'completed', 'due_date', 'id'], name='task_ws_due_idx'),
+        ),
+    ]
@@ -1,11 +1,24 @@
-from django.db import models
+from datetime import datetime, time
+
+from django.db import models, transaction
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.core.exceptions import ValidationError
-from workspaces.models import WorkspaceMember
+from django.utils import timezone
+from workspaces.access import user_can_access_workspace
 from .managers import TaskQuerySet
 
 
+# The fields the workspace task counters depend on (see tasks.signals.update_workspace_counters).
+COUNTED_FIELDS = ('workspace_id', 'completed')
+
+
+def priority_sort_key(due_date, created_at):
+    if due_date is None:
+        return created_at
+    return timezone.make_aware(datetime.combine(due_date, time.min))
+
+
 class Task(models.Model):
     title = models.CharField(max_length=200)
     description = models.TextField(blank=True)
@@ -15,19 +28,131 @@ class Task(models.Model):
     due_date = models.DateField(null=True, blank=True)
     estimated_time = models.CharField(max_length=200, null=True, blank=True, help_text="Estimated time")
     completed = models.BooleanField(default=False)
-    created_at = models.DateTimeField(auto_now_add=True)
+    # Set on instantiation (not auto_now_add) so sort_key can be derived from it before the insert.
+    created_at = models.DateTimeField(default=timezone.now, editable=False)
     updated_at = models.DateTimeField(auto_now=True)
+    # Priority order: the due date if there is one, else the creation time.
+    # Stored so the (workspace, completed, sort_key) index can serve it.
+    sort_key = models.DateTimeField(editable=False)
 
     objects = TaskQuerySet.as_manager()
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Workspace task list in display order (keyset pagination).
+            models.Index(fields=['workspace', '-created_at', '-id'], name='task_ws_created_idx'),
+            # Priority sort (pending first), see TaskQuerySet.ordered_by_priority().
+            models.Index(fields=['workspace', 'completed', 'sort_key', 'id'], name='task_ws_priority_idx'),
+            # Due date sort (pending first, undated last), see tasks.sorting.
+            models.Index(fields=['workspace', 'completed', 'due_date', 'id'], name='task_ws_due_idx'),
+            # Delta sync: changes in a workspace past an (updated_at, id) cursor.
+            models.Index(fields=['workspace', 'updated_at', 'id'], name='task_ws_updated_idx'),
+            # Pending-only partial indexes: pending(), due_soon() and overdue() all filter
+            # completed=False, so indexing just those rows keeps the indexes small and
+            # lets SQLite match the `NOT completed` predicate too.
+            models.Index(
+                fields=['workspace', '-created_at', '-id'],
+                condition=models.Q(completed=False),
+                name='task_ws_pending_created_idx',
+            ),
+            models.Index(
+                fields=['workspace', 'due_date'],
+                condition=models.Q(completed=False),
+                name='task_ws_pending_due_idx',
+            ),
+            models.Index(
+                fields=['assigned_user', 'due_date'],
+                condition=models.Q(completed=False),
+                name='task_assignee_pending_due_idx',
+            ),
+            # Archival candidates: completed tasks by last change.
+            models.Index(
+                fields=['updated_at'],
+                condition=models.Q(completed=True),
+                name='task_completed_updated_idx',
+            ),
+        ]
 
     def __str__(self):
         return self.title
     
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        if not self._state.adding:
+            update_fields = kwargs['update_fields'] = self._fields_to_update(update_fields)
+        if update_fields is None or {'due_date', 'created_at'} & set(update_fields):
+            self.refresh_sort_key()
+            if update_fields is not None:
+                update_fields = kwargs['update_fields'] = {*update_fields, 'sort_key'}
+        if update_fields:
+            # auto_now only applies to fields being saved; delta sync relies on updated_at.
+            kwargs['update_fields'] = {*update_fields, 'updated_at'}
+        if self._changes_counted_state(update_fields):
+            # The row and the workspace counters (post_save) change together.
+            with transaction.atomic():
+                self.claim_counted_state(update_fields)
+                super().save(*args, **kwargs)
+        else:
+            super().save(*args, **kwargs)
+    
+    def refresh_sort_key(self):
+        """Recompute sort_key; call before bulk_create() / bulk_update(), which skip save()."""
+        self.sort_key = priority_sort_key(self.due_date, self.created_at)
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance.remember_counted_state()
+        return instance
+    
+    def remember_counted_state(self):
+        """Record the values the workspace counters last saw, so saves can apply deltas."""
+        self._counted_workspace_id = self.__dict__.get('workspace_id')
+        self._counted_completed = self.__dict__.get('completed')
+
+    def _fields_to_update(self, update_fields):
+        """
+        The fields an update writes: every field (or those in `update_fields`)
+        except counted ones still holding their counted value. A stale instance
+        then cannot undo another save's completion or move, and most saves
+        leave the counters alone.
+        """
+        if update_fields is None:
+            update_fields = [field.name for field in self._meta.concrete_fields if not field.primary_key]
+        attnames = {name: self._meta.get_field(name).attname for name in update_fields}
+        return {
+            name for name, field in attnames.items()
+            if field not in COUNTED_FIELDS or getattr(self, field) != self._counted(field)
+        }
+
+    def _counted(self, field):
+        return getattr(self, f'_counted_{field}', None)
+
+    def _changes_counted_state(self, update_fields):
+        if self._state.adding or any(self._counted(field) is None for field in COUNTED_FIELDS):
+            return False
+        return any(self._meta.get_field(name).attname in COUNTED_FIELDS for name in update_fields)
+
+    def claim_counted_state(self, update_fields):
+        """
+        Before a save that changes the workspace or completion, move the row
+        from the counted values to the new ones with a conditional UPDATE. If
+        another save changed them in between, the row is locked and the
+        counted state re-read from it instead. Either way the row stays locked
+        until commit, so the counter delta applied after the save is exactly
+        this save's change.
+        """
+        saved = {self._meta.get_field(name).attname for name in update_fields} & set(COUNTED_FIELDS)
+        counted = {field: self._counted(field) for field in COUNTED_FIELDS}
+        if Task.objects.filter(pk=self.pk, **counted).update(**{field: getattr(self, field) for field in saved}):
+            return
+        current = Task.objects.select_for_update().filter(pk=self.pk).values(*COUNTED_FIELDS).first()
+        for field, value in (current or {}).items():
+            setattr(self, f'_counted_{field}', value)
+    
     def can_be_edited_by(self, user):
-        return WorkspaceMember.objects.filter(workspace=self.workspace, user=user).exists()
+        return user_can_access_workspace(user, self.workspace_id)
     
     def assign_to(self, user):
         if user and not self.can_be_edited_by(user):
@@ -42,3 +167,51 @@ class Task(models.Model):
     def mark_incomplete(self):
         self.completed = False
         self.save(update_fields=['completed'])
+
+
+class TaskTombstone(models.Model):
+    """
+    A deleted (or moved-away) task, kept so delta-sync clients can drop their
+    copy. Pruned after TASKS_TOMBSTONE_RETENTION_DAYS.
+    """
+    task_id = models.BigIntegerField()
+    workspace = models.ForeignKey('workspaces.Workspace', on_delete=models.CASCADE, related_name='task_tombstones')
+    deleted_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['workspace', 'deleted_at', 'task_id'], name='tombstone_ws_deleted_idx'),
+            models.Index(fields=['deleted_at'], name='tombstone_deleted_idx'),
+        ]
+
+    def __str__(self):
+        return f"Task {self.task_id} deleted from workspace {self.workspace_id}"
+
+
+class ArchivedTask(models.Model):
+    """
+    A completed task moved out of tasks_task by tasks.archive. Keeps the
+    original task id, so restoring puts the task back under the same id.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    title = models.CharField(max_length=200)
+    description = models.TextField(blank=True)
+    workspace = models.ForeignKey('workspaces.Workspace', on_delete=models.CASCADE, related_name='archived_tasks')
+    assigned_user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, related_name='archived_assigned_tasks')
+    created_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='archived_created_tasks')
+    due_date = models.DateField(null=True, blank=True)
+    estimated_time = models.CharField(max_length=200, null=True, blank=True)
+    completed = models.BooleanField(default=True)
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    sort_key = models.DateTimeField()
+    archived_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ['-archived_at', '-id']
+        indexes = [
+            models.Index(fields=['workspace', '-archived_at', '-id'], name='archived_ws_archived_idx'),
+        ]
+
+    def __str__(self):
+        return self.title
@@ -0,0 +1,348 @@
+"""
+Outbox for realtime (channel layer) events.
+
+publish() never talks to the channel layer. It registers the event with
+transaction.on_commit, so events from a rolled-back transaction are dropped
+and nothing is sent before the data is visible. On commit the events go to
+a per-process dispatcher thread. That thread sends everything queued so far
+as one batch of concurrent group_send calls on its own event loop, so the
+channel layer's Redis connections are pipelined across events. The request
+thread only appends to a list.
+
+With REALTIME_COALESCE_WINDOW_MS set, task events for a group are held for
+that long (counted from the first one) and collapsed: repeated updates to a
+task keep only the latest state, and the window goes out as one frame.
+That frame is the original event if only one task changed, otherwise a
+`tasks_bulk_changed` frame. Message volume then follows distinct changes
+rather than raw saves.
+
+Task payloads may leave `assigned_user_name` as USERNAME_PENDING (see
+tasks.signals.task_event_data); the dispatcher fills them in with one
+query per batch.
+
+Workspace and task events are numbered per group and kept in a replay log
+just before they are sent (see tasks.replay).
+
+Each message is sent with its client frame already encoded (see
+encode_frames), so consumers forward bytes instead of serializing the same
+event once per connected socket. The same goes for the rendered task rows
+of workspace events.
+
+With REALTIME_DISPATCH_IN_BACKGROUND = False, events are sent synchronously
+on commit instead, which is simpler to follow in tests and scripts.
+"""
+import asyncio
+import atexit
+import json
+import logging
+import os
+import threading
+import time
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import close_old_connections, transaction
+
+from . import fragments, replay
+
+try:
+    import msgpack
+except ImportError:  # Installed with channels_redis; optional with other layers.
+    msgpack = None
+
+logger = logging.getLogger(__name__)
+
+
+class _UsernamePending:
+    def __repr__(self):
+        return 'USERNAME_PENDING'
+
+
+USERNAME_PENDING = _UsernamePending()
+
+
+def publish(group, type_, payload):
+    """Send `{"type": type_, **payload}` to `group` once the current transaction commits."""
+    event = (group, {"type": type_, **payload})
+    transaction.on_commit(lambda: dispatch([event]))
+
+
+def dispatch(events):
+    if settings.REALTIME_DISPATCH_IN_BACKGROUND:
+        get_dispatcher().enqueue(events)
+        return
+    resolve_usernames(events)
+    replay.sequence(events)
+    layer = get_channel_layer()
+    for group, message in events:
+        async_to_sync(layer.group_send)(group, encode_frames(group, message))
+
+
+def subscription_name(group):
+    """The name clients use for `group`: "workspace_1" -> "workspace:1"."""
+    return group.replace('_', ':', 1)
+
+
+def client_frame(group, message):
+    """What a realtime client receives for `message` sent to `group`."""
+    return {"subscription": subscription_name(group), **message}
+
+
+def encode_frames(group, message):
+    """
+    The group_send message for `message`, with the frame clients receive
+    encoded once here: `frame` as JSON text and, when msgpack is available,
+    `frame_msgpack` for connections that negotiated it. Workspace task
+    events also get `html`, their rows as an htmx out-of-band fragment
+    (see tasks.fragments).
+    """
+    frame = client_frame(group, message)
+    encoded = {**message, "group": group, "frame": json.dumps(frame)}
+    if msgpack is not None:
+        encoded["frame_msgpack"] = msgpack.packb(frame)
+    if group.startswith('workspace_'):
+        html = fragments.workspace_fragment(message)
+        if html:
+            encoded["html"] = html
+    return encoded
+
+
+def _pending_tasks(message):
+    for value in message.values():
+        for item in value if isinstance(value, list) else [value]:
+            if isinstance(item, dict) and item.get('assigned_user_name') is USERNAME_PENDING:
+                yield item
+
+
+def resolve_usernames(events):
+    """Fill in every USERNAME_PENDING in `events` with one query."""
+    tasks = [task for _, message in events for task in _pending_tasks(message)]
+    if not tasks:
+        return
+    usernames = dict(
+        get_user_model().objects.filter(id__in={task['assigned_user_id'] for task in tasks})
+        .values_list('id', 'username')
+    )
+    for task in tasks:
+        task['assigned_user_name'] = usernames.get(task['assigned_user_id'])
+
+
+COALESCED_TYPES = ('task_created', 'task_updated', 'task_deleted', 'tasks_bulk_changed')
+
+
+class _Window:
+    """Task changes for one group within one coalescing window, latest state per task."""
+
+    def __init__(self, deadline):
+        self.deadline = deadline
+        self.workspace_id = None
+        self.created = {}
+        self.updated = {}
+        self.deleted = {}
+
+    def add(self, message):
+        self.workspace_id = message.get('workspace_id', self.workspace_id)
+        type_ = message['type']
+        if type_ == 'task_created':
+            self._created(message['task'])
+        elif type_ == 'task_updated':
+            self._updated(message['task'])
+        elif type_ == 'task_deleted':
+            self._deleted(message['task_id'])
+        else:
+            for task in message['created']:
+                self._created(task)
+            for task in message['updated']:
+                self._updated(task)
+            for task_id in message['deleted_ids']:
+                self._deleted(task_id)
+
+    def _created(self, task):
+        self.workspace_id = task.get('workspace_id', self.workspace_id)
+        self.deleted.pop(task['id'], None)
+        self.created[task['id']] = task
+
+    def _updated(self, task):
+        self.workspace_id = task.get('workspace_id', self.workspace_id)
+        if task['id'] in self.created:
+            self.created[task['id']] = task
+        else:
+            self.updated[task['id']] = task
+
+    def _deleted(self, task_id):
+        self.created.pop(task_id, None)
+        self.updated.pop(task_id, None)
+        self.deleted[task_id] = None
+
+    def messages(self):
+        changes = len(self.created) + len(self.updated) + len(self.deleted)
+        if not changes:
+            return []
+        if changes == 1:
+            if self.created:
+                return [{"type": "task_created", "task": next(iter(self.created.values()))}]
+            if self.updated:
+                return [{"type": "task_updated", "task": next(iter(self.updated.values()))}]
+            return [{"type": "task_deleted", "task_id": next(iter(self.deleted)), "workspace_id": self.workspace_id}]
+        return [{
+            "type": "tasks_bulk_changed",
+            "workspace_id": self.workspace_id,
+            "created": list(self.created.values()),
+            "updated": list(self.updated.values()),
+            "deleted_ids": list(self.deleted),
+        }]
+
+
+class Coalescer:
+    """Holds task events per group for `window` seconds; other events pass straight through."""
+
+    def __init__(self, window):
+        self.window = window
+        self._windows = {}
+
+    def __bool__(self):
+        return bool(self._windows)
+
+    def add(self, events):
+        """Buffer `events`; returns the ones to send now."""
+        ready = []
+        now = time.monotonic()
+        for group, message in events:
+            if not self.window or message.get('type') not in COALESCED_TYPES:
+                # Keep the group's order: whatever it has buffered goes first.
+                if group in self._windows:
+                    ready.extend(self._close(group))
+                ready.append((group, message))
+                continue
+            window = self._windows.get(group)
+            if window is None:
+                window = self._windows[group] = _Window(now + self.window)
+            window.add(message)
+        return ready
+
+    def pop_due(self):
+        now = time.monotonic()
+        ready = []
+        for group in [group for group, window in self._windows.items() if window.deadline <= now]:
+            ready.extend(self._close(group))
+        return ready
+
+    def time_until_due(self):
+        if not self._windows:
+            return None
+        return max(0, min(window.deadline for window in self._windows.values()) - time.monotonic())
+
+    def _close(self, group):
+        return [(group, message) for message in self._windows.pop(group).messages()]
+
+
+class Dispatcher:
+    """Background thread sending queued events in batches."""
+
+    def __init__(self, batch_size=200, coalesce_window=0):
+        self.batch_size = batch_size
+        self._coalescer = Coalescer(coalesce_window)
+        self._pending = []
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._idle = threading.Event()
+        self._idle.set()
+        self._thread = threading.Thread(target=self._run, name='realtime-dispatcher', daemon=True)
+        self._thread.start()
+
+    def enqueue(self, events):
+        with self._lock:
+            self._pending.extend(events)
+            self._idle.clear()
+        self._wakeup.set()
+
+    def flush(self, timeout=None):
+        """Wait until everything enqueued so far has been sent; False on timeout."""
+        return self._idle.wait(timeout)
+
+    def _run(self):
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        layer = get_channel_layer()
+        while True:
+            self._wakeup.wait(self._coalescer.time_until_due())
+            with self._lock:
+                batch, self._pending = self._pending, []
+                self._wakeup.clear()
+            ready = self._coalescer.add(batch) + self._coalescer.pop_due()
+            if ready:
+                self._send_batch(loop, layer, ready)
+            with self._lock:
+                if not self._pending and not self._coalescer:
+                    self._idle.set()
+
+    def _send_batch(self, loop, layer, batch):
+        try:
+            # The ORM is only used while the loop is not running.
+            resolve_usernames(batch)
+        except Exception:
+            logger.exception("Resolving usernames for realtime events failed")
+        finally:
+            close_old_connections()
+        # Numbered after coalescing, in the order the frames go out.
+        replay.sequence(batch)
+        for start in range(0, len(batch), self.batch_size):
+            chunk = batch[start:start + self.batch_size]
+            try:
+                results = loop.run_until_complete(self._send(layer, chunk))
+            except Exception:
+                logger.exception("Sending realtime events failed")
+                continue
+            for group, result in results:
+                if isinstance(result, Exception):
+                    logger.error("Sending realtime events to %s failed: %r", group, result)
+
+    @staticmethod
+    async def _send(layer, chunk):
+        """
+        Send the chunk concurrently across groups but in order within each
+        group, so a group's sequence numbers reach clients in order.
+        Returns [(group, None or the exception)].
+        """
+        by_group = {}
+        for group, message in chunk:
+            by_group.setdefault(group, []).append(message)
+
+        async def send_group(group, messages):
+            for message in messages:
+                await layer.group_send(group, encode_frames(group, message))
+
+        results = await asyncio.gather(
+            *(send_group(group, messages) for group, messages in by_group.items()),
+            return_exceptions=True,
+        )
+        return list(zip(by_group, results))
+
+
+_dispatcher = None
+_dispatcher_pid = None
+_dispatcher_lock = threading.Lock()
+
+
+def get_dispatcher():
+    """The process's dispatcher, started on first use (and again after a fork, e.g. Celery prefork)."""
+    global _dispatcher, _dispatcher_pid
+    pid = os.getpid()
+    if _dispatcher is None or _dispatcher_pid != pid:
+        with _dispatcher_lock:
+            if _dispatcher is None or _dispatcher_pid != pid:
+                _dispatcher = Dispatcher(
+                    batch_size=settings.REALTIME_DISPATCH_BATCH_SIZE,
+                    coalesce_window=settings.REALTIME_COALESCE_WINDOW_MS / 1000,
+                )
+                _dispatcher_pid = pid
+    return _dispatcher
+
+
+@atexit.register
+def _flush_on_exit():
+    # Short-lived processes (management commands, scripts) would otherwise drop their last events.
+    if _dispatcher is not None and _dispatcher_pid == os.getpid():
+        _dispatcher.flush(timeout=5)
@@ -0,0 +1,172 @@
+"""
+Keyset (cursor) pagination for task querysets.
+"""
+import base64
+import json
+
+from django.db import models
+from django.utils.dateparse import parse_date, parse_datetime
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+class KeysetPage:
+    def __init__(self, items, next_cursor):
+        self.items = items
+        self.next_cursor = next_cursor
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+
+class KeysetPaginator:
+    """
+    Paginates a queryset by seeking past the last row of the previous page
+    instead of using OFFSET, so every page costs the same index range scan
+    no matter how deep the client has scrolled.
+
+    `ordering` must end with a unique column (the primary key) so the
+    cursor identifies exactly one row. Nullable columns listed in
+    `nulls_last` sort their NULLs after every value, in either direction.
+    """
+
+    # Cursor values parsed back into datetimes, besides *_at columns.
+    datetime_fields = ('sort_key',)
+
+    def __init__(self, ordering=('-created_at', '-id'), page_size=50, nulls_last=()):
+        self.ordering = tuple(ordering)
+        self.page_size = page_size
+        self.nulls_last = frozenset(nulls_last)
+
+    def paginate(self, queryset, cursor=None):
+        queryset = queryset.order_by(*self._order_by())
+        if cursor:
+            queryset = queryset.filter(self._seek_filter(self.decode_cursor(cursor)))
+        rows = list(queryset[:self.page_size + 1])
+        items = rows[:self.page_size]
+        next_cursor = None
+        if len(rows) > self.page_size:
+            next_cursor = self.encode_cursor(items[-1])
+        return KeysetPage(items, next_cursor)
+
+    def encode_cursor(self, obj):
+        values = []
+        for field in self._fields():
+            value = getattr(obj, field)
+            values.append(value.isoformat() if hasattr(value, 'isoformat') else value)
+        raw = json.dumps(values, separators=(',', ':')).encode()
+        return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+    def decode_cursor(self, cursor):
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        except (ValueError, TypeError):
+            raise InvalidCursor("Invalid cursor")
+        if not isinstance(values, list) or len(values) != len(self.ordering):
+            raise InvalidCursor("Invalid cursor")
+        return [self._parse_value(field, value) for field, value in zip(self._fields(), values)]
+
+    def _fields(self):
+        return [field.lstrip('-') for field in self.ordering]
+
+    def _order_by(self):
+        order_by = []
+        for ordering in self.ordering:
+            field = ordering.lstrip('-')
+            if field not in self.nulls_last:
+                order_by.append(ordering)
+            elif ordering.startswith('-'):
+                order_by.append(models.F(field).desc(nulls_last=True))
+            else:
+                order_by.append(models.F(field).asc(nulls_last=True))
+        return order_by
+
+    def _parse_value(self, field, value):
+        if value is None or not isinstance(value, str):
+            return value
+        if field.endswith('_at') or field in self.datetime_fields:
+            parsed = parse_datetime(value)
+        elif field.endswith('_date'):
+            parsed = parse_date(value)
+        else:
+            parsed = value
+        if parsed is None:
+            raise InvalidCursor("Invalid cursor")
+        return parsed
+
+    def _seek_filter(self, values):
+        # (a, b, c) > (x, y, z)  ==  a > x OR (a = x AND b > y) OR (a = x AND b = y AND c > z)
+        # With NULLs last, "after x" also includes NULL, and nothing sorts after NULL.
+        condition = models.Q()
+        equal_prefix = models.Q()
+        for ordering, value in zip(self.ordering, values):
+            field = ordering.lstrip('-')
+            lookup = 'lt' if ordering.startswith('-') else 'gt'
+            if value is None:
+                if field not in self.nulls_last:
+                    raise InvalidCursor("Invalid cursor")
+                equal_prefix &= models.Q(**{f'{field}__isnull': True})
+                continue
+            after = models.Q(**{f'{field}__{lookup}': value})
+            if field in self.nulls_last:
+                after |= models.Q(**{f'{field}__isnull': True})
+            condition |= equal_prefix & after
+            equal_prefix &= models.Q(**{field: value})
+        return condition
+
+
+class SegmentedPaginator:
+    """
+    Pages through consecutive filtered segments of a queryset, each with its
+    own keyset ordering: every row of the first segment, then the second, and
+    so on. Each segment is a separate range scan, so an ordering like
+    "overdue first" needs no sort over a computed expression.
+
+    Cursors are "<segment>.<keyset cursor>"; an empty keyset cursor means
+    the start of that segment.
+    """
+
+    def __init__(self, segments, page_size=50):
+        # [(Q, KeysetPaginator), ...]; the filters should not overlap.
+        self.segments = list(segments)
+        self.page_size = page_size
+
+    def paginate(self, queryset, cursor=None):
+        position, inner_cursor = self._decode(cursor)
+        items = []
+        while position < len(self.segments):
+            condition, paginator = self.segments[position]
+            segment_paginator = KeysetPaginator(
+                paginator.ordering, self.page_size - len(items), nulls_last=paginator.nulls_last
+            )
+            page = segment_paginator.paginate(queryset.filter(condition), inner_cursor)
+            items.extend(page.items)
+            if page.has_next:
+                return KeysetPage(items, f'{position}.{page.next_cursor}')
+            position, inner_cursor = position + 1, None
+            if len(items) >= self.page_size:
+                break
+
+        # The page is full at a segment boundary: only hand out a cursor if a later segment has rows.
+        for later in range(position, len(self.segments)):
+            if queryset.filter(self.segments[later][0]).exists():
+                return KeysetPage(items, f'{later}.')
+        return KeysetPage(items, None)
+
+    def _decode(self, cursor):
+        if not cursor:
+            return 0, None
+        head, separator, inner_cursor = cursor.partition('.')
+        if not separator or not head.isdigit() or int(head) >= len(self.segments):
+            raise InvalidCursor("Invalid cursor")
+        return int(head), inner_cursor or None
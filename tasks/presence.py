@@ -0,0 +1,239 @@
+"""
+Presence: who currently has a workspace or task open.
+
+A realtime connection is present in every group it subscribes to
+(`workspace_<id>`, `task_<id>`). Consumers only report joins, leaves and
+heartbeats to the process's PresenceTracker, which keeps them in memory.
+Every PRESENCE_FLUSH_INTERVAL_SECONDS the tracker writes everything
+reported since the last flush in one pipeline. Each group has a sorted set,
+`presence:<group>`, with one member per connection ("<user_id>:<channel>")
+scored by when it expires. Connections that stop being refreshed (closed
+tab, crashed process) drop out after PRESENCE_TTL_SECONDS.
+
+After writing, the tracker compares each group's users with the last ones
+broadcast. That snapshot is swapped atomically (SET ... GET), so the first
+process to see a change broadcasts it and the others stay quiet. A group
+gets at most one `presence_changed` frame per flush interval, listing the
+users present and who joined or left since the previous frame. A
+connection that joins without changing the user list (a second tab) gets
+the current list sent to it alone.
+
+Without PRESENCE_REDIS_URL the sets live in process memory. That only
+works for a single process, such as development or tests.
+"""
+import asyncio
+import logging
+import os
+import threading
+import time
+from collections import defaultdict
+
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import close_old_connections
+
+from .outbox import encode_frames
+
+logger = logging.getLogger(__name__)
+
+
+def _member(user_id, channel_name):
+    return f'{user_id}:{channel_name}'
+
+
+def _user_ids(members):
+    return sorted({int(member.split(':', 1)[0]) for member in members})
+
+
+class RedisPresenceStore:
+    KEY = 'presence:{group}'
+    SNAPSHOT_KEY = 'presence:{group}:sent'
+
+    def __init__(self, url):
+        import redis
+        self.client = redis.Redis.from_url(url, decode_responses=True)
+
+    def update(self, touched, left, now, ttl):
+        """Apply one flush and return {group: members} for every group it touched."""
+        groups = list(set(touched) | set(left))
+        pipe = self.client.pipeline(transaction=False)
+        for group in groups:
+            key = self.KEY.format(group=group)
+            if touched.get(group):
+                pipe.zadd(key, {member: now + ttl for member in touched[group]})
+            if left.get(group):
+                pipe.zrem(key, *left[group])
+            pipe.zremrangebyscore(key, '-inf', now)
+            pipe.expire(key, ttl)
+        for group in groups:
+            pipe.zrange(self.KEY.format(group=group), 0, -1)
+        results = pipe.execute()
+        return dict(zip(groups, results[-len(groups):])) if groups else {}
+
+    def swap_snapshots(self, snapshots, ttl):
+        """Store {group: snapshot} and return the ones they replaced (None if unset)."""
+        pipe = self.client.pipeline(transaction=False)
+        for group, snapshot in snapshots.items():
+            pipe.set(self.SNAPSHOT_KEY.format(group=group), snapshot, ex=ttl, get=True)
+        return dict(zip(snapshots, pipe.execute()))
+
+
+class MemoryPresenceStore:
+    def __init__(self):
+        self._sets = defaultdict(dict)
+        self._snapshots = {}
+
+    def update(self, touched, left, now, ttl):
+        members = {}
+        for group in set(touched) | set(left):
+            entries = self._sets[group]
+            for member in touched.get(group, ()):
+                entries[member] = now + ttl
+            for member in left.get(group, ()):
+                entries.pop(member, None)
+            for member in [member for member, expires in entries.items() if expires <= now]:
+                del entries[member]
+            members[group] = list(entries)
+            if not entries:
+                del self._sets[group]
+        return members
+
+    def swap_snapshots(self, snapshots, ttl):
+        previous = {group: self._snapshots.get(group) for group in snapshots}
+        self._snapshots.update(snapshots)
+        return previous
+
+
+class PresenceTracker:
+    """Collects presence reports from this process's consumers and flushes them in the background."""
+
+    def __init__(self, store, interval=2, ttl=45):
+        self.store = store
+        self.interval = interval
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._touched = defaultdict(set)
+        self._left = defaultdict(set)
+        self._joined = defaultdict(set)
+        self._thread = threading.Thread(target=self._run, name='presence-tracker', daemon=True)
+        self._thread.start()
+
+    def join(self, groups, user_id, channel_name):
+        member = _member(user_id, channel_name)
+        with self._lock:
+            for group in groups:
+                self._touched[group].add(member)
+                self._left[group].discard(member)
+                self._joined[group].add(channel_name)
+
+    def touch(self, groups, user_id, channel_name):
+        member = _member(user_id, channel_name)
+        with self._lock:
+            for group in groups:
+                self._touched[group].add(member)
+
+    def leave(self, groups, user_id, channel_name):
+        member = _member(user_id, channel_name)
+        with self._lock:
+            for group in groups:
+                self._left[group].add(member)
+                self._touched[group].discard(member)
+                self._joined[group].discard(channel_name)
+
+    def _run(self):
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        layer = get_channel_layer()
+        while True:
+            time.sleep(self.interval)
+            try:
+                sends = self.collect()
+            except Exception:
+                logger.exception("Flushing presence failed")
+                continue
+            finally:
+                close_old_connections()
+            if sends:
+                loop.run_until_complete(self.send(layer, sends))
+
+    def collect(self):
+        """
+        Write everything reported since the last call to the store. Returns
+        the frames to send as (group, channel, message): to the whole group
+        when `channel` is None, otherwise to that one connection.
+        """
+        with self._lock:
+            touched, self._touched = self._touched, defaultdict(set)
+            left, self._left = self._left, defaultdict(set)
+            joined, self._joined = self._joined, defaultdict(set)
+        if not touched and not left:
+            return []
+
+        members = self.store.update(touched, left, time.time(), self.ttl)
+        users = {group: _user_ids(group_members) for group, group_members in members.items()}
+        previous = self.store.swap_snapshots(
+            {group: ','.join(map(str, user_ids)) for group, user_ids in users.items()}, self.ttl
+        )
+
+        changes = {}
+        for group, user_ids in users.items():
+            before = [int(pk) for pk in (previous[group] or '').split(',') if pk]
+            if before != user_ids:
+                changes[group] = (sorted(set(user_ids) - set(before)), sorted(set(before) - set(user_ids)))
+        catch_up = {group: channels for group, channels in joined.items() if channels and group not in changes}
+        if not changes and not catch_up:
+            return []
+
+        wanted = {pk for group in [*changes, *catch_up] for pk in users.get(group, ())}
+        usernames = dict(get_user_model().objects.filter(id__in=wanted).values_list('id', 'username'))
+
+        def message(group, joined_ids=(), left_ids=()):
+            return encode_frames(group, {
+                "type": "presence_changed",
+                "users": [{"id": pk, "username": usernames.get(pk)} for pk in users.get(group, ())],
+                "joined": list(joined_ids),
+                "left": list(left_ids),
+            })
+
+        sends = [(group, None, message(group, *change)) for group, change in changes.items()]
+        sends += [(group, channel, message(group)) for group, channels in catch_up.items() for channel in channels]
+        return sends
+
+    @staticmethod
+    async def send(layer, sends):
+        results = await asyncio.gather(
+            *(
+                layer.group_send(group, message) if channel is None else layer.send(channel, message)
+                for group, channel, message in sends
+            ),
+            return_exceptions=True,
+        )
+        for (group, _, _), result in zip(sends, results):
+            if isinstance(result, Exception):
+                logger.error("Sending presence to %s failed: %r", group, result)
+
+
+_tracker = None
+_tracker_pid = None
+_tracker_lock = threading.Lock()
+
+
+def get_tracker():
+    """The process's presence tracker, started on first use (and again after a fork)."""
+    global _tracker, _tracker_pid
+    pid = os.getpid()
+    if _tracker is None or _tracker_pid != pid:
+        with _tracker_lock:
+            if _tracker is None or _tracker_pid != pid:
+                if settings.PRESENCE_REDIS_URL:
+                    store = RedisPresenceStore(settings.PRESENCE_REDIS_URL)
+                else:
+                    store = MemoryPresenceStore()
+                _tracker = PresenceTracker(
+                    store,
+                    interval=settings.PRESENCE_FLUSH_INTERVAL_SECONDS,
+                    ttl=settings.PRESENCE_TTL_SECONDS,
+                )
+                _tracker_pid = pid
+    return _tracker
@@ -0,0 +1,154 @@
+"""
+Sequence numbers and a replay log for realtime events.
+
+Every event sent to a workspace or task group gets the group's next
+sequence number (`seq` in the frame) when the outbox sends it. The event is
+also appended to that group's replay log: a Redis stream capped at
+REALTIME_REPLAY_MAXLEN entries, whose ids are the sequence numbers. One Lua
+script does both, so numbers and log entries cannot diverge, and a dispatch
+batch costs one pipelined round trip.
+
+A reconnecting client subscribes with the last `seq` it saw per
+subscription. The consumer replays everything after it from the log. If
+part of the gap has already been trimmed, it sends a `resync` frame instead
+and the client reloads that view. The counter and the log expire together
+after REALTIME_REPLAY_TTL_SECONDS without events. A client holding a number
+from before that is told to resync too.
+
+Without REALTIME_REPLAY_REDIS_URL the log lives in process memory. That
+only works for a single process, such as development or tests.
+"""
+import json
+import logging
+import threading
+from collections import deque
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+SEQUENCED_PREFIXES = ('workspace_', 'task_')
+
+APPEND_SCRIPT = """
+local seq = redis.call('INCR', KEYS[1])
+redis.call('XADD', KEYS[2], 'MAXLEN', '~', ARGV[2], seq .. '-0', 'message', ARGV[1])
+redis.call('EXPIRE', KEYS[1], ARGV[3])
+redis.call('EXPIRE', KEYS[2], ARGV[3])
+return seq
+"""
+
+
+def is_sequenced(group):
+    return group.startswith(SEQUENCED_PREFIXES)
+
+
+class RedisReplayLog:
+    SEQ_KEY = 'realtime:seq:{group}'
+    LOG_KEY = 'realtime:log:{group}'
+
+    def __init__(self, url, maxlen=1000, ttl=24 * 60 * 60):
+        import redis
+        self.client = redis.Redis.from_url(url, decode_responses=True)
+        self.maxlen = maxlen
+        self.ttl = ttl
+        self._append = self.client.register_script(APPEND_SCRIPT)
+
+    def append(self, entries):
+        """Log [(group, message)] and return their sequence numbers, in order."""
+        pipe = self.client.pipeline(transaction=False)
+        for group, message in entries:
+            self._append(
+                keys=[self.SEQ_KEY.format(group=group), self.LOG_KEY.format(group=group)],
+                args=[json.dumps(message), self.maxlen, self.ttl],
+                client=pipe,
+            )
+        return [int(seq) for seq in pipe.execute()]
+
+    def since(self, group, last_seq):
+        """
+        (current seq, [(seq, message)] after `last_seq`), or (current seq,
+        None) when the log no longer covers the gap.
+        """
+        pipe = self.client.pipeline(transaction=True)
+        pipe.get(self.SEQ_KEY.format(group=group))
+        if last_seq is not None:
+            pipe.xrange(self.LOG_KEY.format(group=group), min=f'{last_seq + 1}-0', max='+')
+        current, *rest = pipe.execute()
+        current = int(current or 0)
+        if last_seq is None:
+            return current, []
+        entries = [(int(entry_id.split('-')[0]), json.loads(fields['message'])) for entry_id, fields in rest[0]]
+        return current, _covered(last_seq, current, entries)
+
+
+class MemoryReplayLog:
+    def __init__(self, maxlen=1000):
+        self.maxlen = maxlen
+        self._lock = threading.Lock()
+        self._seqs = {}
+        self._logs = {}
+
+    def append(self, entries):
+        seqs = []
+        with self._lock:
+            for group, message in entries:
+                seq = self._seqs[group] = self._seqs.get(group, 0) + 1
+                self._logs.setdefault(group, deque(maxlen=self.maxlen)).append((seq, dict(message)))
+                seqs.append(seq)
+        return seqs
+
+    def since(self, group, last_seq):
+        with self._lock:
+            current = self._seqs.get(group, 0)
+            if last_seq is None:
+                return current, []
+            entries = [entry for entry in self._logs.get(group, ()) if entry[0] > last_seq]
+        return current, _covered(last_seq, current, entries)
+
+
+def _covered(last_seq, current, entries):
+    """`entries` if they run without a hole from last_seq + 1, else None."""
+    if last_seq > current:
+        # The counter was reset (expired) since the client saw last_seq.
+        return None
+    if last_seq < current and (not entries or entries[0][0] != last_seq + 1):
+        return None
+    return entries
+
+
+_log = None
+_log_lock = threading.Lock()
+
+
+def get_replay_log():
+    global _log
+    if _log is None:
+        with _log_lock:
+            if _log is None:
+                if settings.REALTIME_REPLAY_REDIS_URL:
+                    _log = RedisReplayLog(
+                        settings.REALTIME_REPLAY_REDIS_URL,
+                        maxlen=settings.REALTIME_REPLAY_MAXLEN,
+                        ttl=settings.REALTIME_REPLAY_TTL_SECONDS,
+                    )
+                else:
+                    _log = MemoryReplayLog(maxlen=settings.REALTIME_REPLAY_MAXLEN)
+    return _log
+
+
+def sequence(events):
+    """
+    Number and log the events for sequenced groups in place (`seq` is added
+    to their messages). If the log is unavailable the events still go out,
+    unnumbered.
+    """
+    entries = [(group, message) for group, message in events if is_sequenced(group)]
+    if not entries:
+        return
+    try:
+        seqs = get_replay_log().append(entries)
+    except Exception:
+        logger.exception("Sequencing realtime events failed")
+        return
+    for (_, message), seq in zip(entries, seqs):
+        message['seq'] = seq
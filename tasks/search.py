@@ -0,0 +1,137 @@
+"""
+Full-text search over task titles and descriptions.
+
+PostgreSQL: `tasks_task.search_vector` is a stored generated tsvector column
+(title weighted above description) with a GIN index, both created by
+migration 0006. It is not declared on the model; queries reference it
+through RawSQL.
+
+SQLite: `tasks_task_fts` is an FTS5 table keyed by task id. Task signals
+keep it in sync through index_tasks() / unindex_tasks(); anything that
+writes tasks without signals (bulk_create, queryset.update) must call them.
+
+Other backends fall back to unranked icontains matching.
+
+Every term is matched as a prefix, all terms must match, and results are
+ordered by relevance, then id, so they can be keyset-paginated.
+"""
+import re
+
+from django.db import connection, models
+from django.db.models.expressions import RawSQL
+
+from .models import Task
+from .pagination import KeysetPaginator
+
+SEARCH_CONFIG = 'english'
+FTS_TABLE = 'tasks_task_fts'
+MAX_TERMS = 8
+MAX_TERM_LENGTH = 64
+
+ORDERING = ('-rank', '-id')
+
+
+def parse_terms(query):
+    """Split free text into at most MAX_TERMS word terms, dropping operators and punctuation."""
+    return [term[:MAX_TERM_LENGTH] for term in re.findall(r'\w+', query or '')][:MAX_TERMS]
+
+
+def search(queryset, query):
+    """
+    Restrict `queryset` to tasks matching `query`, annotated with `rank`
+    (higher is more relevant). A query with no terms matches nothing.
+    """
+    terms = parse_terms(query)
+    if not terms:
+        return queryset.annotate(rank=models.Value(0.0, output_field=models.FloatField())).none()
+    if connection.vendor == 'postgresql':
+        return _search_postgresql(queryset, terms)
+    if connection.vendor == 'sqlite':
+        return _search_sqlite(queryset, terms)
+    return _search_fallback(queryset, terms)
+
+
+def paginate(queryset, query, cursor=None, page_size=50):
+    return KeysetPaginator(ordering=ORDERING, page_size=page_size).paginate(search(queryset, query), cursor)
+
+
+def _search_postgresql(queryset, terms):
+    tsquery = ' & '.join(f'{term}:*' for term in terms)
+    table = Task._meta.db_table
+    return queryset.annotate(
+        # ts_rank() is float4; as float8 the value in a cursor compares equal to the row's own rank.
+        rank=RawSQL(
+            f'ts_rank("{table}"."search_vector", to_tsquery(%s::regconfig, %s))::float8',
+            (SEARCH_CONFIG, tsquery),
+            output_field=models.FloatField(),
+        )
+    ).filter(
+        RawSQL(
+            f'"{table}"."search_vector" @@ to_tsquery(%s::regconfig, %s)',
+            (SEARCH_CONFIG, tsquery),
+            output_field=models.BooleanField(),
+        )
+    )
+
+
+def _fts_match(terms):
+    # Quoted strings are literal tokens in FTS5; a trailing * makes each a prefix query.
+    return ' '.join('"{}"*'.format(term.replace('"', '""')) for term in terms)
+
+
+def _search_sqlite(queryset, terms):
+    match = _fts_match(terms)
+    table = Task._meta.db_table
+    return queryset.filter(
+        id__in=RawSQL(f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s', (match,))
+    ).annotate(
+        # bm25() is lower-is-better; negate it so every backend sorts rank descending.
+        rank=RawSQL(
+            f'(SELECT -bm25({FTS_TABLE}, 10.0, 1.0) FROM {FTS_TABLE} '
+            f'WHERE {FTS_TABLE} MATCH %s AND rowid = "{table}"."id")',
+            (match,),
+            output_field=models.FloatField(),
+        )
+    )
+
+
+def _search_fallback(queryset, terms):
+    condition = models.Q()
+    for term in terms:
+        condition &= models.Q(title__icontains=term) | models.Q(description__icontains=term)
+    return queryset.filter(condition).annotate(rank=models.Value(0.0, output_field=models.FloatField()))
+
+
+def index_tasks(tasks):
+    """(Re)index the given Task instances in the SQLite FTS table; a no-op elsewhere."""
+    if connection.vendor != 'sqlite':
+        return
+    rows = [(task.pk, task.title or '', task.description or '') for task in tasks]
+    if not rows:
+        return
+    with connection.cursor() as cursor:
+        cursor.executemany(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [(row[0],) for row in rows])
+        cursor.executemany(f'INSERT INTO {FTS_TABLE}(rowid, title, description) VALUES (%s, %s, %s)', rows)
+
+
+def unindex_tasks(task_ids):
+    if connection.vendor != 'sqlite':
+        return
+    task_ids = list(task_ids)
+    if not task_ids:
+        return
+    with connection.cursor() as cursor:
+        cursor.executemany(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [(task_id,) for task_id in task_ids])
+
+
+def rebuild_index():
+    """Repopulate the SQLite FTS table from tasks_task; a no-op elsewhere."""
+    if connection.vendor != 'sqlite':
+        return
+    table = Task._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE}')
+        cursor.execute(
+            f"INSERT INTO {FTS_TABLE}(rowid, title, description) "
+            f"SELECT id, title, COALESCE(description, '') FROM {table}"
+        )
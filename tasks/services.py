@@ -1,11 +1,14 @@
 """
 Service layer for task-related business logic.
 """
+from django.conf import settings
 from django.db import transaction
 from django.contrib.auth import get_user_model
 from django.core.exceptions import PermissionDenied, ValidationError
 
-from workspaces.models import Workspace, WorkspaceMember
+from workspaces import access
+from workspaces.models import Workspace
+from . import archive, bulk, search, sorting, sync, transfer
 from .models import Task
 from .celery_tasks import update_task_estimated_time
 
@@ -28,10 +31,59 @@ class TaskService:
             queryset = queryset.pending()
         return queryset
     
+    @staticmethod
+    def get_workspace_tasks_page(workspace, user, cursor=None, page_size=None, include_completed=True,
+                                 sort=sorting.DEFAULT_SORT):
+        queryset = TaskService.get_workspace_tasks(workspace, user, include_completed=include_completed)
+        paginator = sorting.get_paginator(sort, page_size=page_size or settings.TASKS_PAGE_SIZE)
+        return paginator.paginate(queryset, cursor)
+    
+    @staticmethod
+    def search_tasks_page(user, query, workspace=None, cursor=None, page_size=None):
+        """Ranked full-text search over the tasks of every workspace the user can access."""
+        if workspace is not None:
+            if not TaskService.user_can_access_workspace(user, workspace):
+                raise PermissionDenied("You don't have access to this workspace")
+            queryset = Task.objects.in_workspace(workspace)
+        else:
+            queryset = Task.objects.filter(workspace_id__in=access.get_accessible_workspace_ids(user))
+        return search.paginate(
+            queryset.with_user_data(),
+            query,
+            cursor=cursor,
+            page_size=page_size or settings.TASKS_PAGE_SIZE,
+        )
+    
+    @staticmethod
+    def get_task_changes(workspace, user, cursor=None, limit=None):
+        """Tasks changed and deleted in the workspace since `cursor`; see tasks.sync."""
+        if not TaskService.user_can_access_workspace(user, workspace):
+            raise PermissionDenied("You don't have access to this workspace")
+        return sync.changes_since(
+            getattr(workspace, 'pk', workspace),
+            cursor=cursor,
+            limit=limit or settings.TASKS_SYNC_MAX_LIMIT,
+        )
+    
+    @staticmethod
+    def get_archived_tasks_page(workspace, user, cursor=None, page_size=None):
+        if not TaskService.user_can_access_workspace(user, workspace):
+            raise PermissionDenied("You don't have access to this workspace")
+        return archive.archived_tasks_page(
+            getattr(workspace, 'pk', workspace),
+            cursor=cursor,
+            page_size=page_size or settings.TASKS_PAGE_SIZE,
+        )
+    
+    @staticmethod
+    def restore_archived_tasks(workspace, user, task_ids):
+        if not TaskService.user_can_access_workspace(user, workspace):
+            raise PermissionDenied("You don't have access to this workspace")
+        return archive.restore_tasks(getattr(workspace, 'pk', workspace), task_ids)
+    
     @staticmethod
     def user_can_access_workspace(user, workspace):
-        return (workspace.owner == user or 
-                WorkspaceMember.objects.in_workspace(workspace).for_user(user).exists())
+        return access.user_can_access_workspace(user, workspace)
     
     @staticmethod
     def user_can_edit_task(user, task):
@@ -68,16 +120,11 @@ class TaskService:
         if not task.can_be_edited_by(user):
             raise PermissionDenied("You don't have permission to edit this task")
         
-        if 'assigned_user' in update_data:
-            task.assign_to(update_data.pop('assigned_user'))
-        
-        if 'completed' in update_data:
-            completed = update_data.pop('completed')
-            if completed:
-                task.mark_completed()
-            else:
-                task.mark_incomplete()
+        assigned_user = update_data.get('assigned_user')
+        if assigned_user and not task.can_be_edited_by(assigned_user):
+            raise ValidationError("Assigned user must be a workspace member")
         
+        # One save (and so one set of signals and realtime events) for all changes.
         for field, value in update_data.items():
             if hasattr(task, field):
                 setattr(task, field, value)
@@ -87,6 +134,28 @@ class TaskService:
         
         return task
     
+    @staticmethod
+    def bulk_apply(user, operations):
+        """Apply many task operations in one transaction; see tasks.bulk."""
+        return bulk.apply_operations(user, operations)
+    
+    @staticmethod
+    def export_tasks(workspace, user, file_format):
+        """Iterator of encoded chunks for a StreamingHttpResponse; see tasks.transfer."""
+        if not TaskService.user_can_access_workspace(user, workspace):
+            raise PermissionDenied("You don't have access to this workspace")
+        return transfer.export_stream(
+            getattr(workspace, 'pk', workspace), file_format, chunk_size=settings.TASKS_EXPORT_CHUNK_SIZE
+        )
+    
+    @staticmethod
+    def import_tasks(workspace, user, lines, file_format):
+        if not TaskService.user_can_access_workspace(user, workspace):
+            raise PermissionDenied("You don't have access to this workspace")
+        return transfer.import_stream(
+            workspace, user, lines, file_format, batch_size=settings.TASKS_IMPORT_BATCH_SIZE
+        )
+    
     @staticmethod
     def delete_task(task, user):
         if not task.can_be_edited_by(user):
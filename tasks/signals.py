@@ -1,42 +1,150 @@
-from asgiref.sync import async_to_sync
-from channels.layers import get_channel_layer
-from django.db.models.signals import post_save, post_delete
+import weakref
+
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete, pre_delete
 from django.dispatch import receiver
-from .models import Task
+from workspaces.models import Workspace
+from . import outbox, search
+from .access import invalidate_task_workspace
+from .models import Task, TaskTombstone
 from .celery_tasks import update_task_estimated_time
 
 def broadcast(group: str, type_: str, payload: dict):
-    async_to_sync(get_channel_layer().group_send)(
-        group,
-        {"type": type_, **payload},
-    )
+    """Send an event to a channel group once the current transaction commits (see tasks.outbox)."""
+    outbox.publish(group, type_, payload)
 
-@receiver(post_save, sender=Task)
-def on_task_saved(sender, instance: Task, created, **kwargs):
-    # Minimal task data
-    task_data = {
-        "id": instance.id,
-        "title": instance.title,
-        "description": instance.description,
-        "completed": instance.completed,
-        "workspace_id": instance.workspace_id,
-        "assigned_user_id": instance.assigned_user_id,
-        "assigned_user_name": instance.assigned_user.username if instance.assigned_user else None,
-        "due_date": instance.due_date.isoformat() if instance.due_date else None,
-        "estimated_time": instance.estimated_time,
-        "updated_at": instance.updated_at.isoformat(),
+def update_workspace_counters(instance: Task, created, update_fields=None):
+    """
+    Apply this save's effect on the workspace task counters (and version) with
+    F() updates. Saves that leave the workspace and completion alone do not
+    touch the workspace row; tasks.conditional sees them through updated_at.
+    """
+    if update_fields is not None:
+        update_fields = {Task._meta.get_field(name).attname for name in update_fields}
+
+    def saved(field, counted):
+        # Fields left out of update_fields keep their stored value.
+        if created or update_fields is None or field in update_fields:
+            return getattr(instance, field)
+        return counted
+
+    old_workspace_id = getattr(instance, '_counted_workspace_id', None)
+    old_completed = getattr(instance, '_counted_completed', None)
+    workspace_id = saved('workspace_id', old_workspace_id)
+    completed = saved('completed', old_completed)
+
+    if created:
+        Workspace.objects.filter(pk=workspace_id).adjust_counters(
+            task_count=1, completed_task_count=int(completed)
+        )
+    elif old_workspace_id is None or old_completed is None:
+        # Not loaded from the database (or loaded deferred): nothing to diff against.
+        pass
+    elif workspace_id != old_workspace_id:
+        Workspace.objects.filter(pk=old_workspace_id).adjust_counters(
+            task_count=-1, completed_task_count=-int(old_completed)
+        )
+        # Gone from the old workspace as far as its sync clients are concerned.
+        TaskTombstone.objects.create(task_id=instance.pk, workspace_id=old_workspace_id)
+        # Back in a workspace it once left: it is no longer deleted there.
+        TaskTombstone.objects.filter(task_id=instance.pk, workspace_id=workspace_id).delete()
+        # Task subscribers are re-checked against the new workspace.
+        invalidate_task_workspace(instance.pk)
+        broadcast(f"task_{instance.pk}", "task_moved", {"task_id": instance.pk, "workspace_id": workspace_id})
+        Workspace.objects.filter(pk=workspace_id).adjust_counters(
+            task_count=1, completed_task_count=int(completed)
+        )
+    elif completed != old_completed:
+        Workspace.objects.filter(pk=workspace_id).adjust_counters(
+            completed_task_count=1 if completed else -1
+        )
+
+    instance._counted_workspace_id = workspace_id
+    instance._counted_completed = completed
+
+def task_event_data(task: Task, assigned_user_name=None):
+    """
+    Minimal task data for realtime events. Without `assigned_user_name` (or a
+    loaded assigned_user) the name is resolved by the outbox, batched.
+    """
+    if assigned_user_name is None and task.assigned_user_id:
+        if Task.assigned_user.is_cached(task):
+            assigned_user_name = task.assigned_user.username
+        else:
+            assigned_user_name = outbox.USERNAME_PENDING
+    return {
+        "id": task.id,
+        "title": task.title,
+        "description": task.description,
+        "completed": task.completed,
+        "workspace_id": task.workspace_id,
+        "assigned_user_id": task.assigned_user_id,
+        "assigned_user_name": assigned_user_name,
+        "due_date": task.due_date.isoformat() if task.due_date else None,
+        "estimated_time": task.estimated_time,
+        "created_at": task.created_at.isoformat(),
+        "updated_at": task.updated_at.isoformat(),
     }
 
+def broadcast_bulk_change(workspace_id, created=(), updated=(), deleted_ids=()):
+    """One coalesced event for everything a bulk operation changed in a workspace."""
+    broadcast(f"workspace_{workspace_id}", "tasks_bulk_changed", {
+        "workspace_id": workspace_id,
+        "created": list(created),
+        "updated": list(updated),
+        "deleted_ids": list(deleted_ids),
+    })
+
+@receiver(post_save, sender=Task)
+def on_task_saved(sender, instance: Task, created, update_fields=None, **kwargs):
+    update_workspace_counters(instance, created, update_fields)
+    if update_fields is None or {'title', 'description'} & set(update_fields):
+        search.index_tasks([instance])
+
+    task_data = task_event_data(instance)
+
     event_type = "task_created" if created else "task_updated"
     
     broadcast(f"task_{instance.id}", event_type, {"task": task_data})
     broadcast(f"workspace_{instance.workspace_id}", event_type, {"task": task_data})
 
     if created:
-        update_task_estimated_time.delay(instance.id)
+        transaction.on_commit(lambda: update_task_estimated_time.delay(instance.id))
+
+# Ids of the workspaces each delete() call (keyed by its origin) is removing.
+# Entries go away with the origin object, even if the delete fails.
+_deleting_workspaces = weakref.WeakKeyDictionary()
+
+def _workspaces_deleted_with(origin):
+    try:
+        return _deleting_workspaces.get(origin, ())
+    except TypeError:  # No origin, or one that can't be weakly referenced.
+        return ()
+
+@receiver(pre_delete, sender=Workspace)
+def on_workspace_deleting(sender, instance: Workspace, origin=None, **kwargs):
+    # Sent before any row of the cascade is deleted, whatever it started from
+    # (the workspace, a queryset, its owner...).
+    try:
+        _deleting_workspaces.setdefault(origin, set()).add(instance.pk)
+    except TypeError:
+        pass
 
 @receiver(post_delete, sender=Task)
-def on_task_deleted(sender, instance: Task, **kwargs):
+def on_task_deleted(sender, instance: Task, origin=None, **kwargs):
+    search.unindex_tasks([instance.pk])
+    if instance.workspace_id in _workspaces_deleted_with(origin):
+        # The whole workspace is going; its counters and tombstones go with it.
+        return
+
+    completed = getattr(instance, '_counted_completed', None)
+    if completed is None:
+        completed = instance.completed
+    Workspace.objects.filter(pk=instance.workspace_id).adjust_counters(
+        task_count=-1, completed_task_count=-int(completed)
+    )
+    TaskTombstone.objects.create(task_id=instance.pk, workspace_id=instance.workspace_id)
+
     # Broadcast to workspace room
     broadcast(
         f"workspace_{instance.workspace_id}",
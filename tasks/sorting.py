@@ -0,0 +1,47 @@
+"""
+Server-side sort options for workspace task lists.
+
+Every option pages by keyset, so a page is a range scan on one of the task
+indexes rather than a sort over the whole workspace:
+
+- created:  newest first (task_ws_created_idx)
+- priority: pending first, then by sort_key (task_ws_priority_idx)
+- due:      pending first, then by due date with undated tasks last
+            (task_ws_due_idx; PostgreSQL indexes keep NULLs last, SQLite
+            ones first, so SQLite still sorts this one)
+- overdue:  overdue tasks by due date (task_ws_pending_due_idx), then the
+            rest in priority order
+"""
+from django.db import models
+from django.utils import timezone
+
+from .pagination import KeysetPaginator, SegmentedPaginator
+
+SORT_OPTIONS = {
+    'created': 'Newest',
+    'priority': 'Priority',
+    'due': 'Due date',
+    'overdue': 'Overdue first',
+}
+DEFAULT_SORT = 'created'
+
+CREATED_ORDERING = ('-created_at', '-id')
+PRIORITY_ORDERING = ('completed', 'sort_key', 'id')
+DUE_ORDERING = ('completed', 'due_date', 'id')
+
+
+def get_paginator(sort, page_size=50):
+    """Paginator for a SORT_OPTIONS key; raises ValueError for unknown keys."""
+    if sort == 'created':
+        return KeysetPaginator(ordering=CREATED_ORDERING, page_size=page_size)
+    if sort == 'priority':
+        return KeysetPaginator(ordering=PRIORITY_ORDERING, page_size=page_size)
+    if sort == 'due':
+        return KeysetPaginator(ordering=DUE_ORDERING, page_size=page_size, nulls_last=('due_date',))
+    if sort == 'overdue':
+        overdue = models.Q(completed=False, due_date__lt=timezone.now().date())
+        return SegmentedPaginator([
+            (overdue, KeysetPaginator(ordering=('due_date', 'id'))),
+            (~overdue, KeysetPaginator(ordering=PRIORITY_ORDERING)),
+        ], page_size=page_size)
+    raise ValueError(f"Unknown sort: {sort}")
@@ -0,0 +1,86 @@
+"""
+Delta sync: what changed in a workspace since a client's cursor.
+
+A sync cursor is two keyset positions joined by '.': one into the workspace's
+tasks ordered by (updated_at, id), one into its tombstones ordered by
+(deleted_at, task_id). Each call returns at most `limit` rows from each
+stream. Clients keep calling with the returned cursor until `has_more` is
+false, then resume from that cursor later (e.g. after a WebSocket reconnect).
+Once every tombstone has been returned, the tombstone position moves up to
+the settle horizon, so it also dates the client's last sync.
+
+Rows newer than TASKS_SYNC_SETTLE_SECONDS are held back until a later call.
+updated_at is stamped before commit, so a slow transaction could otherwise
+land behind a cursor that has already moved past it. Transactions that can
+run longer than that (transfer.import_stream) restamp their rows just before
+committing.
+"""
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import Task, TaskTombstone
+from .pagination import InvalidCursor, KeysetPaginator
+
+TASK_ORDERING = ('updated_at', 'id')
+TOMBSTONE_ORDERING = ('deleted_at', 'task_id')
+
+
+class CursorExpired(InvalidCursor):
+    """The cursor is older than the tombstone retention window; the client must resync."""
+
+
+class SyncPage:
+    def __init__(self, changed, deleted_ids, cursor, has_more):
+        self.changed = changed
+        self.deleted_ids = deleted_ids
+        self.cursor = cursor
+        self.has_more = has_more
+
+
+def changes_since(workspace_id, cursor=None, limit=500):
+    now = timezone.now()
+    horizon = now - timedelta(seconds=settings.TASKS_SYNC_SETTLE_SECONDS)
+    task_paginator = KeysetPaginator(ordering=TASK_ORDERING, page_size=limit)
+    tombstone_paginator = KeysetPaginator(ordering=TOMBSTONE_ORDERING, page_size=limit)
+
+    if cursor:
+        task_cursor, _, tombstone_cursor = cursor.partition('.')
+        if not tombstone_cursor:
+            raise InvalidCursor("Invalid cursor")
+        deleted_since = tombstone_paginator.decode_cursor(tombstone_cursor)[0]
+        if not isinstance(deleted_since, datetime) or timezone.is_naive(deleted_since):
+            raise InvalidCursor("Invalid cursor")
+        if deleted_since < now - timedelta(days=settings.TASKS_TOMBSTONE_RETENTION_DAYS):
+            raise CursorExpired("Cursor expired; fetch the workspace again")
+    else:
+        # A first sync returns every task; only deletions from now on matter.
+        task_cursor = ''
+        tombstone_cursor = tombstone_paginator.encode_cursor(SimpleNamespace(deleted_at=horizon, task_id=0))
+
+    tasks = task_paginator.paginate(
+        Task.objects.in_workspace(workspace_id).filter(updated_at__lte=horizon).with_user_data(),
+        task_cursor or None,
+    )
+    tombstones = tombstone_paginator.paginate(
+        TaskTombstone.objects.filter(workspace_id=workspace_id, deleted_at__lte=horizon),
+        tombstone_cursor,
+    )
+
+    if tasks.items:
+        task_cursor = task_paginator.encode_cursor(tasks.items[-1])
+    if tombstones.items:
+        tombstone_cursor = tombstone_paginator.encode_cursor(tombstones.items[-1])
+    if not tombstones.has_next and (not tombstones.items or tombstones.items[-1].deleted_at < horizon):
+        # Caught up: move to the horizon even without deletions, so a cursor in
+        # regular use never ages past the retention window.
+        tombstone_cursor = tombstone_paginator.encode_cursor(SimpleNamespace(deleted_at=horizon, task_id=0))
+
+    return SyncPage(
+        changed=tasks.items,
+        deleted_ids=[tombstone.task_id for tombstone in tombstones.items],
+        cursor=f'{task_cursor}.{tombstone_cursor}',
+        has_more=tasks.has_next or tombstones.has_next,
+    )
@@ -1,3 +1,959 @@
-from django.test import TestCase
+import json
+from datetime import timedelta
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from channels.layers import get_channel_layer
+from channels.testing import WebsocketCommunicator
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from workspaces.models import Workspace, WorkspaceMember
+from workspaces.services import WorkspaceService
+from . import archive, estimates, outbox, replay, search, sorting, sync, transfer
+from .backpressure import STATS, OutboundQueue
+from .celery_tasks import prune_task_tombstones, update_task_estimated_time
+from .consumers import RealtimeConsumer
+from .models import ArchivedTask, Task, TaskTombstone
+from .pagination import InvalidCursor, KeysetPaginator
+from .presence import MemoryPresenceStore, PresenceTracker
+
+User = get_user_model()
+
+
+class TaskTestCase(TestCase):
+    def setUp(self):
+        # Ids repeat across tests, so entries cached by an earlier test would leak into this one.
+        cache.clear()
+        self.user = User.objects.create(email='owner@example.com', username='owner@example.com')
+        self.workspace = WorkspaceService.create_workspace(self.user, 'Workspace')
+
+    def create_tasks(self, count, workspace=None, **fields):
+        return [
+            Task.objects.create(
+                workspace=workspace or self.workspace, created_by=self.user, title=f'Task {index}', **fields
+            )
+            for index in range(count)
+        ]
+
+
+class TombstoneTests(TaskTestCase):
+    def test_deleting_a_task_leaves_a_tombstone(self):
+        task, = self.create_tasks(1)
+        task_id = task.pk
+        task.delete()
+        self.assertTrue(TaskTombstone.objects.filter(task_id=task_id, workspace_id=self.workspace.pk).exists())
+
+    def test_deleting_the_workspace_leaves_no_tombstones(self):
+        self.create_tasks(3)
+        self.workspace.delete()
+        self.assertFalse(TaskTombstone.objects.exists())
+
+    def test_deleting_workspaces_through_a_queryset_leaves_no_tombstones(self):
+        self.create_tasks(3)
+        Workspace.objects.filter(pk=self.workspace.pk).delete()
+        self.assertFalse(TaskTombstone.objects.exists())
+
+    def test_deleting_the_owner_leaves_no_tombstones(self):
+        self.create_tasks(3)
+        self.user.delete()
+        self.assertFalse(TaskTombstone.objects.exists())
+        self.assertFalse(Task.objects.exists())
+
+
+@override_settings(TASKS_SYNC_SETTLE_SECONDS=0)
+class SyncTests(TaskTestCase):
+    def sync(self, cursor=None):
+        page = sync.changes_since(self.workspace.pk, cursor)
+        self.assertFalse(page.has_more)
+        return page
+
+    def test_returns_changes_and_deletions_after_the_cursor(self):
+        kept, deleted = self.create_tasks(2)
+        page = self.sync()
+        self.assertEqual([task.pk for task in page.changed], [kept.pk, deleted.pk])
+
+        deleted_id = deleted.pk
+        deleted.delete()
+        kept.title = 'Renamed'
+        kept.save()
+        page = self.sync(page.cursor)
+        self.assertEqual([task.pk for task in page.changed], [kept.pk])
+        self.assertEqual(page.deleted_ids, [deleted_id])
+
+        page = self.sync(page.cursor)
+        self.assertEqual((page.changed, page.deleted_ids), ([], []))
+
+    def test_cursor_in_daily_use_never_expires(self):
+        self.create_tasks(1)
+        cursor = self.sync().cursor
+        now = timezone.now()
+        for day in range(1, 41):
+            with mock.patch('django.utils.timezone.now', return_value=now + timedelta(days=day)):
+                cursor = self.sync(cursor).cursor
+
+    def test_cursor_unused_past_retention_expires(self):
+        cursor = self.sync().cursor
+        with mock.patch('django.utils.timezone.now', return_value=timezone.now() + timedelta(days=31)):
+            with self.assertRaises(sync.CursorExpired):
+                self.sync(cursor)
+
+    def test_task_moved_back_is_not_reported_deleted(self):
+        task, = self.create_tasks(1)
+        other = WorkspaceService.create_workspace(self.user, 'Other')
+        cursor = self.sync().cursor
+        task.workspace = other
+        task.save()
+        task.workspace = self.workspace
+        task.save()
+        page = self.sync(cursor)
+        self.assertEqual([changed.pk for changed in page.changed], [task.pk])
+        self.assertEqual(page.deleted_ids, [])
+
+    def test_imported_tasks_are_stamped_at_the_end_of_the_import(self):
+        lines = [f'{{"title": "Imported {index}"}}\n'.encode() for index in range(5)]
+        started = timezone.now()
+        clock = (started + timedelta(seconds=second) for second in range(1000))
+        with mock.patch('django.utils.timezone.now', lambda: next(clock)):
+            transfer.import_stream(self.workspace, self.user, lines, 'ndjson', batch_size=2)
+        tasks = Task.objects.filter(workspace=self.workspace)
+        self.assertEqual(tasks.count(), 5)
+        self.assertEqual(len({task.updated_at for task in tasks}), 1)
+        self.assertGreater(tasks[0].updated_at, max(task.created_at for task in tasks))
+
+
+class ExportTests(TaskTestCase):
+    def setUp(self):
+        super().setUp()
+        self.create_tasks(3)
+        self.url = f'/api/workspace/{self.workspace.pk}/tasks/export/?file_format=ndjson'
+
+    def test_export_streams_every_task(self):
+        self.client.force_login(self.user)
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.is_async)
+        rows = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(len(rows), 3)
+
+    async def test_export_streams_asynchronously_under_asgi(self):
+        await sync_to_async(self.async_client.force_login)(self.user)
+        response = await self.async_client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.is_async)
+        content = b''.join([chunk async for chunk in response.streaming_content])
+        self.assertEqual(len(content.decode().splitlines()), 3)
+
+
+class ConditionalGetTests(TaskTestCase):
+    def setUp(self):
+        super().setUp()
+        self.create_tasks(1)
+        self.client.force_login(self.user)
+        self.url = f'/api/workspace/{self.workspace.pk}/tasks/list/'
+
+    def test_unchanged_workspace_answers_304(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('Last-Modified', response)
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_etag_changes_with_a_task_edit(self):
+        etag = self.client.get(self.url)['ETag']
+        task = Task.objects.get()
+        task.title = 'Renamed'
+        task.save()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_etag_changes_with_the_date(self):
+        etag = self.client.get(self.url)['ETag']
+        tomorrow = timezone.localdate() + timedelta(days=1)
+        with mock.patch('django.utils.timezone.localdate', return_value=tomorrow):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+
+@override_settings(TASKS_PAGE_SIZE=2)
+class TaskListViewTests(TaskTestCase):
+    def setUp(self):
+        super().setUp()
+        self.create_tasks(3)
+        self.client.force_login(self.user)
+        self.url = f'/workspace/{self.workspace.pk}/'
+
+    def test_invalid_cursor_shows_the_first_page(self):
+        for cursor in ('garbage', self.next_cursor('priority')):
+            response = self.client.get(self.url, {'sort': 'created', 'cursor': cursor})
+            self.assertEqual(response.status_code, 200)
+            self.assertTrue(response.context['is_first_page'])
+            self.assertEqual(len(response.context['tasks']), 2)
+            self.assertIsNotNone(response.context['next_cursor'])
+
+    def test_inaccessible_workspace_is_404(self):
+        other = User.objects.create(email='other@example.com', username='other@example.com')
+        self.client.force_login(other)
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+
+    def next_cursor(self, sort):
+        return self.client.get(self.url, {'sort': sort}).context['next_cursor']
+
+
+class CounterTests(TaskTestCase):
+    def counts(self):
+        self.workspace.refresh_from_db()
+        return self.workspace.task_count, self.workspace.completed_task_count
+
+    def test_creates_completions_and_deletes(self):
+        first, second = self.create_tasks(2)
+        self.assertEqual(self.counts(), (2, 0))
+        first.mark_completed()
+        self.assertEqual(self.counts(), (2, 1))
+        first.mark_incomplete()
+        second.mark_completed()
+        self.assertEqual(self.counts(), (2, 1))
+        second.delete()
+        self.assertEqual(self.counts(), (1, 0))
+
+    def test_move_updates_both_workspaces(self):
+        task, = self.create_tasks(1, completed=True)
+        other = WorkspaceService.create_workspace(self.user, 'Other')
+        task.workspace = other
+        task.save()
+        other.refresh_from_db()
+        self.assertEqual(self.counts(), (0, 0))
+        self.assertEqual((other.task_count, other.completed_task_count), (1, 1))
+
+    def test_concurrent_completions_count_once(self):
+        task, = self.create_tasks(1)
+        first, second = Task.objects.get(pk=task.pk), Task.objects.get(pk=task.pk)
+        first.completed = second.completed = True
+        first.save()
+        second.save()
+        self.assertEqual(self.counts(), (1, 1))
+
+    def test_stale_save_keeps_a_concurrent_completion(self):
+        task, = self.create_tasks(1)
+        stale = Task.objects.get(pk=task.pk)
+        task.mark_completed()
+        stale.title = 'Renamed'
+        stale.save()  # Leaves out the completed=False it loaded.
+        task.refresh_from_db()
+        self.assertEqual((task.title, task.completed), ('Renamed', True))
+        self.assertEqual(self.counts(), (1, 1))
+
+    def test_concurrent_move_and_completion(self):
+        other = WorkspaceService.create_workspace(self.user, 'Other')
+        for moved, (first_change, second_change) in enumerate((('move', 'complete'), ('complete', 'move')), 1):
+            task, = self.create_tasks(1)
+            first, second = Task.objects.get(pk=task.pk), Task.objects.get(pk=task.pk)
+            for instance, change in ((first, first_change), (second, second_change)):
+                if change == 'move':
+                    instance.workspace = other
+                    instance.save()
+                else:
+                    instance.mark_completed()
+            task.refresh_from_db()
+            self.assertEqual((task.workspace_id, task.completed), (other.pk, True))
+            self.assertEqual(self.counts(), (0, 0))
+            other.refresh_from_db()
+            self.assertEqual((other.task_count, other.completed_task_count), (moved, moved))
+
+    def test_edits_that_keep_the_counters_leave_the_workspace_alone(self):
+        task, = self.create_tasks(1)
+        version = Workspace.objects.get(pk=self.workspace.pk).version
+        task = Task.objects.get(pk=task.pk)
+        with CaptureQueriesContext(connection) as queries:
+            task.title = 'Renamed'
+            task.save()
+            task.assign_to(self.user)
+            task.completed = False
+            task.save(update_fields=['completed', 'description'])
+        updates = [query['sql'].split('"')[1] for query in queries if query['sql'].startswith('UPDATE')]
+        self.assertEqual(updates, ['tasks_task'] * 3)
+        self.assertEqual(Workspace.objects.get(pk=self.workspace.pk).version, version)
+
+
+
+class BulkTests(TaskTestCase):
+    def setUp(self):
+        super().setUp()
+        self.other = WorkspaceService.create_workspace(self.user, 'Other')
+        self.client.force_login(self.user)
+
+    def bulk(self, *operations):
+        with mock.patch('tasks.outbox.dispatch') as dispatch, self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/tasks/bulk/', {'operations': operations}, content_type='application/json')
+        self.events = [event for call in dispatch.call_args_list for event in call.args[0]]
+        return response
+
+    def counts(self, workspace):
+        workspace.refresh_from_db()
+        return workspace.task_count, workspace.completed_task_count
+
+    def test_invalid_operation_rejects_the_whole_batch(self):
+        task, = self.create_tasks(1)
+        outsider = User.objects.create(email='outsider@example.com', username='outsider@example.com')
+        response = self.bulk(
+            {'op': 'create', 'workspace_id': self.workspace.pk, 'title': 'New'},
+            {'op': 'complete', 'id': task.pk},
+            {'op': 'reassign', 'id': task.pk, 'assigned_user_id': outsider.pk},
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(list(response.json()['operations']), ['2'])
+        self.assertEqual(list(Task.objects.values_list('id', flat=True)), [task.pk])
+        self.assertFalse(Task.objects.get(pk=task.pk).completed)
+        self.assertEqual(self.counts(self.workspace), (1, 0))
+        self.assertEqual(self.events, [])
+
+    def test_operation_on_a_deleted_task_rejects_the_whole_batch(self):
+        task, = self.create_tasks(1)
+        response = self.bulk({'op': 'delete', 'id': task.pk}, {'op': 'complete', 'id': task.pk})
+        self.assertEqual(response.status_code, 400)
+        self.assertTrue(Task.objects.filter(pk=task.pk).exists())
+        self.assertFalse(TaskTombstone.objects.exists())
+        self.assertEqual(self.counts(self.workspace), (1, 0))
+
+    def test_mixed_operations_keep_the_counters(self):
+        open_task, done_task, doomed = self.create_tasks(3)
+        done_task.mark_completed()
+        doomed.mark_completed()
+        moved, = self.create_tasks(1, workspace=self.other)
+        response = self.bulk(
+            {'op': 'create', 'workspace_id': self.workspace.pk, 'title': 'Done', 'completed': True},
+            {'op': 'create', 'workspace_id': self.other.pk, 'title': 'Open'},
+            {'op': 'complete', 'id': open_task.pk},
+            {'op': 'reopen', 'id': done_task.pk},
+            {'op': 'update', 'id': moved.pk, 'title': 'Renamed', 'completed': True},
+            {'op': 'delete', 'id': doomed.pk},
+        )
+        self.assertEqual(response.status_code, 200)
+        for workspace in (self.workspace, self.other):
+            tasks = Task.objects.filter(workspace=workspace)
+            self.assertEqual(self.counts(workspace), (tasks.count(), tasks.filter(completed=True).count()))
+        self.assertEqual(self.counts(self.workspace), (3, 2))
+        self.assertEqual(self.counts(self.other), (2, 1))
+
+    def test_deletes_leave_tombstones(self):
+        tasks = self.create_tasks(2) + self.create_tasks(1, workspace=self.other)
+        response = self.bulk(*[{'op': 'delete', 'id': task.pk} for task in tasks])
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(Task.objects.exists())
+        self.assertEqual(
+            set(TaskTombstone.objects.values_list('task_id', 'workspace_id')),
+            {(task.pk, task.workspace_id) for task in tasks},
+        )
+        self.assertEqual(self.counts(self.workspace), (0, 0))
+
+    def test_one_event_per_workspace(self):
+        first, second = self.create_tasks(2)
+        third, = self.create_tasks(1, workspace=self.other)
+        response = self.bulk(
+            {'op': 'create', 'workspace_id': self.workspace.pk, 'title': 'New'},
+            {'op': 'complete', 'id': first.pk},
+            {'op': 'delete', 'id': second.pk},
+            {'op': 'update', 'id': third.pk, 'title': 'Renamed'},
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            sorted((group, message['type']) for group, message in self.events),
+            sorted((f'workspace_{workspace.pk}', 'tasks_bulk_changed') for workspace in (self.workspace, self.other)),
+        )
+        event = dict(self.events)[f'workspace_{self.workspace.pk}']
+        self.assertEqual([task['title'] for task in event['created']], ['New'])
+        self.assertEqual([task['id'] for task in event['updated']], [first.pk])
+        self.assertEqual(event['deleted_ids'], [second.pk])
+
+
+class CreateTaskApiTests(TaskTestCase):
+    def setUp(self):
+        super().setUp()
+        self.url = f'/api/workspace/{self.workspace.pk}/tasks/'
+
+    def test_creates_the_task(self):
+        self.client.force_login(self.user)
+        response = self.client.post(self.url, {'title': 'New'}, content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(list(Task.objects.values_list('title', flat=True)), ['New'])
+
+    def test_inaccessible_workspace_is_404(self):
+        outsider = User.objects.create(email='outsider@example.com', username='outsider@example.com')
+        self.client.force_login(outsider)
+        response = self.client.post(self.url, {'title': 'New'}, content_type='application/json')
+        self.assertEqual(response.status_code, 404)
+        self.assertFalse(Task.objects.exists())
+
+
+class ArchiveTests(TaskTestCase):
+    fields = (
+        'title', 'description', 'workspace_id', 'assigned_user_id', 'created_by_id',
+        'due_date', 'estimated_time', 'completed', 'created_at', 'sort_key',
+    )
+
+    def setUp(self):
+        super().setUp()
+        self.old, self.recent, self.open = self.create_tasks(3)
+        for task in (self.old, self.recent):
+            task.mark_completed()
+        self.old.description = 'Details'
+        self.old.due_date = timezone.localdate() - timedelta(days=200)
+        self.old.estimated_time = '2h'
+        self.old.assign_to(self.user)
+        long_ago = timezone.now() - timedelta(days=100)
+        Task.objects.filter(pk__in=[self.old.pk, self.open.pk]).update(updated_at=long_ago)
+        self.old.refresh_from_db()
+
+    def counts(self):
+        self.workspace.refresh_from_db()
+        return self.workspace.task_count, self.workspace.completed_task_count
+
+    def test_archive_then_restore_keeps_the_id_and_fields(self):
+        self.assertEqual(self.counts(), (3, 2))
+
+        self.assertEqual(archive.archive_completed_tasks(), 1)
+        self.assertFalse(Task.objects.filter(pk=self.old.pk).exists())
+        archived = ArchivedTask.objects.get(pk=self.old.pk)
+        for field in self.fields + ('updated_at',):
+            self.assertEqual(getattr(archived, field), getattr(self.old, field), field)
+        self.assertTrue(TaskTombstone.objects.filter(task_id=self.old.pk).exists())
+        self.assertEqual(self.counts(), (2, 1))
+
+        restored, = archive.restore_tasks(self.workspace.pk, [self.old.pk, self.recent.pk])
+        self.assertEqual(restored.pk, self.old.pk)
+        task = Task.objects.get(pk=self.old.pk)
+        for field in self.fields:
+            self.assertEqual(getattr(task, field), getattr(self.old, field), field)
+        self.assertGreater(task.updated_at, self.old.updated_at)
+        self.assertFalse(ArchivedTask.objects.exists())
+        self.assertFalse(TaskTombstone.objects.filter(task_id=self.old.pk).exists())
+        self.assertEqual(self.counts(), (3, 2))
+
+    def test_restore_into_another_workspace_is_ignored(self):
+        archive.archive_completed_tasks()
+        other = WorkspaceService.create_workspace(self.user, 'Other')
+        self.assertEqual(archive.restore_tasks(other.pk, [self.old.pk]), [])
+        self.assertTrue(ArchivedTask.objects.filter(pk=self.old.pk).exists())
+
+    def test_restore_refuses_an_id_in_use(self):
+        archive.archive_completed_tasks()
+        Task.objects.create(id=self.old.pk, workspace=self.workspace, created_by=self.user, title='Squatter')
+        self.assertEqual(self.counts(), (3, 1))
+
+        self.client.force_login(self.user)
+        response = self.client.post(
+            f'/api/workspace/{self.workspace.pk}/tasks/archived/restore/',
+            {'ids': [self.old.pk]}, content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Task.objects.get(pk=self.old.pk).title, 'Squatter')
+        self.assertTrue(ArchivedTask.objects.filter(pk=self.old.pk).exists())
+        self.assertEqual(self.counts(), (3, 1))
+
+    def test_prune_keeps_recent_tombstones(self):
+        now = timezone.now()
+        TaskTombstone.objects.bulk_create([
+            TaskTombstone(task_id=1, workspace=self.workspace, deleted_at=now - timedelta(days=31)),
+            TaskTombstone(task_id=2, workspace=self.workspace, deleted_at=now - timedelta(days=1)),
+        ])
+        self.assertEqual(prune_task_tombstones(batch_size=1), 1)
+        self.assertEqual(list(TaskTombstone.objects.values_list('task_id', flat=True)), [2])
+
+class PaginationTests(TaskTestCase):
+    def walk(self, paginator, queryset):
+        """Ids of every page in order, checking that no row repeats."""
+        ids, cursor = [], None
+        while True:
+            page = paginator.paginate(queryset, cursor)
+            ids += [task.pk for task in page]
+            if not page.has_next:
+                break
+            cursor = page.next_cursor
+        self.assertEqual(len(ids), len(set(ids)))
+        return ids
+
+    def test_keyset_pages_cover_every_row_once(self):
+        self.create_tasks(7)
+        queryset = Task.objects.filter(workspace=self.workspace)
+        expected = list(queryset.order_by('-created_at', '-id').values_list('id', flat=True))
+        for page_size in (1, 2, 3, 7, 8):
+            self.assertEqual(self.walk(KeysetPaginator(page_size=page_size), queryset), expected)
+
+    def test_nulls_last_seek(self):
+        today = timezone.localdate()
+        for index, due_date in enumerate([None, today, None, today - timedelta(days=1), today, None]):
+            self.create_tasks(1, due_date=due_date, completed=index == 4)
+        queryset = Task.objects.filter(workspace=self.workspace)
+        expected = [
+            task.pk for task in sorted(
+                queryset, key=lambda task: (task.completed, task.due_date is None, task.due_date or today, task.pk)
+            )
+        ]
+        for page_size in (1, 2, 4):
+            self.assertEqual(self.walk(sorting.get_paginator('due', page_size=page_size), queryset), expected)
+
+    def test_segments_page_across_boundaries(self):
+        today = timezone.localdate()
+        overdue = [
+            self.create_tasks(1, due_date=today - timedelta(days=days))[0].pk for days in (3, 2, 1)
+        ]
+        rest = self.create_tasks(2)
+        queryset = Task.objects.filter(workspace=self.workspace)
+        expected = overdue + [task.pk for task in sorted(rest, key=lambda task: (task.sort_key, task.pk))]
+        for page_size in (1, 2, 3, 5, 6):
+            self.assertEqual(self.walk(sorting.get_paginator('overdue', page_size=page_size), queryset), expected)
+
+    def test_full_page_at_the_last_segment_boundary_has_no_cursor(self):
+        self.create_tasks(2, due_date=timezone.localdate() - timedelta(days=1))
+        queryset = Task.objects.filter(workspace=self.workspace)
+        page = sorting.get_paginator('overdue', page_size=2).paginate(queryset)
+        self.assertEqual(len(page), 2)
+        self.assertIsNone(page.next_cursor)
+
+        self.create_tasks(1)
+        page = sorting.get_paginator('overdue', page_size=2).paginate(queryset)
+        self.assertEqual(page.next_cursor, '1.')
+
+    def test_invalid_cursors(self):
+        paginator = sorting.get_paginator('overdue')
+        queryset = Task.objects.all()
+        for cursor in ('garbage', '9.', '0', '0.bm90LWpzb24'):
+            with self.assertRaises(InvalidCursor):
+                paginator.paginate(queryset, cursor)
+
+@skipUnless(connection.vendor == 'sqlite', 'Tests the SQLite FTS5 index')
+class SearchTests(TaskTestCase):
+    def indexed(self):
+        """{task id: (title, description)} as held in the FTS table."""
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT rowid, title, description FROM {search.FTS_TABLE}')
+            return {row[0]: tuple(row[1:]) for row in cursor.fetchall()}
+
+    def create(self, title, description=''):
+        return Task.objects.create(
+            workspace=self.workspace, created_by=self.user, title=title, description=description
+        )
+
+    def matches(self, query):
+        return [task.pk for task in search.search(Task.objects.all(), query).order_by(*search.ORDERING)]
+
+    def test_index_follows_saves_and_deletes(self):
+        task = self.create('Deploy', 'prod')
+        self.assertEqual(self.indexed(), {task.pk: ('Deploy', 'prod')})
+        task.title = 'Rollback'
+        task.save()
+        self.assertEqual(self.indexed(), {task.pk: ('Rollback', 'prod')})
+        task.delete()
+        self.assertEqual(self.indexed(), {})
+
+    def test_index_follows_bulk_operations(self):
+        kept, doomed = self.create_tasks(2)
+        self.client.force_login(self.user)
+        with mock.patch('tasks.outbox.dispatch'), self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/tasks/bulk/', {'operations': [
+                {'op': 'create', 'workspace_id': self.workspace.pk, 'title': 'Created'},
+                {'op': 'update', 'id': kept.pk, 'title': 'Renamed', 'description': 'notes'},
+                {'op': 'delete', 'id': doomed.pk},
+            ]}, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        created = Task.objects.get(title='Created')
+        self.assertEqual(self.indexed(), {kept.pk: ('Renamed', 'notes'), created.pk: ('Created', '')})
+
+    def test_terms_match_as_prefixes(self):
+        deploy = self.create('Deployment checklist')
+        notes = self.create('Notes', 'deploy the checker')
+        self.assertEqual(self.matches('depl'), [deploy.pk, notes.pk])
+        self.assertEqual(self.matches('depl check'), [deploy.pk, notes.pk])
+        self.assertEqual(self.matches('depl checkl'), [deploy.pk])
+        # Operators and punctuation are dropped, not passed to FTS5.
+        self.assertEqual(self.matches('"depl"* -(check'), [deploy.pk, notes.pk])
+        self.assertEqual(self.matches('!!'), [])
+
+    def test_ranked_results_page_by_keyset(self):
+        for index in range(4):
+            self.create('Invoice', str(index))
+            self.create(f'Task {index}', 'invoice')
+        queryset = Task.objects.filter(workspace=self.workspace)
+        ranked = sorted(search.search(queryset, 'invoice'), key=lambda task: (-task.rank, -task.pk))
+        self.assertEqual([task.title for task in ranked[:4]], ['Invoice'] * 4)
+        for page_size in (1, 3, 8):
+            ids, cursor = [], None
+            while True:
+                page = search.paginate(queryset, 'invoice', cursor, page_size=page_size)
+                ids += [task.pk for task in page]
+                if not page.has_next:
+                    break
+                cursor = page.next_cursor
+            self.assertEqual(ids, [task.pk for task in ranked])
+
+
+@override_settings(REALTIME_DISPATCH_IN_BACKGROUND=False)
+class OutboxTests(TaskTestCase):
+    def setUp(self):
+        super().setUp()
+        self.layer = mock.Mock(group_send=mock.AsyncMock())
+        patcher = mock.patch('tasks.outbox.get_channel_layer', return_value=self.layer)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def sent(self):
+        return [(call.args[0], call.args[1]['type']) for call in self.layer.group_send.call_args_list]
+
+    def test_events_are_sent_on_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            task, = self.create_tasks(1)
+            self.assertEqual(self.sent(), [])
+        self.assertEqual(self.sent(), [
+            (f'task_{task.pk}', 'task_created'),
+            (f'workspace_{self.workspace.pk}', 'task_created'),
+        ])
+
+    def test_events_of_a_rolled_back_transaction_are_dropped(self):
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            with self.assertRaises(RuntimeError), transaction.atomic():
+                self.create_tasks(1)
+                raise RuntimeError
+        self.assertEqual(callbacks, [])
+        self.assertEqual(self.sent(), [])
+
+@override_settings(REALTIME_DISPATCH_IN_BACKGROUND=False)
+class RealtimeConsumerTests(TaskTestCase):
+    def setUp(self):
+        super().setUp()
+        self.member = User.objects.create(email='member@example.com', username='member@example.com')
+        self.membership = WorkspaceMember.objects.create(workspace=self.workspace, user=self.member)
+        self.task, = self.create_tasks(1)
+
+    async def connect(self, user, path='/ws/realtime/'):
+        communicator = WebsocketCommunicator(RealtimeConsumer.as_asgi(), path)
+        communicator.scope['user'] = user
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+        return communicator
+
+    async def send(self, communicator, action='subscribe', **ids):
+        await communicator.send_json_to({'action': action, **ids})
+        return await communicator.receive_json_from()
+
+    def commit(self, change):
+        """Run `change` and its on-commit callbacks, which send the realtime events."""
+        with self.captureOnCommitCallbacks(execute=True):
+            change()
+
+    async def test_subscribe_and_unsubscribe(self):
+        ws, task = self.workspace.pk, self.task.pk
+        outsider = await sync_to_async(User.objects.create)(email='outsider@example.com', username='outsider')
+        private = await sync_to_async(WorkspaceService.create_workspace)(outsider, 'Private')
+        communicator = await self.connect(self.member)
+
+        frame = await self.send(communicator, workspaces=[ws, private.pk], tasks=[task])
+        self.assertEqual(frame['type'], 'subscriptions')
+        self.assertEqual((frame['workspaces'], frame['tasks']), ([ws], [task]))
+        self.assertEqual(frame['denied'], {'workspaces': [private.pk], 'tasks': []})
+
+        frame = await self.send(communicator, 'unsubscribe', tasks=[task])
+        self.assertEqual(frame, {'type': 'subscriptions', 'workspaces': [ws], 'tasks': []})
+
+        await sync_to_async(self.commit)(self.task.mark_completed)
+        frame = await communicator.receive_json_from()
+        self.assertEqual(
+            (frame['type'], frame['subscription'], frame['task']['id']), ('task_updated', f'workspace:{ws}', task)
+        )
+        self.assertTrue(await communicator.receive_nothing())
+
+        frame = await self.send(communicator, 'dance')
+        self.assertEqual(frame, {'type': 'error', 'error': 'Unknown action: dance'})
+        await communicator.disconnect()
+
+    async def test_removed_member_loses_subscriptions_at_once(self):
+        ws, task = self.workspace.pk, self.task.pk
+        own = await sync_to_async(WorkspaceService.create_workspace)(self.member, 'Own')
+        communicator = await self.connect(self.member)
+        await self.send(communicator, workspaces=[ws, own.pk], tasks=[task])
+        self.assertIn(f'workspace_{ws}', get_channel_layer().groups)
+
+        await sync_to_async(self.commit)(self.membership.delete)
+        frame = await communicator.receive_json_from()
+        self.assertEqual(frame, {'type': 'revoked', 'workspaces': [ws], 'tasks': [task]})
+        groups = get_channel_layer().groups
+        self.assertFalse(groups.get(f'workspace_{ws}'))
+        self.assertFalse(groups.get(f'task_{task}'))
+
+        frame = await self.send(communicator, workspaces=[ws], tasks=[task])
+        self.assertEqual((frame['workspaces'], frame['tasks']), ([own.pk], []))
+        self.assertEqual(frame['denied'], {'workspaces': [ws], 'tasks': [task]})
+
+        await sync_to_async(self.commit)(self.task.mark_completed)
+        self.assertTrue(await communicator.receive_nothing())
+        await communicator.disconnect()
+
+    async def test_socket_left_without_subscriptions_is_closed(self):
+        communicator = await self.connect(self.member)
+        await self.send(communicator, workspaces=[self.workspace.pk])
+        await sync_to_async(self.commit)(self.membership.delete)
+        self.assertEqual((await communicator.receive_json_from())['type'], 'revoked')
+        self.assertEqual(await communicator.receive_output(), {
+            'type': 'websocket.close', 'code': RealtimeConsumer.REVOKED_CLOSE_CODE,
+        })
+
+    async def test_html_subscriber_gets_out_of_band_rows(self):
+        task_id = self.task.pk
+        communicator = await self.connect(self.member, '/ws/realtime/?html=1')
+        await self.send(communicator, workspaces=[self.workspace.pk])
+
+        await sync_to_async(self.commit)(self.task.mark_completed)
+        self.assertEqual((await communicator.receive_json_from())['type'], 'task_updated')
+        html = await communicator.receive_from()
+        self.assertIn(f'id="task-{task_id}"', html)
+        self.assertIn('hx-swap-oob="true"', html)
+
+        await sync_to_async(self.commit)(self.task.delete)
+        self.assertEqual((await communicator.receive_json_from())['type'], 'task_deleted')
+        self.assertEqual(
+            await communicator.receive_from(), f'<div id="task-{task_id}" hx-swap-oob="delete"></div>'
+        )
+        await communicator.disconnect()
+
+    async def test_json_subscriber_gets_no_html(self):
+        communicator = await self.connect(self.member)
+        await self.send(communicator, workspaces=[self.workspace.pk])
+        await sync_to_async(self.commit)(self.task.mark_completed)
+        self.assertEqual((await communicator.receive_json_from())['type'], 'task_updated')
+        self.assertTrue(await communicator.receive_nothing())
+        await communicator.disconnect()
+
+    async def flush(self, tracker):
+        """Run one presence flush, as the tracker's thread would."""
+        await PresenceTracker.send(get_channel_layer(), await sync_to_async(tracker.collect)())
+
+    async def test_presence_joins_and_leaves_reach_the_group(self):
+        tracker = PresenceTracker(MemoryPresenceStore(), interval=3600)
+        group = f'workspace:{self.workspace.pk}'
+        with mock.patch('tasks.presence.get_tracker', return_value=tracker):
+            owner = await self.connect(self.user)
+            await self.send(owner, workspaces=[self.workspace.pk])
+            member = await self.connect(self.member)
+            await self.send(member, workspaces=[self.workspace.pk])
+            await self.flush(tracker)
+
+            users = [
+                {'id': self.user.pk, 'username': self.user.username},
+                {'id': self.member.pk, 'username': self.member.username},
+            ]
+            for communicator in (owner, member):
+                frame = await communicator.receive_json_from()
+                self.assertEqual(frame, {
+                    'subscription': group, 'type': 'presence_changed',
+                    'users': users, 'joined': [self.user.pk, self.member.pk], 'left': [],
+                })
+
+            await member.disconnect()
+            await self.flush(tracker)
+            frame = await owner.receive_json_from()
+            self.assertEqual((frame['users'], frame['joined'], frame['left']), (users[:1], [], [self.member.pk]))
+
+            # Nothing changed since the last frame, so the next flush stays quiet.
+            await self.flush(tracker)
+            self.assertTrue(await owner.receive_nothing())
+            await owner.disconnect()
+
+
+class EstimateTests(TaskTestCase):
+    def setUp(self):
+        super().setUp()
+        # Each test starts with an empty in-process cache.
+        patcher = mock.patch('tasks.estimates._local', None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = mock.patch('tasks.celery_tasks.OpenAI')
+        self.create = patcher.start().return_value.chat.completions.create
+        self.addCleanup(patcher.stop)
+        self.create.return_value = mock.Mock(choices=[mock.Mock(message=mock.Mock(content='Hmm.\n5 minutes'))])
+
+    def estimate(self, title, description=''):
+        task = Task.objects.create(
+            workspace=self.workspace, created_by=self.user, title=title, description=description
+        )
+        update_task_estimated_time(task.pk)
+        task.refresh_from_db()
+        return task.estimated_time
+
+    def test_identical_prompt_skips_the_model(self):
+        self.assertEqual(self.estimate('Weekly sync', 'Agenda'), '5 minutes')
+        self.assertEqual(self.estimate('  weekly   SYNC', 'agenda '), '5 minutes')
+        self.assertEqual(self.create.call_count, 1)
+
+    def test_changed_text_misses_the_cache(self):
+        self.estimate('Weekly sync', 'Agenda')
+        self.estimate('Monthly sync', 'Agenda')
+        self.estimate('Weekly sync', 'Retro')
+        self.assertEqual(self.create.call_count, 3)
+
+    def test_shared_cache_serves_other_workers(self):
+        self.estimate('Weekly sync')
+        with mock.patch('tasks.estimates._local', None):
+            self.assertEqual(self.estimate('Weekly sync'), '5 minutes')
+        self.assertEqual(self.create.call_count, 1)
+
+    @override_settings(ESTIMATE_CACHE_SIZE=1)
+    def test_worker_keeps_only_the_configured_number_of_estimates(self):
+        self.estimate('Weekly sync')
+        self.estimate('Monthly sync')
+        cache.clear()
+        self.estimate('Monthly sync')
+        self.assertEqual(self.create.call_count, 2)
+        self.estimate('Weekly sync')
+        self.assertEqual(self.create.call_count, 3)
+
+
+class LRUCacheTests(SimpleTestCase):
+    def test_evicts_the_least_recently_used_at_maxsize(self):
+        lru = estimates.LRUCache(maxsize=2)
+        lru.set('a', 1)
+        lru.set('b', 2)
+        self.assertEqual(lru.get('a'), 1)
+        lru.set('c', 3)
+        self.assertIsNone(lru.get('b'))
+        self.assertEqual((lru.get('a'), lru.get('c')), (1, 3))
+
+    def test_entries_expire(self):
+        lru = estimates.LRUCache(ttl=60)
+        with mock.patch('tasks.estimates.time.monotonic', return_value=1000):
+            lru.set('a', 1)
+        with mock.patch('tasks.estimates.time.monotonic', return_value=1059):
+            self.assertEqual(lru.get('a'), 1)
+        with mock.patch('tasks.estimates.time.monotonic', return_value=1060):
+            self.assertIsNone(lru.get('a'))
+
+
+def task_event(type_, task_id, **task):
+    if type_ == 'task_deleted':
+        return {'type': type_, 'task_id': task_id, 'workspace_id': 1}
+    return {'type': type_, 'task': {'id': task_id, 'workspace_id': 1, **task}}
+
+
+class CoalescerTests(SimpleTestCase):
+    group = 'workspace_1'
+
+    def coalesce(self, *messages):
+        coalescer = outbox.Coalescer(window=60)
+        self.assertEqual(coalescer.add([(self.group, message) for message in messages]), [])
+        with mock.patch('tasks.outbox.time.monotonic', return_value=float('inf')):
+            return [message for _, message in coalescer.pop_due()]
+
+    def test_repeated_updates_keep_the_latest(self):
+        messages = self.coalesce(
+            task_event('task_updated', 1, title='a'),
+            task_event('task_updated', 1, title='b'),
+        )
+        self.assertEqual(messages, [task_event('task_updated', 1, title='b')])
+
+    def test_created_then_updated_is_created_with_the_latest_state(self):
+        messages = self.coalesce(
+            task_event('task_created', 1, title='a'),
+            task_event('task_updated', 1, title='b'),
+        )
+        self.assertEqual(messages, [task_event('task_created', 1, title='b')])
+
+    def test_created_then_deleted_sends_only_the_delete(self):
+        messages = self.coalesce(task_event('task_created', 1), task_event('task_deleted', 1))
+        self.assertEqual(messages, [task_event('task_deleted', 1)])
+
+    def test_several_tasks_become_one_bulk_event(self):
+        messages = self.coalesce(
+            task_event('task_created', 1),
+            task_event('task_updated', 2, title='x'),
+            task_event('task_deleted', 3),
+            task_event('task_updated', 2, title='y'),
+        )
+        self.assertEqual(messages, [{
+            'type': 'tasks_bulk_changed',
+            'workspace_id': 1,
+            'created': [{'id': 1, 'workspace_id': 1}],
+            'updated': [{'id': 2, 'workspace_id': 1, 'title': 'y'}],
+            'deleted_ids': [3],
+        }])
+
+    def test_other_events_flush_the_window_first(self):
+        coalescer = outbox.Coalescer(window=60)
+        coalescer.add([(self.group, task_event('task_updated', 1))])
+        imported = {'type': 'tasks_imported', 'workspace_id': 1, 'created': 5}
+        ready = coalescer.add([(self.group, imported)])
+        self.assertEqual([message['type'] for _, message in ready], ['task_updated', 'tasks_imported'])
+        self.assertFalse(coalescer)
+
+    def test_windows_wait_for_their_deadline(self):
+        coalescer = outbox.Coalescer(window=60)
+        coalescer.add([(self.group, task_event('task_updated', 1))])
+        self.assertEqual(coalescer.pop_due(), [])
+        self.assertGreater(coalescer.time_until_due(), 0)
+
+
+class OutboundQueueTests(SimpleTestCase):
+    def setUp(self):
+        STATS.clear()
+
+    def frames(self, text):
+        return [{'text_data': text}]
+
+    async def drain(self, queue):
+        return [(await queue.get())[0]['text_data'] for _ in range(len(queue))]
+
+    async def test_updates_to_the_same_task_coalesce(self):
+        queue = OutboundQueue(maxsize=10)
+        queue.put('workspace_1', self.frames('a1'), key=('workspace_1', 'task', 1))
+        queue.put('workspace_1', self.frames('b'))
+        queue.put('workspace_1', self.frames('a2'), key=('workspace_1', 'task', 1))
+        self.assertEqual(await self.drain(queue), ['b', 'a2'])
+        self.assertEqual(STATS['coalesced'], 1)
+
+    async def test_full_queue_drops_the_group_for_a_resync(self):
+        queue = OutboundQueue(maxsize=3)
+        queue.put('workspace_1', self.frames('w1'), seq=1)
+        queue.put('task_9', self.frames('t1'), seq=1)
+        queue.put('workspace_1', self.frames('w2'), seq=2)
+        queue.put('workspace_1', self.frames('w3'), seq=3)  # Full: workspace_1 resyncs.
+        queue.put('workspace_1', self.frames('w4'), seq=4)  # Covered by the queued resync.
+        self.assertEqual(len(queue), 2)
+        frames = await self.drain(queue)
+        self.assertEqual(frames[0], 't1')
+        self.assertEqual(json.loads(frames[1]), {'type': 'resync', 'subscription': 'workspace:1', 'seq': 4})
+        self.assertEqual((STATS['dropped'], STATS['resyncs']), (4, 1))
+
+        queue.put('workspace_1', self.frames('w5'), seq=5)
+        self.assertEqual(await self.drain(queue), ['w5'])
+
+    async def test_discard_forgets_queued_frames(self):
+        queue = OutboundQueue(maxsize=1)
+        queue.put('task_9', self.frames('t1'))
+        queue.put('workspace_1', self.frames('w1'))
+        queue.discard({'task_9', 'workspace_1'})
+        self.assertEqual(len(queue), 0)
+        queue.put('workspace_1', self.frames('w2'))
+        self.assertEqual(await self.drain(queue), ['w2'])
+
+
+class ReplayTests(SimpleTestCase):
+    def test_covered(self):
+        entries = [(4, {}), (5, {})]
+        self.assertEqual(replay._covered(3, 5, entries), entries)
+        self.assertEqual(replay._covered(5, 5, []), [])
+        # Trimmed: the log no longer starts right after the client's seq.
+        self.assertIsNone(replay._covered(2, 5, entries))
+        self.assertIsNone(replay._covered(3, 5, []))
+        # The counter restarted (expired) since the client saw its seq.
+        self.assertIsNone(replay._covered(7, 5, []))
+
+    def test_memory_log_replays_until_trimmed(self):
+        log = replay.MemoryReplayLog(maxlen=3)
+        self.assertEqual(log.append([('workspace_1', {'n': n}) for n in range(1, 6)]), [1, 2, 3, 4, 5])
+        self.assertEqual(log.since('workspace_1', 3), (5, [(4, {'n': 4}), (5, {'n': 5})]))
+        self.assertEqual(log.since('workspace_1', 1), (5, None))
+        self.assertEqual(log.since('workspace_1', None), (5, []))
+        self.assertEqual(log.since('workspace_2', 0), (0, []))
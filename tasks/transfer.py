@@ -0,0 +1,215 @@
+"""
+Workspace task export and import as NDJSON or CSV.
+
+Exports read the workspace with QuerySet.iterator(chunk_size=...) and yield
+one encoded row at a time, so memory stays flat however many tasks there are.
+Under ASGI, Django 4.2 would read a sync iterator into a list before
+sending it, so the view wraps the rows with aiter_chunks there.
+
+Imports consume the request body line by line and insert through bulk_create
+in fixed-size batches. bulk_create bypasses the per-task signals, so no
+per-row broadcasts or estimation jobs are queued. Counters and the search
+index are updated per batch, and the workspace gets a single
+`tasks_imported` event once the import commits.
+
+The whole import is one transaction, so its rows only become visible at
+commit. Their updated_at is stamped again as the last step, so delta-sync
+cursors (tasks.sync) that moved on during a long import still pick them up.
+"""
+import csv
+import json
+from itertools import islice
+
+from asgiref.sync import sync_to_async
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import F
+from django.db.models.functions import Lower
+from django.utils import timezone
+
+from workspaces import access
+from workspaces.models import Workspace
+from . import search
+from .models import Task
+from .signals import broadcast
+
+User = get_user_model()
+
+CONTENT_TYPES = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+EXPORT_FIELDS = [
+    'id', 'title', 'description', 'completed', 'due_date', 'estimated_time',
+    'assigned_user_email', 'created_at', 'updated_at',
+]
+MAX_REPORTED_ERRORS = 50
+
+
+class ImportResult:
+    def __init__(self):
+        self.created = 0
+        self.completed = 0
+        self.unassigned = 0
+        self.errors = []
+        self.error_count = 0
+
+    def add_error(self, row, errors):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({'row': row, 'errors': errors})
+
+
+def export_rows(workspace_id, chunk_size=2000):
+    queryset = Task.objects.in_workspace(workspace_id).order_by('id').values(
+        'id', 'title', 'description', 'completed', 'due_date', 'estimated_time',
+        'created_at', 'updated_at', assigned_user_email=F('assigned_user__email'),
+    )
+    for row in queryset.iterator(chunk_size=chunk_size):
+        yield {field: row[field] for field in EXPORT_FIELDS}
+
+
+def export_stream(workspace_id, file_format, chunk_size=2000):
+    """Yield the workspace's tasks encoded as `file_format`, one row per chunk."""
+    rows = export_rows(workspace_id, chunk_size=chunk_size)
+    if file_format == 'csv':
+        writer = csv.writer(_Echo())
+        yield writer.writerow(EXPORT_FIELDS)
+        for row in rows:
+            yield writer.writerow([_to_text(row[field]) for field in EXPORT_FIELDS])
+    else:
+        for row in rows:
+            yield json.dumps({field: _to_json(value) for field, value in row.items()}) + '\n'
+
+
+async def aiter_chunks(chunks, batch_size=500):
+    """
+    `chunks` as an async iterator. Each step reads up to `batch_size` of them in
+    the request's sync thread (where the database cursor lives) and yields them
+    joined.
+    """
+    read_batch = sync_to_async(lambda: ''.join(islice(chunks, batch_size)))
+    while True:
+        batch = await read_batch()
+        if not batch:
+            return
+        yield batch
+
+
+class _Echo:
+    """csv.writer target that hands each encoded line straight back."""
+
+    def write(self, value):
+        return value
+
+
+def _to_json(value):
+    return value.isoformat() if hasattr(value, 'isoformat') else value
+
+
+def _to_text(value):
+    if value is None:
+        return ''
+    return _to_json(value)
+
+
+def parse_records(lines, file_format):
+    """Yield (row number, dict) pairs from an iterable of byte lines."""
+    text_lines = (line.decode('utf-8-sig') for line in lines)
+    if file_format == 'csv':
+        for number, record in enumerate(csv.DictReader(text_lines), 1):
+            # Empty CSV cells mean "not given", not an empty value.
+            yield number, {key: value for key, value in record.items() if key and value != ''}
+        return
+    number = 0
+    for line in text_lines:
+        if not line.strip():
+            continue
+        number += 1
+        try:
+            record = json.loads(line)
+        except ValueError:
+            yield number, None
+            continue
+        yield number, record if isinstance(record, dict) else None
+
+
+def import_stream(workspace, user, lines, file_format, batch_size=1000):
+    """
+    Create tasks in `workspace` from NDJSON or CSV byte lines. Invalid rows are
+    skipped and reported; assignees who are not workspace members are dropped.
+    """
+    from .api.serializers import TaskImportRowSerializer
+
+    workspace_id = getattr(workspace, 'pk', workspace)
+    result = ImportResult()
+    batch = []
+    task_ids = []
+    with transaction.atomic():
+        for number, record in parse_records(lines, file_format):
+            if record is None:
+                result.add_error(number, {'non_field_errors': ['Row is not a JSON object']})
+                continue
+            serializer = TaskImportRowSerializer(data=record)
+            if not serializer.is_valid():
+                result.add_error(number, serializer.errors)
+                continue
+            batch.append(serializer.validated_data)
+            if len(batch) >= batch_size:
+                task_ids += _insert_batch(workspace_id, user, batch, result)
+                batch = []
+        if batch:
+            task_ids += _insert_batch(workspace_id, user, batch, result)
+
+        Workspace.objects.filter(pk=workspace_id).adjust_counters(
+            task_count=result.created, completed_task_count=result.completed
+        )
+        if result.created:
+            transaction.on_commit(lambda: broadcast(
+                f"workspace_{workspace_id}",
+                "tasks_imported",
+                {"workspace_id": workspace_id, "created": result.created},
+            ))
+
+        now = timezone.now()
+        for start in range(0, len(task_ids), batch_size):
+            Task.objects.filter(pk__in=task_ids[start:start + batch_size]).update(updated_at=now)
+    return result
+
+
+def _insert_batch(workspace_id, user, rows, result):
+    emails = {row['assigned_user_email'].lower() for row in rows if row.get('assigned_user_email')}
+    assignees = {}
+    if emails:
+        users = dict(
+            User.objects.annotate(email_lower=Lower('email'))
+            .filter(email_lower__in=emails)
+            .values_list('email_lower', 'id')
+        )
+        members = access.get_access_pairs([workspace_id], users.values())
+        assignees = {email: user_id for email, user_id in users.items() if (workspace_id, user_id) in members}
+
+    tasks = []
+    for row in rows:
+        email = (row.get('assigned_user_email') or '').lower()
+        assigned_user_id = assignees.get(email)
+        if email and assigned_user_id is None:
+            result.unassigned += 1
+        task = Task(
+            workspace_id=workspace_id,
+            created_by=user,
+            title=row['title'],
+            description=row.get('description') or '',
+            completed=row.get('completed', False),
+            due_date=row.get('due_date'),
+            estimated_time=row.get('estimated_time') or None,
+            assigned_user_id=assigned_user_id,
+        )
+        task.refresh_sort_key()
+        tasks.append(task)
+    Task.objects.bulk_create(tasks)
+    search.index_tasks(tasks)
+    result.created += len(tasks)
+    result.completed += sum(1 for task in tasks if task.completed)
+    return [task.pk for task in tasks]
@@ -11,6 +11,14 @@ urlpatterns = [
     
     # API endpoints
     path('api/workspace/<int:workspace_id>/tasks/', api_views.create_task, name='api_create_task'),
+    path('api/workspace/<int:workspace_id>/tasks/list/', api_views.list_tasks, name='api_list_tasks'),
+    path('api/workspace/<int:workspace_id>/tasks/changes/', api_views.task_changes, name='api_task_changes'),
+    path('api/workspace/<int:workspace_id>/tasks/archived/', api_views.list_archived_tasks, name='api_archived_tasks'),
+    path('api/workspace/<int:workspace_id>/tasks/archived/restore/', api_views.restore_archived_tasks, name='api_restore_archived_tasks'),
+    path('api/workspace/<int:workspace_id>/tasks/export/', api_views.export_tasks, name='api_export_tasks'),
+    path('api/workspace/<int:workspace_id>/tasks/import/', api_views.import_tasks, name='api_import_tasks'),
+    path('api/tasks/bulk/', api_views.bulk_tasks, name='api_bulk_tasks'),
+    path('api/tasks/search/', api_views.search_tasks, name='api_search_tasks'),
     path('api/tasks/<int:task_id>/', api_views.update_task, name='api_update_task'),
     path('api/tasks/<int:task_id>/estimate/', api_views.estimate_task, name='api_estimate_task'),
 ]
\ No newline at end of file
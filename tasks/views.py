@@ -9,32 +9,32 @@ from django.contrib import messages
 from workspaces.models import Workspace, WorkspaceMember
 from workspaces.services import WorkspaceService
 from .models import Task
+from .conditional import conditional_page
 from .forms import TaskCreateForm
+from .pagination import InvalidCursor
 from .services import TaskService
+from .sorting import SORT_OPTIONS, DEFAULT_SORT
 from functools import cached_property
 
 
 class WorkspaceRedirectView(LoginRequiredMixin, RedirectView):
     def get_redirect_url(self, *args, **kwargs):
-        user_workspaces = WorkspaceService.get_user_workspaces(self.request.user)
+        user_workspaces = WorkspaceService.get_cached_workspace_nav(self.request.user)
         
-        if not user_workspaces.exists():
+        if not user_workspaces:
             return reverse('create_workspace')
         
-        return reverse('task_list', kwargs={'workspace_id': user_workspaces.first().id})
+        return reverse('task_list', kwargs={'workspace_id': user_workspaces[0]['id']})
 
 
+@conditional_page
 class TaskListView(LoginRequiredMixin, ListView):
     model = Task
     template_name = 'tasks/task_list.html'
     context_object_name = 'tasks'
     
     def get_queryset(self):
-        try:
-            workspace = self.get_workspace()
-            return TaskService.get_workspace_tasks(workspace, self.request.user)
-        except PermissionDenied:
-            raise Http404("Workspace not found")
+        return self.page.items
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -51,18 +51,58 @@ class TaskListView(LoginRequiredMixin, ListView):
             'current_workspace': current_workspace,
             'workspace_members': workspace_members,
             'create_form': TaskCreateForm(),
+            'task_count': current_workspace.task_count,
+            'next_cursor': self.page.next_cursor,
+            'is_first_page': not self.cursor,
+            'sort': self.sort,
+            'sort_options': SORT_OPTIONS,
         })
         return context
 
+    @cached_property
+    def page(self):
+        try:
+            try:
+                return self.get_page(self.cursor)
+            except InvalidCursor:
+                # Garbage, or left over from another sort: start over at the first page.
+                self.cursor = None
+                return self.get_page(None)
+        except PermissionDenied:
+            raise Http404("Workspace not found")
+
+    def get_page(self, cursor):
+        return TaskService.get_workspace_tasks_page(
+            self.get_workspace(), self.request.user, cursor=cursor, sort=self.sort,
+        )
+
+    @cached_property
+    def cursor(self):
+        return self.request.GET.get('cursor') or None
+
+    @cached_property
+    def sort(self):
+        sort = self.request.GET.get('sort')
+        return sort if sort in SORT_OPTIONS else DEFAULT_SORT
+
     def get_workspace(self):
-        workspace = get_object_or_404(self.user_workspaces, id=self.kwargs['workspace_id'])
-        return workspace
+        return self.current_workspace
+
+    @cached_property
+    def current_workspace(self):
+        try:
+            return WorkspaceService.get_user_workspace_with_members(
+                self.request.user, self.kwargs['workspace_id']
+            )
+        except Workspace.DoesNotExist:
+            raise Http404("Workspace not found")
 
     @cached_property
     def user_workspaces(self):
-        return WorkspaceService.get_user_workspaces(self.request.user)
+        return WorkspaceService.get_cached_workspace_nav(self.request.user)
 
 
+@conditional_page
 class TaskDetailView(LoginRequiredMixin, DetailView):
     model = Task
     template_name = 'tasks/task_detail.html'
@@ -97,7 +137,11 @@ class TaskCreateView(LoginRequiredMixin, CreateView):
     form_class = TaskCreateForm
     
     def get_workspace(self):
-        user_workspaces = WorkspaceService.get_user_workspaces(self.request.user)
+        return self.workspace
+    
+    @cached_property
+    def workspace(self):
+        user_workspaces = WorkspaceService.get_user_workspace_nav(self.request.user)
         return get_object_or_404(user_workspaces, id=self.kwargs['workspace_id'])
     
     def get_form_kwargs(self):
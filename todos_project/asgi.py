@@ -17,14 +17,13 @@ os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'todos_project.settings')
 
 django_asgi_app = get_asgi_application()
 
-from tasks.consumers import TaskConsumer, WorkspaceConsumer
+from tasks.consumers import RealtimeConsumer
 
 application = ProtocolTypeRouter({
     "http": django_asgi_app,
     "websocket": AuthMiddlewareStack(
         URLRouter([
-            path("ws/workspace/<int:workspace_id>/", WorkspaceConsumer.as_asgi()),
-            path("ws/task/<int:task_id>/", TaskConsumer.as_asgi()),
+            path("ws/realtime/", RealtimeConsumer.as_asgi()),
         ])
     ),
 })
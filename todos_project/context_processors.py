@@ -1,60 +1,69 @@
-from django.db import models
+from django.utils.functional import SimpleLazyObject
 from workspaces.models import Workspace
 from workspaces.services import WorkspaceService, InviteService
 
+# Available custom colors from the palette
+USER_COLORS = ['bg-blueberry', 'bg-grape', 'bg-pistachio', 'bg-melon',
+               'bg-purple-500', 'bg-indigo-500', 'bg-pink-500', 'bg-teal-500']
+
+
+class UserColors:
+    """
+    Consistent avatar colour per user, derived from the user id.
+
+    Behaves like the dict the templates read through `get_item`, but needs no
+    query to build: the colour only depends on the id being looked up.
+    """
+
+    def get(self, user_id, default=None):
+        if user_id is None:
+            return default
+        return USER_COLORS[int(user_id) % len(USER_COLORS)]
+
+    def __getitem__(self, user_id):
+        return self.get(user_id)
+
+    def __bool__(self):
+        return True
+
 
 def workspace_context(request):
-    """Add workspace data to all template contexts."""
+    """
+    Add workspace data to all template contexts.
+
+    Every value is lazy, so a render that never touches them (error pages,
+    partials) costs no queries. The workspace list and pending invites come
+    from the per-user cache in workspaces.cache.
+    """
     if not request.user.is_authenticated:
         return {}
-    
-    # Get all workspaces the user has access to
-    user_workspaces = WorkspaceService.get_user_workspaces(request.user)
-    
-    # Try to get current workspace from URL
-    current_workspace = None
-    if hasattr(request, 'resolver_match') and request.resolver_match:
-        workspace_id = request.resolver_match.kwargs.get('workspace_id')
-        task_id = request.resolver_match.kwargs.get('task_id')
-        
-        if workspace_id:
-            try:
-                current_workspace = user_workspaces.get(id=workspace_id)
-            except Workspace.DoesNotExist:
-                pass
-        elif task_id:
-            # Get workspace from task
-            try:
-                from tasks.models import Task
-                task = Task.objects.select_related('workspace').get(id=task_id)
-                if (task.workspace.owner == request.user or 
-                    task.workspace.members.filter(user=request.user).exists()):
-                    current_workspace = task.workspace
-            except Task.DoesNotExist:
-                pass
-    
-    # Get user's pending invites
-    user_pending_invites = InviteService.get_pending_invites_for_user(request.user)
-    
-    # Generate consistent user colors for current workspace
-    user_colors = {}
-    if current_workspace:
-        # Available custom colors from the palette
-        colors = ['bg-blueberry', 'bg-grape', 'bg-pistachio', 'bg-melon', 
-                 'bg-purple-500', 'bg-indigo-500', 'bg-pink-500', 'bg-teal-500']
-        
-        # Get all users in the workspace (owner + members)
-        workspace_users = [current_workspace.owner]
-        workspace_users.extend([member.user for member in current_workspace.members.all()])
-        
-        # Assign colors based on user ID to ensure consistency
-        for user in workspace_users:
-            color_index = user.id % len(colors)
-            user_colors[user.id] = colors[color_index]
-    
+
+    user = request.user
     return {
-        'user_workspaces': user_workspaces,
-        'current_workspace': current_workspace,
-        'user_pending_invites': user_pending_invites,
-        'user_colors': user_colors,
-    }
\ No newline at end of file
+        'user_workspaces': SimpleLazyObject(lambda: WorkspaceService.get_cached_workspace_nav(user)),
+        'current_workspace': SimpleLazyObject(lambda: _get_current_workspace(request)),
+        'user_pending_invites': SimpleLazyObject(
+            lambda: InviteService.get_cached_pending_invites_for_user(user)
+        ),
+        'user_colors': UserColors(),
+    }
+
+
+def _get_current_workspace(request):
+    """The workspace named by the URL (directly or through a task), if the user can access it."""
+    match = getattr(request, 'resolver_match', None)
+    if not match:
+        return None
+
+    workspace_id = match.kwargs.get('workspace_id')
+    task_id = match.kwargs.get('task_id')
+    if not workspace_id and task_id:
+        from tasks.models import Task
+        workspace_id = Task.objects.filter(id=task_id).values_list('workspace_id', flat=True).first()
+    if not workspace_id:
+        return None
+
+    try:
+        return WorkspaceService.get_user_workspace_with_members(request.user, workspace_id)
+    except Workspace.DoesNotExist:
+        return None
@@ -192,15 +192,93 @@ CHANNEL_LAYERS = {
     },
 }
 
+# Cache (shared across web and worker processes)
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': env('REDIS_URL', default='redis://localhost:6379'),
+        'KEY_PREFIX': 'todos',
+    },
+}
+
+# Seconds a user's accessible workspace ids stay cached; membership signals
+# invalidate them earlier.
+WORKSPACE_ACCESS_CACHE_TIMEOUT = 300
+
+# Seconds the per-user workspace menu and pending invites stay cached;
+# membership, invite and workspace signals invalidate them earlier.
+WORKSPACE_CONTEXT_CACHE_TIMEOUT = 300
+
+# Realtime events are sent after commit by a background dispatcher thread,
+# up to this many group_sends at a time
+REALTIME_DISPATCH_IN_BACKGROUND = True
+REALTIME_DISPATCH_BATCH_SIZE = 200
+# Workspaces plus tasks a single realtime connection may subscribe to
+REALTIME_MAX_SUBSCRIPTIONS = 100
+# Task events per group are collapsed over this many milliseconds (0 disables)
+REALTIME_COALESCE_WINDOW_MS = 50
+# Workspace and task events are numbered per group and kept in a capped Redis
+# stream (REALTIME_REPLAY_MAXLEN entries per group) so reconnecting clients get
+# what they missed. Idle groups' logs expire after REALTIME_REPLAY_TTL_SECONDS.
+# An empty URL keeps the log in process memory (single-process development only).
+REALTIME_REPLAY_REDIS_URL = env('REDIS_URL', default='redis://localhost:6379')
+REALTIME_REPLAY_MAXLEN = 1000
+REALTIME_REPLAY_TTL_SECONDS = 24 * 60 * 60
+# Event frames queued per realtime connection before a slow client's pending
+# updates are dropped for a resync (updates to the same task coalesce first)
+REALTIME_SEND_QUEUE_SIZE = 100
+
+# Presence (who has a workspace or task open): sorted sets in Redis, written by
+# one batched flush per process every PRESENCE_FLUSH_INTERVAL_SECONDS. Entries
+# not refreshed by a client heartbeat for PRESENCE_TTL_SECONDS expire. An empty
+# URL keeps presence in process memory (single-process development only).
+PRESENCE_REDIS_URL = env('REDIS_URL', default='redis://localhost:6379')
+PRESENCE_FLUSH_INTERVAL_SECONDS = 2
+PRESENCE_TTL_SECONDS = 45
+
 # Celery Configuration
 CELERY_BROKER_URL = env('REDIS_URL', default='redis://localhost:6379')
 CELERY_RESULT_BACKEND = env('REDIS_URL', default='redis://localhost:6379')
 CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
+CELERY_BEAT_SCHEDULE = {
+    'prune-task-tombstones': {
+        'task': 'tasks.celery_tasks.prune_task_tombstones',
+        'schedule': 60 * 60,
+    },
+    'archive-completed-tasks': {
+        'task': 'tasks.celery_tasks.archive_completed_tasks',
+        'schedule': 24 * 60 * 60,
+    },
+}
 
 # OpenAI
 OPENAI_API_KEY = env('OPENAI_API_KEY', default='')
+# Estimates are cached by a hash of the prompt inputs and model: the most
+# recently used ESTIMATE_CACHE_SIZE in each worker, all of them in the shared
+# cache, for ESTIMATE_CACHE_TTL_SECONDS
+ESTIMATE_CACHE_SIZE = 1024
+ESTIMATE_CACHE_TTL_SECONDS = 30 * 24 * 60 * 60
+
+# Task list pagination
+TASKS_PAGE_SIZE = 50
+TASKS_MAX_PAGE_SIZE = 200
+# Largest number of operations accepted by the bulk task endpoint
+TASKS_BULK_MAX_OPERATIONS = 500
+# Rows fetched per round trip when streaming an export, and rows per
+# bulk_create when importing
+TASKS_EXPORT_CHUNK_SIZE = 2000
+TASKS_IMPORT_BATCH_SIZE = 1000
+# Delta sync: rows per stream per call, how long rows settle before they are
+# handed out, and how long deleted-task tombstones are kept
+TASKS_SYNC_MAX_LIMIT = 1000
+TASKS_SYNC_SETTLE_SECONDS = 2
+TASKS_TOMBSTONE_RETENTION_DAYS = 30
+# Completed tasks untouched this long move to the archive table, this many
+# rows per transaction
+TASKS_ARCHIVE_AFTER_DAYS = 90
+TASKS_ARCHIVE_BATCH_SIZE = 500
 
 # Django REST Framework
 REST_FRAMEWORK = {
@@ -47,6 +47,13 @@ CHANNEL_LAYERS = {
     },
 }
 
+# Update cache
+CACHES['default']['LOCATION'] = REDIS_URL
+
+# Update presence and the realtime replay log
+PRESENCE_REDIS_URL = REDIS_URL
+REALTIME_REPLAY_REDIS_URL = REDIS_URL
+
 # Update Celery
 CELERY_BROKER_URL = REDIS_URL
 CELERY_RESULT_BACKEND = REDIS_URL
@@ -0,0 +1,30 @@
+import os
+
+# Tests run on SQLite and in-process backends, so they need neither
+# PostgreSQL nor Redis. Set DATABASE_URL to run them on another database.
+os.environ.setdefault('DATABASE_URL', 'sqlite:///:memory:')
+
+from .settings import *
+
+SECURE_SSL_REDIRECT = False
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+}
+
+CHANNEL_LAYERS = {
+    'default': {
+        'BACKEND': 'channels.layers.InMemoryChannelLayer',
+    },
+}
+
+# Presence and the replay log stay in process memory
+PRESENCE_REDIS_URL = ''
+REALTIME_REPLAY_REDIS_URL = ''
+# Events are sent in the committing thread, so tests can await them
+REALTIME_DISPATCH_IN_BACKGROUND = False
+
+CELERY_BROKER_URL = 'memory://'
+CELERY_RESULT_BACKEND = 'cache+memory://'
@@ -0,0 +1,104 @@
+"""
+Workspace membership resolution shared by every permission check.
+
+A user's accessible workspace ids (owned or joined) are loaded with a single
+query, kept in the shared cache, and memoized on the user object. Django builds
+a fresh user object for every request, so the memo is request-scoped: however
+many permission checks a request runs, they cost at most one query.
+"""
+from django.conf import settings
+from django.core.cache import cache
+
+from .cache import delete_keys
+
+CACHE_KEY = 'workspace_access:{user_id}'
+MEMO_ATTR = '_accessible_workspace_ids'
+
+
+def _cache_key(user_id):
+    return CACHE_KEY.format(user_id=user_id)
+
+
+def get_accessible_workspace_ids(user):
+    if user is None or not user.is_authenticated:
+        return frozenset()
+
+    workspace_ids = getattr(user, MEMO_ATTR, None)
+    if workspace_ids is not None:
+        return workspace_ids
+
+    key = _cache_key(user.pk)
+    workspace_ids = cache.get(key)
+    if workspace_ids is None:
+        workspace_ids = _load_workspace_ids(user.pk)
+        cache.set(key, workspace_ids, settings.WORKSPACE_ACCESS_CACHE_TIMEOUT)
+
+    setattr(user, MEMO_ATTR, workspace_ids)
+    return workspace_ids
+
+
+def _load_workspace_ids(user_id):
+    from .models import Workspace, WorkspaceMember
+    owned = Workspace.objects.filter(owner_id=user_id).values_list('id', flat=True)
+    joined = WorkspaceMember.objects.filter(user_id=user_id).values_list('workspace_id', flat=True)
+    return frozenset(owned.union(joined))
+
+
+def get_access_pairs(workspace_ids, user_ids):
+    """
+    The (workspace_id, user_id) pairs among the given ids where the user owns
+    or belongs to the workspace, resolved with one query.
+    """
+    from .models import Workspace, WorkspaceMember
+    workspace_ids, user_ids = set(workspace_ids), set(user_ids)
+    if not workspace_ids or not user_ids:
+        return set()
+    owned = Workspace.objects.filter(
+        id__in=workspace_ids, owner_id__in=user_ids
+    ).values_list('id', 'owner_id')
+    joined = WorkspaceMember.objects.filter(
+        workspace_id__in=workspace_ids, user_id__in=user_ids
+    ).values_list('workspace_id', 'user_id')
+    return set(owned.union(joined))
+
+
+def forget_memo(user):
+    """Drop the ids memoized on `user`, for user objects that outlive a request (WebSocket scopes)."""
+    if hasattr(user, MEMO_ATTR):
+        delattr(user, MEMO_ATTR)
+
+
+def revoke_access(user_id, workspace_id):
+    """
+    Tell the user's open realtime connections (group `user_<id>`) that they
+    lost `workspace_id`, once the surrounding transaction commits. They drop
+    every subscription in that workspace straight away.
+    """
+    from tasks import outbox
+    if user_id is not None:
+        outbox.publish(f'user_{user_id}', 'access_revoked', {'workspace_id': workspace_id})
+
+
+def user_can_access_workspace(user, workspace):
+    """`workspace` may be a Workspace instance or a workspace id."""
+    workspace_id = getattr(workspace, 'pk', workspace)
+    try:
+        workspace_id = int(workspace_id)
+    except (TypeError, ValueError):
+        return False
+    return workspace_id in get_accessible_workspace_ids(user)
+
+
+def invalidate_user_access(*users):
+    """Drop cached workspace ids for the given users (instances or ids); see delete_keys."""
+    keys = []
+    for user in users:
+        if user is None:
+            continue
+        if hasattr(user, 'pk'):
+            if getattr(user, MEMO_ATTR, None) is not None:
+                delattr(user, MEMO_ATTR)
+            keys.append(_cache_key(user.pk))
+        else:
+            keys.append(_cache_key(user))
+    delete_keys(keys)
@@ -16,10 +16,11 @@ class WorkspaceSerializer(serializers.ModelSerializer):
     owner = UserSerializer(read_only=True)
     member_count = serializers.IntegerField(read_only=True)
     task_count = serializers.IntegerField(read_only=True)
+    completed_task_count = serializers.IntegerField(read_only=True)
     
     class Meta:
         model = Workspace
-        fields = ['id', 'name', 'owner', 'member_count', 'task_count', 'created_at']
+        fields = ['id', 'name', 'owner', 'member_count', 'task_count', 'completed_task_count', 'created_at']
 
 
 class WorkspaceCreateSerializer(serializers.ModelSerializer):
@@ -36,7 +36,7 @@ def create_workspace(request):
 @permission_classes([IsAuthenticated])
 def invite_user(request, workspace_id):
     try:
-        user_workspaces = WorkspaceService.get_user_workspaces(request.user)
+        user_workspaces = WorkspaceService.get_user_workspace_nav(request.user)
         workspace = get_object_or_404(user_workspaces, id=workspace_id)
     except:
         return Response({'error': 'Workspace not found'}, status=status.HTTP_404_NOT_FOUND)
@@ -0,0 +1,54 @@
+"""
+Per-user fragments of the page chrome (workspace menu, pending invites) kept in
+the shared cache. Signals in workspaces.signals drop them when memberships,
+invites or workspaces change.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+NAV_KEY = 'workspace_nav:{user_id}'
+PENDING_INVITES_KEY = 'pending_invites:{email}'
+
+
+def delete_keys(keys):
+    """
+    Delete cache keys now and again once the surrounding transaction commits,
+    so a concurrent request cannot re-cache pre-commit data.
+    """
+    keys = list(keys)
+    if not keys:
+        return
+    cache.delete_many(keys)
+    transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def get_workspace_nav(user):
+    """[{'id': ..., 'name': ...}] for every workspace the user can access."""
+    from .models import Workspace
+
+    def load():
+        return list(Workspace.objects.accessible_to(user).order_by('id').values('id', 'name'))
+
+    return cache.get_or_set(
+        NAV_KEY.format(user_id=user.pk), load, settings.WORKSPACE_CONTEXT_CACHE_TIMEOUT
+    )
+
+
+def get_pending_invites(user):
+    from .models import Invite
+
+    def load():
+        return list(Invite.objects.for_email(user.email).pending().with_related_data())
+
+    return cache.get_or_set(
+        PENDING_INVITES_KEY.format(email=user.email.lower()), load, settings.WORKSPACE_CONTEXT_CACHE_TIMEOUT
+    )
+
+
+def invalidate_workspace_nav(*user_ids):
+    delete_keys(NAV_KEY.format(user_id=user_id) for user_id in user_ids if user_id is not None)
+
+
+def invalidate_pending_invites(*emails):
+    delete_keys(PENDING_INVITES_KEY.format(email=email.lower()) for email in emails if email)
@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from workspaces.models import Workspace
+
+
+class Command(BaseCommand):
+    help = (
+        'Recompute the stored task_count, completed_task_count and member_count of every '
+        'workspace (or the given ones) from the task and membership rows, in batches.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('workspace_ids', nargs='*', type=int, help='Only recount these workspaces')
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        workspaces = Workspace.objects.all()
+        if options['workspace_ids']:
+            workspaces = workspaces.filter(id__in=options['workspace_ids'])
+
+        counter_fields = ('task_count', 'completed_task_count', 'member_count')
+        last_id = 0
+        total = drifted = 0
+        while True:
+            batch = list(
+                workspaces.filter(id__gt=last_id).order_by('id')
+                .values_list('id', *counter_fields)[:options['batch_size']]
+            )
+            if not batch:
+                break
+            ids = [row[0] for row in batch]
+            with transaction.atomic():
+                Workspace.objects.filter(id__in=ids).recount_counters()
+            recounted = dict(
+                (row[0], row[1:])
+                for row in Workspace.objects.filter(id__in=ids).values_list('id', *counter_fields)
+            )
+            drifted += sum(1 for row in batch if recounted.get(row[0]) != row[1:])
+            total += len(batch)
+            last_id = ids[-1]
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Recounted {total} workspace{"s" if total != 1 else ""}; {drifted} had drifted counters.'
+        ))
@@ -1,26 +1,65 @@
 from django.db import models
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+
+def _count_subquery(queryset):
+    return Coalesce(
+        models.Subquery(
+            queryset.order_by().values('workspace').annotate(count=models.Count('pk')).values('count')
+        ),
+        0,
+    )
 
 
 class WorkspaceQuerySet(models.QuerySet):
     def for_user(self, user):
+        from .models import WorkspaceMember
         return self.filter(
-            models.Q(owner=user) | models.Q(members__user=user)
-        ).distinct()
+            models.Q(owner=user) |
+            models.Exists(WorkspaceMember.objects.filter(workspace=models.OuterRef('pk'), user=user))
+        )
+    
+    def accessible_to(self, user):
+        """Same rows as for_user(), resolved from the cached membership ids."""
+        from .access import get_accessible_workspace_ids
+        return self.filter(id__in=get_accessible_workspace_ids(user))
     
     def owned_by(self, user):
         return self.filter(owner=user)
     
-    def with_member_counts(self):
-        return self.annotate(member_count=models.Count('members'))
+    def for_navigation(self):
+        """Slim projection for menus and id lookups: no prefetching, stored counters only."""
+        return self.select_related('owner').only(
+            'id', 'name', 'created_at', 'owner', 'member_count', 'task_count', 'completed_task_count'
+        )
+    
+    def adjust_counters(self, **deltas):
+        """
+        Atomically add `deltas` to the counter fields, e.g. adjust_counters(task_count=1),
+        and bump `version` / `updated_at`. Call it without deltas to record any other
+        change shown on the workspace's pages that task edits do not cover (see
+        tasks.conditional), such as a rename.
+        """
+        changes = {field: models.F(field) + delta for field, delta in deltas.items() if delta}
+        return self.update(version=models.F('version') + 1, updated_at=timezone.now(), **changes)
     
-    def with_task_counts(self):
-        return self.annotate(
-            task_count=models.Count('tasks'),
-            completed_task_count=models.Count(
-                'tasks', filter=models.Q(tasks__completed=True)
-            )
+    def recount_counters(self):
+        """Recompute the stored counters from the task and membership rows."""
+        from .models import WorkspaceMember
+        from tasks.models import Task
+        tasks = Task.objects.filter(workspace=models.OuterRef('pk'))
+        return self.update(
+            version=models.F('version') + 1,
+            updated_at=timezone.now(),
+            task_count=_count_subquery(tasks),
+            completed_task_count=_count_subquery(tasks.filter(completed=True)),
+            member_count=_count_subquery(WorkspaceMember.objects.filter(workspace=models.OuterRef('pk'))),
         )
     
+    def with_members(self):
+        return self.select_related('owner').prefetch_related('members__user')
+    
     def with_full_prefetch(self):
         return self.prefetch_related(
             'members__user',
@@ -0,0 +1,25 @@
+# Generated by Django 4.2.7 on 2026-10-18 10:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('workspaces', '0002_update_invite_model'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='invite',
+            index=models.Index(condition=models.Q(('status', 'pending')), fields=['email'], name='invite_pending_email_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='invite',
+            index=models.Index(condition=models.Q(('status', 'pending')), fields=['workspace', 'email'], name='invite_pending_ws_email_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='workspacemember',
+            index=models.Index(fields=['user', 'workspace'], name='member_user_ws_idx'),
+        ),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 4.2.7 on 2026-10-18 10:37
+
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+
+def backfill_counters(apps, schema_editor):
+    Workspace = apps.get_model('workspaces', 'Workspace')
+    WorkspaceMember = apps.get_model('workspaces', 'WorkspaceMember')
+    Task = apps.get_model('tasks', 'Task')
+
+    def count(queryset):
+        return Coalesce(
+            models.Subquery(
+                queryset.order_by().values('workspace').annotate(count=models.Count('pk')).values('count')
+            ),
+            0,
+        )
+
+    tasks = Task.objects.filter(workspace=models.OuterRef('pk'))
+    Workspace.objects.update(
+        task_count=count(tasks),
+        completed_task_count=count(tasks.filter(completed=True)),
+        member_count=count(WorkspaceMember.objects.filter(workspace=models.OuterRef('pk'))),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('workspaces', '0003_add_hot_query_indexes'),
+        ('tasks', '0005_add_hot_query_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='workspace',
+            name='completed_task_count',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='workspace',
+            name='member_count',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='workspace',
+            name='task_count',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-18 10:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('workspaces', '0004_workspace_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='workspace',
+            name='version',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+    ]
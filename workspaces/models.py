@@ -10,12 +10,31 @@ class Workspace(models.Model):
     owner = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='owned_workspaces')
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # Denormalized counters, kept current by task and membership signals.
+    # `manage.py recount_workspace_counters` rebuilds them from the source rows.
+    task_count = models.IntegerField(default=0, editable=False)
+    completed_task_count = models.IntegerField(default=0, editable=False)
+    member_count = models.IntegerField(default=0, editable=False)
+    # Bumped (with updated_at) whenever anything shown on the workspace's task
+    # pages changes; the ETag validators in tasks.conditional are built from it.
+    version = models.IntegerField(default=0, editable=False)
 
     objects = WorkspaceQuerySet.as_manager()
 
+    # Maintained with F() updates only; a plain save() must not write back stale values.
+    COUNTER_FIELDS = ('task_count', 'completed_task_count', 'member_count', 'version')
+
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        if self.pk and not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.COUNTER_FIELDS
+            ]
+        super().save(*args, **kwargs)
+
 
 class WorkspaceMember(models.Model):
     workspace = models.ForeignKey(Workspace, on_delete=models.CASCADE, related_name='members')
@@ -26,6 +45,10 @@ class WorkspaceMember(models.Model):
 
     class Meta:
         unique_together = ('workspace', 'user')
+        indexes = [
+            # Membership lookups start from the user ("which workspaces can I see?").
+            models.Index(fields=['user', 'workspace'], name='member_user_ws_idx'),
+        ]
 
     def __str__(self):
         return f"{self.user.email} in {self.workspace.name}"
@@ -48,7 +71,16 @@ class Invite(models.Model):
     objects = InviteQuerySet.as_manager()
 
     class Meta:
-        pass
+        indexes = [
+            # for_email().pending(), run by the context processor on every page.
+            models.Index(fields=['email'], condition=models.Q(status='pending'), name='invite_pending_email_idx'),
+            # for_workspace().for_email().pending(), the duplicate-invite check.
+            models.Index(
+                fields=['workspace', 'email'],
+                condition=models.Q(status='pending'),
+                name='invite_pending_ws_email_idx',
+            ),
+        ]
 
     def __str__(self):
         return f"Invite to {self.workspace.name} for {self.email} ({self.status})"
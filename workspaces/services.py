@@ -6,6 +6,7 @@ from django.contrib.auth import get_user_model
 from django.core.exceptions import PermissionDenied, ValidationError
 from django.utils import timezone
 
+from . import access, cache
 from .models import Workspace, WorkspaceMember, Invite
 
 User = get_user_model()
@@ -25,10 +26,24 @@ class WorkspaceService:
     def get_user_workspaces(user):
         return Workspace.objects.for_user(user).with_full_prefetch()
     
+    @staticmethod
+    def get_user_workspace_nav(user):
+        return Workspace.objects.accessible_to(user).for_navigation()
+    
+    @staticmethod
+    def get_cached_workspace_nav(user):
+        """Cached [{'id', 'name'}] list for menus; see workspaces.cache."""
+        return cache.get_workspace_nav(user)
+    
+    @staticmethod
+    def get_user_workspace_with_members(user, workspace_id):
+        if not access.user_can_access_workspace(user, workspace_id):
+            raise Workspace.DoesNotExist("Workspace not found")
+        return Workspace.objects.with_members().get(id=workspace_id)
+    
     @staticmethod
     def user_can_access_workspace(user, workspace):
-        return (workspace.owner == user or 
-                WorkspaceMember.objects.in_workspace(workspace).for_user(user).exists())
+        return access.user_can_access_workspace(user, workspace)
     
     @staticmethod
     def user_can_invite_to_workspace(user, workspace):
@@ -83,6 +98,7 @@ class InviteService:
             
             WorkspaceMember.objects.create(workspace=invite.workspace, user=user)
             invite.accept()
+        access.invalidate_user_access(user)
             
         return invite.workspace
     
@@ -98,6 +114,10 @@ class InviteService:
     def get_pending_invites_for_user(user):
         return Invite.objects.for_email(user.email).pending().with_related_data()
     
+    @staticmethod
+    def get_cached_pending_invites_for_user(user):
+        return cache.get_pending_invites(user)
+    
     @staticmethod
     def get_invite_with_permissions(invite_id, user):
         try:
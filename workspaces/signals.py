@@ -0,0 +1,51 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .access import invalidate_user_access, revoke_access
+from .cache import invalidate_pending_invites, invalidate_workspace_nav
+from .models import Workspace, WorkspaceMember, Invite
+
+
+@receiver(post_save, sender=WorkspaceMember)
+def on_member_saved(sender, instance: WorkspaceMember, created, **kwargs):
+    Workspace.objects.filter(pk=instance.workspace_id).adjust_counters(member_count=int(created))
+    invalidate_user_access(instance.user_id)
+    invalidate_workspace_nav(instance.user_id)
+
+
+@receiver(post_delete, sender=WorkspaceMember)
+def on_member_deleted(sender, instance: WorkspaceMember, **kwargs):
+    Workspace.objects.filter(pk=instance.workspace_id).adjust_counters(member_count=-1)
+    invalidate_user_access(instance.user_id)
+    invalidate_workspace_nav(instance.user_id)
+    revoke_access(instance.user_id, instance.workspace_id)
+
+
+@receiver(post_save, sender=Workspace)
+def on_workspace_saved(sender, instance: Workspace, created, **kwargs):
+    # Owners always have access, and ownership can change on save.
+    invalidate_user_access(instance.owner_id)
+    invalidate_workspace_nav(instance.owner_id)
+    if created:
+        return
+    Workspace.objects.filter(pk=instance.pk).adjust_counters()
+    # A rename shows up in every member's menu and in pending invites.
+    invalidate_workspace_nav(*instance.members.values_list('user_id', flat=True))
+    invalidate_pending_invites(*instance.invites.pending().values_list('email', flat=True))
+
+
+@receiver(post_delete, sender=Workspace)
+def on_workspace_deleted(sender, instance: Workspace, **kwargs):
+    # Members and invites are covered by their cascaded deletes.
+    invalidate_user_access(instance.owner_id)
+    invalidate_workspace_nav(instance.owner_id)
+    revoke_access(instance.owner_id, instance.pk)
+
+
+@receiver(post_save, sender=Invite)
+def on_invite_saved(sender, instance: Invite, created, **kwargs):
+    invalidate_pending_invites(instance.email)
+
+
+@receiver(post_delete, sender=Invite)
+def on_invite_deleted(sender, instance: Invite, **kwargs):
+    invalidate_pending_invites(instance.email)
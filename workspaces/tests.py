@@ -1,3 +1,61 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from django.test import TestCase
 
-# Create your tests here.
+from .access import get_accessible_workspace_ids
+from .models import Invite, WorkspaceMember
+from .services import InviteService, WorkspaceService
+
+User = get_user_model()
+
+
+class AccessResolverTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.owner = User.objects.create(email='owner@example.com')
+        self.member = User.objects.create(email='member@example.com')
+        self.workspace = WorkspaceService.create_workspace(self.owner, 'Workspace')
+        self.other = WorkspaceService.create_workspace(self.owner, 'Other')
+
+    def fresh(self, user):
+        """A new user object, as the next request would have."""
+        return User.objects.get(pk=user.pk)
+
+    def test_owner_sees_owned_workspaces(self):
+        self.assertEqual(get_accessible_workspace_ids(self.owner), {self.workspace.pk, self.other.pk})
+
+    def test_second_request_is_served_from_the_cache(self):
+        first, second = self.fresh(self.owner), self.fresh(self.owner)
+        with self.assertNumQueries(1):
+            get_accessible_workspace_ids(first)
+        with self.assertNumQueries(0):
+            self.assertEqual(get_accessible_workspace_ids(second), {self.workspace.pk, self.other.pk})
+
+    def test_ids_are_memoized_on_the_user(self):
+        user = self.fresh(self.owner)
+        get_accessible_workspace_ids(user)
+        cache.clear()
+        with self.assertNumQueries(0):
+            self.assertEqual(get_accessible_workspace_ids(user), {self.workspace.pk, self.other.pk})
+
+    def test_adding_a_member_invalidates_their_ids(self):
+        self.assertEqual(get_accessible_workspace_ids(self.fresh(self.member)), frozenset())
+        WorkspaceMember.objects.create(workspace=self.workspace, user=self.member)
+        self.assertEqual(get_accessible_workspace_ids(self.fresh(self.member)), {self.workspace.pk})
+
+    def test_removing_a_member_invalidates_their_ids(self):
+        membership = WorkspaceMember.objects.create(workspace=self.workspace, user=self.member)
+        self.assertEqual(get_accessible_workspace_ids(self.fresh(self.member)), {self.workspace.pk})
+        membership.delete()
+        self.assertEqual(get_accessible_workspace_ids(self.fresh(self.member)), frozenset())
+
+    def test_accepting_an_invite_invalidates_the_ids_and_the_memo(self):
+        invite = Invite.objects.create(workspace=self.other, email=self.member.email, invited_by=self.owner)
+        user = self.fresh(self.member)
+        self.assertEqual(get_accessible_workspace_ids(user), frozenset())
+        InviteService.accept_invite(invite, user)
+        self.assertEqual(get_accessible_workspace_ids(user), {self.other.pk})
+        self.assertEqual(get_accessible_workspace_ids(self.fresh(self.member)), {self.other.pk})
+
+    def test_anonymous_users_see_nothing(self):
+        self.assertEqual(get_accessible_workspace_ids(None), frozenset())
@@ -36,7 +36,7 @@ class WorkspaceCreateView(LoginRequiredMixin, CreateView):
 
 @login_required
 def invite_form(request, workspace_id):
-    user_workspaces = WorkspaceService.get_user_workspaces(request.user)
+    user_workspaces = WorkspaceService.get_user_workspace_nav(request.user)
     workspace = get_object_or_404(user_workspaces, id=workspace_id)
     
     if request.method == 'POST':